@@ -1,17 +1,26 @@
 """
 AI Website Generator Module
-Uses Google Gemini 2.0 Flash to generate beautiful, diverse, and dynamic websites
+Uses the configured LLM provider (Gemini 2.5 Pro by default, see llm_providers.py)
+to generate beautiful, diverse, and dynamic websites
 """
 
-import google.generativeai as genai
 from config import Config
 import random
 import json
 import re
+import html
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from json_stream import JsonObjectStream, salvage_file_entries
+import prompt_cache
+from llm_limiter import limiter, LLMUnavailable
+import llm_providers
+import llm_metrics
+from site_sections import split_site, site_outline, apply_patches
 
-# Configure Gemini
-genai.configure(api_key=Config.GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-2.5-pro')  # Using most powerful model for best quality
+
+# Enhancement fields that carry over to a near-duplicate description
+SIMILAR_REUSE_FIELDS = ('business_type', 'target_audience', 'key_features', 'pages', 'visual_style', 'color_mood')
 
 
 def enhance_user_prompt(user_description: str) -> dict:
@@ -19,6 +28,18 @@ def enhance_user_prompt(user_description: str) -> dict:
     Use LLM to enhance user's simple description into a detailed, comprehensive prompt.
     Returns enhanced description and suggested pages.
     """
+    cached = prompt_cache.get_cached('enhance', user_description)
+    if cached is not None:
+        return cached
+    
+    similar = prompt_cache.find_similar('enhance', user_description)
+    if similar is not None:
+        similarity, stored = similar
+        # Reuse the site structure and style; the detailed brief keeps the user's own wording unless identical
+        reused = {field: stored[field] for field in SIMILAR_REUSE_FIELDS if field in stored}
+        reused['enhanced_description'] = stored.get('enhanced_description') if similarity >= 1.0 else user_description
+        return reused
+    
     enhancement_prompt = f"""You are an expert web consultant. A user wants a website and gave this description:
 
 "{user_description}"
@@ -48,33 +69,37 @@ Return ONLY a JSON object (no markdown):
 }}"""
 
     try:
-        response = model.generate_content(
-            enhancement_prompt,
-            generation_config=genai.types.GenerationConfig(
+        with llm_metrics.measure('enhance') as metric:
+            response = limiter.call(
+                llm_providers.generate,
+                enhancement_prompt,
+                'enhance',
                 temperature=0.8,
-                max_output_tokens=2048,
+                max_output_tokens=2048
             )
-        )
-        
-        result_text = response.text.strip()
-        
-        # Clean markdown if present
-        if '```json' in result_text:
-            result_text = re.search(r'```json\s*(\{.*?\})\s*```', result_text, re.DOTALL)
-            if result_text:
-                result_text = result_text.group(1)
-        elif '```' in result_text:
-            result_text = re.search(r'```\s*(\{.*?\})\s*```', result_text, re.DOTALL)
-            if result_text:
-                result_text = result_text.group(1)
-        
-        enhanced_data = json.loads(result_text)
+            
+            with metric.parsing():
+                result_text = response.strip()
+                
+                # Clean markdown if present
+                if '```json' in result_text:
+                    result_text = re.search(r'```json\s*(\{.*?\})\s*```', result_text, re.DOTALL)
+                    if result_text:
+                        result_text = result_text.group(1)
+                elif '```' in result_text:
+                    result_text = re.search(r'```\s*(\{.*?\})\s*```', result_text, re.DOTALL)
+                    if result_text:
+                        result_text = result_text.group(1)
+                
+                enhanced_data = json.loads(result_text)
         
         print(f"\n✅ Prompt Enhanced!")
         print(f"   Business Type: {enhanced_data.get('business_type', 'N/A')}")
         print(f"   Pages: {len(enhanced_data.get('pages', []))}")
         print(f"   Pages List: {', '.join(enhanced_data.get('pages', []))}")
         
+        # Only real enhancements are cached; the fallback below is retried next time
+        prompt_cache.store('enhance', user_description, enhanced_data)
         return enhanced_data
         
     except Exception as e:
@@ -215,19 +240,47 @@ DESIGN_STYLES = [
 ]
 
 
-def generate_website(description: str, user_preferences: dict = None) -> dict:
+def _no_progress(force=False, **fields):
+    pass
+
+
+def validate_generated_file(filename, content):
+    """Reject a generated file that is empty, truncated or not the expected kind of content"""
+    if filename.endswith('.html'):
+        if not isinstance(content, str) or len(content) < 200:
+            raise ValueError(f"{filename} is too short or invalid")
+        if '<!DOCTYPE html>' not in content and '<html' not in content.lower():
+            raise ValueError(f"{filename} does not contain valid HTML structure")
+        # Check for garbage/malformed content
+        if content.count('<') < 5 or content.count('>') < 5:
+            raise ValueError(f"{filename} appears to be malformed HTML")
+    elif filename.endswith('.css'):
+        if not isinstance(content, str) or len(content) < 50:
+            raise ValueError(f"{filename} is too short or invalid")
+    elif filename.endswith('.js'):
+        if not isinstance(content, str):
+            raise ValueError(f"{filename} has invalid content type")
+
+
+def generate_website(description: str, user_preferences: dict = None, progress=None, on_file=None) -> dict:
     """
     Generate a complete multi-page website with separate HTML, CSS, and JS files.
     
     Args:
         description: User's description of the desired website
         user_preferences: Optional dict with 'style', 'color_scheme', etc.
+        progress: Optional callable receiving stage updates (see jobs.JobProgress)
+        on_file: Optional callable(filename, content) invoked as each file finishes streaming
     
     Returns:
         Dictionary with file names as keys and content as values
     """
+    progress = progress or _no_progress
+    on_file = on_file or (lambda filename, content: None)
+    
     # STEP 1: Enhance user's prompt using LLM
     print(f"\n🔍 Enhancing user prompt: '{description[:100]}...'")
+    progress(stage='enhancing', force=True)
     enhanced_data = enhance_user_prompt(description)
     
     # Use enhanced description for generation
@@ -243,6 +296,7 @@ def generate_website(description: str, user_preferences: dict = None) -> dict:
         required_pages.insert(0, 'index')
     
     print(f"✅ Enhanced! Business: {business_type}, Pages: {', '.join(required_pages)}")
+    progress(business_type=business_type, pages=required_pages, force=True)
     
     # Select random color scheme and style for diversity
     color_scheme = random.choice(COLOR_SCHEMES)
@@ -255,6 +309,14 @@ def generate_website(description: str, user_preferences: dict = None) -> dict:
         if 'color_scheme' in user_preferences:
             color_scheme = user_preferences['color_scheme']
     
+    # Fan-out mode: shared design contract once, then every page in parallel.
+    # Layout mode: one response with the shared layout once and only the content of each page.
+    mode = (user_preferences or {}).get('mode') or Config.AI_GENERATION_MODE
+    if mode == 'fanout':
+        return generate_website_fanout(enhanced_data, required_pages, color_scheme, design_style, progress, on_file)
+    if mode == 'layout':
+        return generate_website_layout(enhanced_data, required_pages, color_scheme, design_style, progress, on_file)
+    
     # Build dynamic page list for JSON output
     page_files = {f"{page}.html" for page in required_pages}
     pages_json_example = ',\n  '.join([f'"{page}.html": "complete HTML"' for page in required_pages])
@@ -695,14 +757,24 @@ REMINDER: Use the EXACT same navigation HTML on ALL pages. Only add 'active' cla
 """
 
 
-    # Retry mechanism with fallback to simpler prompt if enhanced version fails
+    # Retry mechanism: a response that broke off or was malformed is salvaged and only the
+    # missing files are asked for; with nothing salvageable, fall back to a simpler prompt
     max_retries = 2
     last_error = None
+    expected_files = [f"{page}.html" for page in required_pages] + ['styles.css', 'script.js']
+    files_dict = {}
     
     for attempt in range(max_retries):
         try:
-            # Use simpler prompt on retry
-            current_prompt = prompt if attempt == 0 else f"""Create a professional multi-page website.
+            missing = [filename for filename in expected_files if filename not in files_dict]
+            if attempt == 0:
+                current_prompt = prompt
+            elif files_dict:
+                current_prompt = _missing_files_prompt(
+                    enhanced_description, required_pages, design_style, color_scheme, nav_items, files_dict, missing
+                )
+            else:
+                current_prompt = f"""Create a professional multi-page website.
 
 Business: {enhanced_description[:500]}
 Pages Required: {', '.join(required_pages)}
@@ -733,48 +805,80 @@ Team photos: IDs 64,65,91,177,203,216,223,237,243
 Tech images: IDs 0,180,367,431,487
 Make it responsive and professional. Ensure navigation is IDENTICAL on all pages."""
 
-            # Generate content with Google Gemini 2.5 Pro
-            response = model.generate_content(
-                current_prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=1.0,  # Max creativity for beautiful designs
-                    max_output_tokens=65536,  # Maximum possible output
-                )
-            )
-            
-            # Extract JSON response
-            response_text = response.text.strip()
-            
-            print(f"\n=== AI Response Attempt {attempt + 1} ===")
-            print(f"Response length: {len(response_text)} characters")
-            print(f"First 300 chars: {response_text[:300]}")
-            print(f"Last 100 chars: {response_text[-100:]}")
+            progress(stage='generating', attempt=attempt + 1, files=list(files_dict), force=True)
             
-            # Validate response is not empty or too short
-            if not response_text or len(response_text) < 100:
-                raise ValueError("AI returned empty or too short response")
+            rejected = []
             
-            # Parse JSON to get file structure
-            try:
-                files_dict = json.loads(response_text)
-            except json.JSONDecodeError as e:
-                # Fallback: try to extract JSON from markdown code blocks
-                if '```json' in response_text:
-                    response_text = response_text.split('```json')[1].split('```')[0].strip()
-                elif '```' in response_text:
-                    response_text = response_text.split('```')[1].split('```')[0].strip()
-                
+            def accept(filename, content):
                 try:
-                    files_dict = json.loads(response_text)
-                except json.JSONDecodeError:
-                    # Log the problematic response for debugging
-                    print(f"ERROR: Invalid JSON from AI (first 500 chars): {response_text[:500]}")
-                    raise ValueError(f"AI response is not valid JSON: {str(e)}")
+                    with metric.parsing():
+                        validate_generated_file(filename, content)
+                except ValueError as e:
+                    # Left missing so the next attempt asks for it again
+                    print(f"   ⚠️ {filename} rejected: {str(e)}")
+                    rejected.append(filename)
+                    return
+                files_dict[filename] = content
+                print(f"   📄 {filename}: {len(content)} chars")
+                on_file(filename, content)
+                progress(files=list(files_dict), force=True)
             
-            # Validate that we have the required files
-            if not isinstance(files_dict, dict):
-                print(f"❌ ERROR: Response is not a dictionary, it's {type(files_dict)}")
-                raise ValueError("Generated content is not a valid dictionary structure")
+            with llm_metrics.measure('website') as metric:
+                # Generate content with the configured provider, streamed so each file can be
+                # validated, written and shown as soon as its JSON value is complete.
+                # The limiter slot is held until the stream has been consumed.
+                with limiter.slot():
+                    response = limiter.call(
+                        llm_providers.generate,
+                        current_prompt,
+                        'website',
+                        temperature=1.0,  # Max creativity for beautiful designs
+                        max_output_tokens=65536,  # Maximum possible output
+                        stream=True
+                    )
+                    
+                    parser = JsonObjectStream()
+                    parse_error = None
+                    chunks = []
+                    for text in limiter.stream(response):
+                        chunks.append(text)
+                        if parse_error:
+                            continue
+                        try:
+                            with metric.parsing():
+                                entries = parser.feed(text)
+                        except ValueError as e:
+                            # Keep reading: the rest of the response is salvaged below
+                            parse_error = e
+                            continue
+                        for filename, content in entries:
+                            accept(filename, content)
+                
+                raw_text = ''.join(chunks)
+                print(f"\n=== AI Response Attempt {attempt + 1} ===")
+                print(f"Response length: {parser.received} characters")
+                print(f"First 300 chars: {raw_text[:300]}")
+                
+                progress(stage='validating', force=True)
+                
+                # Validate response is not empty or too short
+                if parser.received < 100:
+                    raise ValueError("AI returned empty or too short response")
+                
+                if parse_error or not parser.complete or rejected:
+                    with metric.parsing():
+                        salvaged = salvage_file_entries(raw_text)
+                    for filename, content in salvaged.items():
+                        if filename not in files_dict:
+                            accept(filename, content)
+                    missing = [filename for filename in expected_files if filename not in files_dict]
+                    if parse_error:
+                        reason = f"malformed ({str(parse_error)})"
+                    else:
+                        reason = "truncated" if not parser.complete else f"invalid files ({', '.join(rejected)})"
+                    print(f"🩹 Response {reason}; salvaged {len(salvaged)} files, missing: {missing}")
+                    if missing:
+                        raise ValueError(f"AI response is {reason}, missing {', '.join(missing)}")
             
             print(f"📦 Files in response: {list(files_dict.keys())}")
             
@@ -783,23 +887,6 @@ Make it responsive and professional. Ensure navigation is IDENTICAL on all pages
                 print(f"   Available files: {list(files_dict.keys())}")
                 raise ValueError("Generated content is missing index.html (home page)")
             
-            # Validate that HTML files actually contain valid HTML (not garbage)
-            for filename, content in files_dict.items():
-                if filename.endswith('.html'):
-                    if not isinstance(content, str) or len(content) < 200:
-                        raise ValueError(f"{filename} is too short or invalid")
-                    if '<!DOCTYPE html>' not in content and '<html' not in content.lower():
-                        raise ValueError(f"{filename} does not contain valid HTML structure")
-                    # Check for garbage/malformed content
-                    if content.count('<') < 5 or content.count('>') < 5:
-                        raise ValueError(f"{filename} appears to be malformed HTML")
-                elif filename.endswith('.css'):
-                    if not isinstance(content, str) or len(content) < 50:
-                        raise ValueError(f"{filename} is too short or invalid")
-                elif filename.endswith('.js'):
-                    if not isinstance(content, str):
-                        raise ValueError(f"{filename} has invalid content type")
-            
             # Success! Return the validated files
             print(f"\n✅ Generation Successful!")
             print(f"   Generated {len([f for f in files_dict.keys() if f.endswith('.html')])} pages: {', '.join([f for f in files_dict.keys() if f.endswith('.html')])}")
@@ -808,17 +895,516 @@ Make it responsive and professional. Ensure navigation is IDENTICAL on all pages
                 print(f"   {filename}: {len(content)} chars")
             return files_dict
             
+        except LLMUnavailable:
+            raise
         except Exception as e:
             last_error = e
             print(f"❌ Attempt {attempt + 1} failed: {str(e)}")
             if attempt < max_retries - 1:
-                print(f"🔄 Retrying with simpler prompt...")
+                if files_dict:
+                    print(f"🔄 Retrying for the missing files only...")
+                else:
+                    print(f"🔄 Retrying with simpler prompt...")
                 continue
             else:
                 # All retries failed
                 raise Exception(f"AI generation failed after {max_retries} attempts. Last error: {str(last_error)}")
 
 
+def _missing_files_prompt(enhanced_description, required_pages, design_style, color_scheme, nav_items, files_dict, missing):
+    """Prompt asking only for the files a broken response did not deliver, matching the ones it did"""
+    missing_json_example = ',\n  '.join([f'"{filename}": "complete content"' for filename in missing])
+    # The stylesheet (or an existing page) is what the new files must stay consistent with
+    reference = files_dict.get('styles.css') or next(
+        (content for filename, content in files_dict.items() if filename.endswith('.html')), ''
+    )
+    
+    return f"""You are completing a multi-page website. Some files were already generated; write ONLY the missing ones.
+
+Business: {enhanced_description[:500]}
+All pages: {', '.join(required_pages)}
+Style: {design_style}
+Colors: Primary {color_scheme['primary']}, Secondary {color_scheme['secondary']}, Accent {color_scheme['accent']}
+
+Already generated (do NOT include these): {', '.join(files_dict)}
+MISSING (generate exactly these): {', '.join(missing)}
+
+Navigation structure (use EXACT same HTML on every page, 'active' class on the current page link):
+```html
+<nav class="navbar">
+  <div class="logo"><a href="index.html">BusinessName</a></div>
+  <ul class="nav-menu">
+    {nav_items}
+  </ul>
+</nav>
+```
+
+Reuse the class names and design of the existing files. Excerpt:
+```
+{reference[:6000]}
+```
+
+Pages link styles.css and script.js. Use Picsum Photos: https://picsum.photos/id/[ID]/[width]/[height]
+
+Return ONLY this JSON object (no markdown, just pure JSON):
+{{
+  {missing_json_example}
+}}"""
+
+
+# Short per-page briefs for fan-out generation (pages not listed get a generic brief)
+PAGE_BRIEFS = {
+    'index': 'Home page: full-screen hero with background image, gradient overlay, large heading, subheading and 2 CTA buttons; '
+             '3-4 feature cards each with an image; testimonials; closing call-to-action section.',
+    'about': 'About page: company story with image, mission/vision/values, team grid with member photos, stats section.',
+    'services': 'Services page: filter buttons, then a grid of 6-9 service cards, each with an image at the top, title, description and price/CTA.',
+    'contact': 'Contact page: 2-column layout with a form (name, email, phone, message) and contact details (address, phone, email, hours); map placeholder.'
+}
+
+
+def build_nav(required_pages, business_name='BusinessName', active=None):
+    """The shared navigation bar, with the active class on the current page's link"""
+    items = '\n       '.join(
+        f'<li><a href="{page}.html" class="nav-link{" active" if page == active else ""}">{page.capitalize()}</a></li>'
+        for page in required_pages
+    )
+    return f"""<nav class="navbar" id="navbar">
+  <div class="container nav-container">
+    <div class="logo">
+      <a href="index.html">{html.escape(business_name)}</a>
+    </div>
+    <button class="nav-toggle" id="navToggle">
+      <span></span>
+      <span></span>
+      <span></span>
+    </button>
+    <ul class="nav-menu" id="navMenu">
+       {items}
+    </ul>
+  </div>
+</nav>"""
+
+
+def _strip_code_fence(text):
+    text = text.strip()
+    match = re.match(r'^```[a-zA-Z]*\s*\n(.*?)\n?```\s*$', text, re.DOTALL)
+    return match.group(1).strip() if match else text
+
+
+def generate_design_contract(enhanced_data, required_pages, color_scheme, design_style, max_attempts=2):
+    """
+    One call for everything pages share: business name, footer, styles.css, script.js
+    and notes on the components/classes pages should use. Retried like a page when the
+    response is malformed or lacks the shared assets.
+    """
+    prompt = f"""You are a world-class web designer creating the shared design system for a multi-page website.
+
+PROJECT: {enhanced_data.get('enhanced_description', '')}
+Business Type: {enhanced_data.get('business_type', 'general')}
+Target Audience: {enhanced_data.get('target_audience', 'general audience')}
+Pages: {', '.join(required_pages)}
+DESIGN THEME: {design_style}
+COLORS: primary {color_scheme['primary']}, secondary {color_scheme['secondary']}, accent {color_scheme['accent']}, background {color_scheme['bg']}, text {color_scheme['text']}
+
+Every page will use this EXACT navigation (the server inserts it):
+{build_nav(required_pages)}
+
+Write the complete shared CSS (reset, :root color variables, navbar incl. .scrolled and mobile hamburger
+menu, hero, buttons .btn/.btn-primary/.btn-secondary, cards, grids, team, testimonials, forms, footer,
+page header, responsive breakpoints) and JavaScript (mobile menu toggle for #navToggle/#navMenu, navbar
+scroll effect, smooth scroll, scroll reveal animations, form handling). Images come from
+https://picsum.photos/id/[ID]/[width]/[height].
+
+Return ONLY this JSON object (no markdown):
+{{
+  "business_name": "A fitting business name",
+  "design_notes": "Concise list of the CSS classes/components pages must use and how (hero, cards, grids, sections)",
+  "footer.html": "<footer class=\\"footer\\">...</footer>",
+  "styles.css": "complete CSS",
+  "script.js": "complete JavaScript"
+}}"""
+    
+    last_error = None
+    for attempt in range(max_attempts):
+        try:
+            with llm_metrics.measure('contract') as metric:
+                response = limiter.call(llm_providers.generate, prompt, 'contract', temperature=0.9, max_output_tokens=16384)
+                
+                with metric.parsing():
+                    parser = JsonObjectStream()
+                    contract = dict(parser.feed(response))
+                    if not parser.complete:
+                        raise ValueError('Design contract response is not valid JSON')
+                    missing = [
+                        filename for filename in ('styles.css', 'script.js')
+                        if not isinstance(contract.get(filename), str) or not contract[filename].strip()
+                    ]
+                    if missing:
+                        raise ValueError(f"Design contract is missing {', '.join(missing)}")
+                    for filename in ('styles.css', 'script.js'):
+                        validate_generated_file(filename, contract[filename])
+            return contract
+        except LLMUnavailable:
+            raise
+        except Exception as e:
+            last_error = e
+            print(f"❌ Design contract attempt {attempt + 1} failed: {str(e)}")
+    raise ValueError(f"Design contract failed after {max_attempts} attempts: {str(last_error)}")
+
+
+def _page_prompt(page, enhanced_data, required_pages, color_scheme, design_style, contract):
+    css_classes = sorted(set(re.findall(r'\.([a-zA-Z][\w-]*)', contract['styles.css'])))
+    brief = PAGE_BRIEFS.get(page, f'{page.capitalize()} page: design an appropriate layout for its purpose, with relevant images and content sections.')
+    
+    return f"""You are a world-class web designer writing ONE page of a multi-page website.
+
+PROJECT: {enhanced_data.get('enhanced_description', '')}
+Business: {contract.get('business_name', 'BusinessName')} ({enhanced_data.get('business_type', 'general')})
+Key Features: {', '.join(enhanced_data.get('key_features', []))}
+All pages: {', '.join(required_pages)}
+DESIGN THEME: {design_style}
+
+WRITE THIS PAGE: {page}.html
+{brief}
+
+SHARED DESIGN SYSTEM (already written - do not write CSS or JS):
+{contract.get('design_notes', '')}
+Available CSS classes: {', '.join(css_classes[:300])}
+
+RULES:
+- Return ONLY the complete HTML document for {page}.html, no markdown, no explanations
+- <head> links styles.css and Font Awesome; load script.js before </body>
+- Put the marker <!-- NAV --> right after <body> and <!-- FOOTER --> right before the script tag;
+  the server replaces them with the shared navigation and footer
+- Only add small inline <style> for page-specific details; use the shared classes
+- Images: https://picsum.photos/id/[ID]/[width]/[height] (team: 64,65,91,177,203,216,223,237,243; tech: 0,180,367,431,487)
+- Professional, engaging copy with realistic names, stats and testimonials
+- Fully responsive"""
+
+
+def assemble_page(page_html, page, required_pages, contract):
+    """Insert the shared navigation (with this page active) and footer into a generated page"""
+    nav = build_nav(required_pages, contract.get('business_name', 'BusinessName'), active=page)
+    footer = contract.get('footer.html', '')
+    
+    if '<!-- NAV -->' in page_html:
+        page_html = page_html.replace('<!-- NAV -->', nav, 1)
+    elif re.search(r'<nav\b', page_html, re.IGNORECASE):
+        page_html = re.sub(r'<nav\b.*?</nav>', lambda m: nav, page_html, count=1, flags=re.IGNORECASE | re.DOTALL)
+    else:
+        page_html = re.sub(r'(<body[^>]*>)', lambda m: m.group(1) + '\n' + nav, page_html, count=1, flags=re.IGNORECASE)
+    
+    if '<!-- FOOTER -->' in page_html:
+        page_html = page_html.replace('<!-- FOOTER -->', footer, 1)
+    elif footer and not re.search(r'<footer\b', page_html, re.IGNORECASE):
+        page_html = re.sub(r'(</body>)', lambda m: footer + '\n' + m.group(1), page_html, count=1, flags=re.IGNORECASE)
+    
+    # Every page must pick up the shared assets
+    if 'styles.css' not in page_html:
+        page_html = re.sub(r'(</head>)', lambda m: '  <link rel="stylesheet" href="styles.css">\n' + m.group(1), page_html, count=1, flags=re.IGNORECASE)
+    if 'script.js' not in page_html:
+        page_html = re.sub(r'(</body>)', lambda m: '<script src="script.js"></script>\n' + m.group(1), page_html, count=1, flags=re.IGNORECASE)
+    return page_html
+
+
+def generate_page(page, enhanced_data, required_pages, color_scheme, design_style, contract, max_attempts=2):
+    """Generate, validate and assemble one page; only this page is retried if it comes back malformed"""
+    prompt = _page_prompt(page, enhanced_data, required_pages, color_scheme, design_style, contract)
+    last_error = None
+    for attempt in range(max_attempts):
+        try:
+            with llm_metrics.measure('page') as metric:
+                response = limiter.call(llm_providers.generate, prompt, 'page', temperature=1.0, max_output_tokens=16384)
+                with metric.parsing():
+                    page_html = assemble_page(_strip_code_fence(response), page, required_pages, contract)
+                    validate_generated_file(f'{page}.html', page_html)
+            return page_html
+        except LLMUnavailable:
+            raise
+        except Exception as e:
+            last_error = e
+            print(f"❌ {page}.html attempt {attempt + 1} failed: {str(e)}")
+    raise ValueError(f"{page}.html failed after {max_attempts} attempts: {str(last_error)}")
+
+
+def generate_website_fanout(enhanced_data, required_pages, color_scheme, design_style, progress=None, on_file=None):
+    """
+    Generate the shared design contract once, then every page concurrently (bounded by
+    AI_PAGE_WORKERS), and assemble the pages locally. Latency approaches the slowest
+    page rather than the sum of all pages.
+    """
+    progress = progress or _no_progress
+    on_file = on_file or (lambda filename, content: None)
+    
+    progress(stage='generating', step='design_contract', files=[], force=True)
+    contract = generate_design_contract(enhanced_data, required_pages, color_scheme, design_style)
+    print(f"🎨 Design contract ready: {contract.get('business_name', 'BusinessName')}, "
+          f"{len(contract['styles.css'])} chars CSS, {len(contract['script.js'])} chars JS")
+    
+    files_dict = {}
+    for filename in ('styles.css', 'script.js'):
+        files_dict[filename] = contract[filename]
+        on_file(filename, contract[filename])
+    
+    progress(step='pages', pages_done=0, pages_total=len(required_pages), files=list(files_dict), force=True)
+    pages = {}
+    failed = {}
+    with ThreadPoolExecutor(max_workers=max(1, Config.AI_PAGE_WORKERS)) as pool:
+        # Each page runs in a copy of this context so its metrics reach the job's recording
+        futures = {
+            pool.submit(
+                contextvars.copy_context().run, generate_page, page, enhanced_data, required_pages, color_scheme, design_style, contract
+            ): page
+            for page in required_pages
+        }
+        for future in as_completed(futures):
+            page = futures[future]
+            try:
+                pages[f'{page}.html'] = future.result()
+            except Exception as e:
+                # The other pages still finish (and are written) before the failure is raised
+                failed[f'{page}.html'] = e
+                continue
+            print(f"   📄 {page}.html: {len(pages[f'{page}.html'])} chars")
+            on_file(f'{page}.html', pages[f'{page}.html'])
+            progress(pages_done=len(pages), files=list(files_dict) + list(pages), force=True)
+    
+    if failed:
+        unavailable = next((e for e in failed.values() if isinstance(e, LLMUnavailable)), None)
+        if unavailable:
+            raise unavailable
+        raise ValueError(f"{', '.join(sorted(failed))} failed ({len(pages)} of {len(required_pages)} pages done): "
+                         f"{'; '.join(str(e) for e in failed.values())}")
+    
+    progress(stage='validating', force=True)
+    
+    # index.html first, then pages in navigation order, then shared assets
+    result = {f'{page}.html': pages[f'{page}.html'] for page in required_pages}
+    result.update(files_dict)
+    print(f"\n✅ Generation Successful! {len(pages)} pages generated in parallel")
+    return result
+
+
+# Shared parts of a layout-mode response; pages are assembled once the required ones have arrived
+LAYOUT_KEYS = ('business_name', 'design_notes', 'head.html', 'footer.html', 'styles.css', 'script.js')
+LAYOUT_REQUIRED_KEYS = ('footer.html', 'styles.css', 'script.js')
+# Shared parts a model may repeat in a page body: the script tag, a leading <nav> and the
+# site footer (the last <footer>, followed by nothing but scripts)
+LAYOUT_SCRIPT_PATTERN = re.compile(r'<script\b[^>]*\bsrc\s*=\s*["\']script\.js["\'][^>]*>\s*</script>', re.IGNORECASE)
+LAYOUT_NAV_PATTERN = re.compile(r'^\s*(?:<header\b[^>]*>\s*)?<nav\b.*?</nav>(?:\s*</header>)?', re.IGNORECASE | re.DOTALL)
+LAYOUT_SITE_FOOTER_PATTERN = re.compile(
+    r'<footer\b(?:(?!<footer\b).)*?</footer>(?=(?:\s*<script\b[^>]*>.*?</script>)*\s*$)', re.IGNORECASE | re.DOTALL
+)
+LAYOUT_DEFAULT_HEAD = '<link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css">'
+LAYOUT_EXAMPLES = {
+    'business_name': 'A fitting business name',
+    'design_notes': 'Concise list of the CSS classes/components pages use and how (hero, cards, grids, sections)',
+    'head.html': '<link ...> tags for fonts and icons',
+    'footer.html': '<footer class=\\"footer\\">...</footer>',
+    'styles.css': 'complete CSS',
+    'script.js': 'complete JavaScript'
+}
+
+
+def _layout_prompt(enhanced_data, required_pages, color_scheme, design_style, wanted, layout):
+    """Prompt for the wanted layout keys and page bodies; a retry describes the layout it already has"""
+    wanted_json = ',\n  '.join(
+        f'"{key}": "{LAYOUT_EXAMPLES.get(key, "content of <main> only")}"' for key in wanted
+    )
+    if all(key in layout for key in LAYOUT_REQUIRED_KEYS):
+        css_classes = sorted(set(re.findall(r'\.([a-zA-Z][\w-]*)', layout['styles.css'])))
+        design = f"""SHARED LAYOUT (already written - do not write CSS, JS, navigation or footer):
+Business name: {layout.get('business_name', 'BusinessName')}
+{layout.get('design_notes', '')}
+Available CSS classes: {', '.join(css_classes[:300])}"""
+    else:
+        design = f"""Write the shared layout ONCE: head.html (extra <head> tags such as fonts and icon libraries), footer.html,
+styles.css (reset, :root color variables, navbar incl. .scrolled and mobile hamburger menu, hero, buttons
+.btn/.btn-primary/.btn-secondary, cards, grids, team, testimonials, forms, footer, page header, responsive
+breakpoints) and script.js (mobile menu toggle for #navToggle/#navMenu, navbar scroll effect, smooth scroll,
+scroll reveal animations, form handling)."""
+    briefs = '\n'.join(
+        f"- {page}.html: {PAGE_BRIEFS.get(page, f'{page.capitalize()} page: an appropriate layout for its purpose, with relevant images and content sections.')}"
+        for page in required_pages if f'{page}.html' in wanted
+    )
+    
+    return f"""You are a world-class web designer creating a multi-page website. The server assembles every page from
+the shared layout and the page's content, so never repeat shared parts in a page.
+
+PROJECT: {enhanced_data.get('enhanced_description', '')}
+Business Type: {enhanced_data.get('business_type', 'general')}
+Target Audience: {enhanced_data.get('target_audience', 'general audience')}
+Key Features: {', '.join(enhanced_data.get('key_features', []))}
+DESIGN THEME: {design_style}
+COLORS: primary {color_scheme['primary']}, secondary {color_scheme['secondary']}, accent {color_scheme['accent']}, background {color_scheme['bg']}, text {color_scheme['text']}
+
+Every page gets this EXACT navigation before its content and the footer after it (the server inserts both):
+{build_nav(required_pages)}
+
+{design}
+
+PAGES (each value is ONLY the sections that go inside <main> - no <html>, <head>, <body>, <nav>, <footer> or <script src>):
+{briefs}
+
+RULES:
+- Only add small inline <style> for page-specific details; use the shared classes
+- Images: https://picsum.photos/id/[ID]/[width]/[height] (team: 64,65,91,177,203,216,223,237,243; tech: 0,180,367,431,487)
+- Professional, engaging copy with realistic names, stats and testimonials
+- Fully responsive
+
+Return ONLY this JSON object (no markdown), keys in this order:
+{{
+  {wanted_json}
+}}"""
+
+
+def render_layout_page(body, page, required_pages, layout):
+    """A complete page from its <main> content and the shared layout, with this page's link active"""
+    body = _strip_code_fence(body)
+    # Models sometimes return a whole document or repeat shared parts anyway; the layout's copies win
+    document_body = re.search(r'<body[^>]*>(.*)</body>', body, re.IGNORECASE | re.DOTALL)
+    if document_body:
+        body = document_body.group(1)
+    body = LAYOUT_SCRIPT_PATTERN.sub('', body)
+    if layout.get('footer.html'):
+        body = body.replace(layout['footer.html'], '')
+    main = re.search(r'<main\b[^>]*>(.*)</main>', body, re.IGNORECASE | re.DOTALL)
+    if main:
+        # Anything around <main> is a copy of the shared parts; footers inside it (quotes, cards) are content
+        body = main.group(1)
+    else:
+        body = LAYOUT_NAV_PATTERN.sub('', body, count=1)
+        body = LAYOUT_SITE_FOOTER_PATTERN.sub('', body, count=1)
+    
+    business_name = layout.get('business_name') or 'BusinessName'
+    title = 'Home' if page == 'index' else page.replace('-', ' ').title()
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+  <meta charset="UTF-8">
+  <meta name="viewport" content="width=device-width, initial-scale=1.0">
+  <title>{html.escape(title)} | {html.escape(business_name)}</title>
+  {layout.get('head.html') or LAYOUT_DEFAULT_HEAD}
+  <link rel="stylesheet" href="styles.css">
+</head>
+<body>
+{build_nav(required_pages, business_name, active=page)}
+<main>
+{body.strip()}
+</main>
+{layout['footer.html']}
+<script src="script.js"></script>
+</body>
+</html>"""
+
+
+def generate_website_layout(enhanced_data, required_pages, color_scheme, design_style, progress=None, on_file=None, max_attempts=2):
+    """
+    One streamed response with the shared layout (business name, <head> extras, footer, CSS,
+    JS) written once and only the <main> content of each page; pages are assembled locally
+    around the same navigation and footer. Shared markup is not paid for once per page, and
+    navigation is identical on every page by construction. A broken response is retried for
+    the missing parts only.
+    """
+    progress = progress or _no_progress
+    on_file = on_file or (lambda filename, content: None)
+    page_files = [f'{page}.html' for page in required_pages]
+    layout = {}
+    bodies = {}  # Page bodies that arrived before the layout they are assembled with
+    files_dict = {}
+    
+    def accept(key, value):
+        # Parts already accepted stay as they are: assembled pages were built with them
+        if not isinstance(value, str) or key in layout or key in files_dict:
+            return
+        try:
+            if key in ('styles.css', 'script.js'):
+                validate_generated_file(key, value)
+                files_dict[key] = value
+                on_file(key, value)
+            if key in LAYOUT_KEYS:
+                layout[key] = value
+            elif key in page_files:
+                bodies[key] = value
+        except ValueError as e:
+            print(f"   ⚠️ {key} rejected: {str(e)}")
+            return
+        
+        if not all(required in layout for required in LAYOUT_REQUIRED_KEYS):
+            return
+        for filename in list(bodies):
+            page_html = render_layout_page(bodies.pop(filename), filename[:-5], required_pages, layout)
+            try:
+                validate_generated_file(filename, page_html)
+            except ValueError as e:
+                # Left missing so the next attempt asks for it again
+                print(f"   ⚠️ {filename} rejected: {str(e)}")
+                continue
+            files_dict[filename] = page_html
+            print(f"   📄 {filename}: {len(page_html)} chars")
+            on_file(filename, page_html)
+            progress(files=list(files_dict), force=True)
+    
+    last_error = None
+    for attempt in range(max_attempts):
+        wanted = [key for key in LAYOUT_KEYS if key not in layout] + [filename for filename in page_files if filename not in files_dict]
+        if attempt and layout:
+            # The layout is settled; only required parts that never arrived are asked for again
+            wanted = [key for key in wanted if key not in LAYOUT_KEYS or key in LAYOUT_REQUIRED_KEYS]
+        prompt = _layout_prompt(enhanced_data, required_pages, color_scheme, design_style, wanted, layout)
+        progress(stage='generating', step='layout', attempt=attempt + 1, files=list(files_dict), force=True)
+        
+        try:
+            with llm_metrics.measure('layout') as metric:
+                with limiter.slot():
+                    response = limiter.call(
+                        llm_providers.generate, prompt, 'layout', temperature=1.0, max_output_tokens=65536, stream=True
+                    )
+                    parser = JsonObjectStream()
+                    parse_error = None
+                    chunks = []
+                    for text in limiter.stream(response):
+                        chunks.append(text)
+                        if parse_error:
+                            continue
+                        try:
+                            with metric.parsing():
+                                entries = parser.feed(text)
+                        except ValueError as e:
+                            # Keep reading: the rest of the response is salvaged below
+                            parse_error = e
+                            continue
+                        for key, value in entries:
+                            with metric.parsing():
+                                accept(key, value)
+                
+                if parse_error or not parser.complete:
+                    with metric.parsing():
+                        salvaged = salvage_file_entries(''.join(chunks), extra_keys=('business_name', 'design_notes'))
+                        for key, value in salvaged.items():
+                            accept(key, value)
+                    print(f"🩹 Layout response {'malformed' if parse_error else 'truncated'}; salvaged {len(salvaged)} entries")
+            
+            missing = [key for key in LAYOUT_REQUIRED_KEYS if key not in layout] + [filename for filename in page_files if filename not in files_dict]
+            if missing:
+                raise ValueError(f"Layout response is missing {', '.join(missing)}")
+            break
+        except LLMUnavailable:
+            raise
+        except Exception as e:
+            last_error = e
+            print(f"❌ Layout attempt {attempt + 1} failed: {str(e)}")
+    else:
+        raise Exception(f"AI generation failed after {max_attempts} attempts. Last error: {str(last_error)}")
+    
+    progress(stage='validating', force=True)
+    result = {filename: files_dict[filename] for filename in page_files}
+    result['styles.css'] = files_dict['styles.css']
+    result['script.js'] = files_dict['script.js']
+    print(f"\n✅ Generation Successful! {len(page_files)} pages assembled from one shared layout")
+    return result
+
+
 def regenerate_website(original_description: str, improvements: str, original_html: str = None) -> str:
     """
     Regenerate/improve an existing website with user feedback using iterative AI editing.
@@ -909,31 +1495,134 @@ STRUCTURE:
 Generate the ENHANCED, COMPLETE HTML now:"""
 
     try:
-        response = model.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
+        with llm_metrics.measure('regenerate') as metric:
+            response = limiter.call(
+                llm_providers.generate,
+                prompt,
+                'regenerate',
                 temperature=1.0,  # Max creativity
                 max_output_tokens=65536,  # Maximum possible
+                queue_timeout=Config.LLM_REQUEST_QUEUE_TIMEOUT_SECONDS
             )
-        )
-        
-        improved_html = response.text.strip()
-        
-        # Clean up markdown code blocks if present
-        if '```html' in improved_html:
-            improved_html = improved_html.split('```html')[1].split('```')[0].strip()
-        elif '```' in improved_html:
-            improved_html = improved_html.split('```')[1].split('```')[0].strip()
-        
-        if not improved_html.strip().lower().startswith(('<!doctype', '<html')):
-            raise ValueError("Generated content is not valid HTML")
+            
+            with metric.parsing():
+                improved_html = response.strip()
+                
+                # Clean up markdown code blocks if present
+                if '```html' in improved_html:
+                    improved_html = improved_html.split('```html')[1].split('```')[0].strip()
+                elif '```' in improved_html:
+                    improved_html = improved_html.split('```')[1].split('```')[0].strip()
+                
+                if not improved_html.strip().lower().startswith(('<!doctype', '<html')):
+                    raise ValueError("Generated content is not valid HTML")
         
         return improved_html
         
+    except LLMUnavailable:
+        raise
     except Exception as e:
         raise Exception(f"Regeneration failed: {str(e)}")
 
 
+# Sections a single patch may rewrite; larger requests are better served by regenerating
+PATCH_MAX_SECTIONS = 8
+PATCH_BLOCK_PATTERN = re.compile(r'<<<SECTION (\S+)>>>\n(.*?)\n<<<END>>>', re.DOTALL)
+
+
+def _parse_json_object(text):
+    """First JSON object in a model response (code fences and surrounding prose are ignored)"""
+    parser = JsonObjectStream()
+    text = _strip_code_fence(text)
+    try:
+        return json.loads(text[text.index('{'):text.rindex('}') + 1])
+    except ValueError:
+        entries = dict(parser.feed(text))
+        if not parser.complete:
+            raise ValueError('Response is not a JSON object')
+        return entries
+
+
+def patch_website(original_description: str, improvements: str, files: dict) -> tuple:
+    """
+    Apply a change request to only the sections it concerns: the model picks sections from
+    an outline of the whole site, rewrites just those, and each rewrite is applied wherever
+    the section occurs (shared navigation and footers on every page).
+    
+    Returns:
+        (updated files, changed file names, patched section ids)
+    """
+    sections = split_site(files)
+    if not sections:
+        raise ValueError("Website has no editable sections")
+    
+    plan_prompt = f"""You are editing an existing multi-page website. Choose which sections must change to fulfil the request.
+
+ORIGINAL REQUEST: "{original_description[:500]}"
+USER CHANGES REQUESTED: "{improvements}"
+
+SITE SECTIONS (id [size] description). "shared" sections appear on several pages and are edited once:
+{site_outline(sections)}
+
+Pick the FEWEST sections that fulfil the request (at most {PATCH_MAX_SECTIONS}). To ADD content, pick the section next to where it belongs.
+Colors, fonts and spacing usually live in styles.css sections.
+
+Return ONLY a JSON object: {{"sections": ["id", ...]}}"""
+    
+    with llm_metrics.measure('plan') as metric:
+        response = limiter.call(
+            llm_providers.generate, plan_prompt, 'plan', temperature=0.2, max_output_tokens=1024,
+            queue_timeout=Config.LLM_REQUEST_QUEUE_TIMEOUT_SECONDS
+        )
+        with metric.parsing():
+            plan = _parse_json_object(response)
+    requested = plan.get('sections')
+    if not isinstance(requested, list):
+        requested = []
+    chosen = [section_id for section_id in requested if isinstance(section_id, str) and section_id in sections][:PATCH_MAX_SECTIONS]
+    if not chosen:
+        raise ValueError("Could not tell which part of the website the request refers to")
+    print(f"🩹 Patching {len(chosen)} of {len(sections)} sections: {', '.join(chosen)}")
+    
+    blocks = '\n\n'.join(f"<<<SECTION {section_id}>>>\n{sections[section_id]['source']}\n<<<END>>>" for section_id in chosen)
+    patch_prompt = f"""You are editing sections of an existing website. Rewrite ONLY the sections below to fulfil the request.
+
+ORIGINAL REQUEST: "{original_description[:500]}"
+USER CHANGES REQUESTED: "{improvements}"
+
+RULES:
+- Keep each section's outer element, class names and links unless the request changes them
+- Change only what the request asks for; keep everything else byte-for-byte
+- A section may be replaced by several elements (e.g. to add a new section after it)
+- CSS sections stay plain CSS, JavaScript sections stay plain JavaScript
+- Images: https://picsum.photos/id/[ID]/[width]/[height]
+
+SECTIONS:
+{blocks}
+
+Return ONLY a JSON object mapping each section id to its complete new source:
+{{"{chosen[0]}": "..."}}"""
+    
+    max_output_tokens = min(65536, max(2048, sum(len(sections[section_id]['source']) for section_id in chosen) // 2))
+    with llm_metrics.measure('patch') as metric:
+        response = limiter.call(
+            llm_providers.generate, patch_prompt, 'patch', temperature=0.7, max_output_tokens=max_output_tokens,
+            queue_timeout=Config.LLM_REQUEST_QUEUE_TIMEOUT_SECONDS
+        )
+        with metric.parsing():
+            patches = _parse_json_object(response)
+            patches = {
+                section_id: _strip_code_fence(content) for section_id, content in patches.items()
+                if section_id in chosen and isinstance(content, str)
+            }
+            
+            updated, changed = apply_patches(files, sections, patches)
+            for filename in changed:
+                validate_generated_file(filename, updated[filename])
+    
+    return updated, changed, sorted(patches)
+
+
 def get_website_suggestions(description: str) -> dict:
     """
     Get AI suggestions for improving a website description.
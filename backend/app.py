@@ -1,17 +1,36 @@
-from flask import Flask, request, jsonify, send_from_directory, send_file
+from flask import Flask, request, jsonify, send_from_directory, send_file, session, Response, stream_with_context
 from flask_cors import CORS
 from config import Config
-from models import db, User, Seller, Category, Template, Purchase, Review, AIWebsite, Payment, TemplateCustomization
-from auth import create_token, token_required, role_required
+from models import db, User, Seller, Category, Template, Purchase, Review, AIWebsite, Payment, TemplateCustomization, Job, UploadedArtifact, AIGenerationMetric
+from auth import create_token, decode_token, token_required, role_required
+from jobs import JobQueue
+import prompt_cache
+from llm_limiter import limiter, LLMUnavailable
+import llm_providers
+import llm_metrics
+from upload import (
+    handle_template_upload, handle_image_upload, create_upload_session, store_upload_chunk,
+    upload_session_status, finalize_upload_session
+)
+from template_ingest import run_ingest, load_manifest, is_ingested, artifacts_dir, remove_artifacts, INGEST_STAGES
 from werkzeug.utils import secure_filename
-from datetime import datetime
+from werkzeug.datastructures import FileStorage
+from datetime import datetime, timedelta
+from collections import OrderedDict
+from mimetypes import guess_type
 import os
+import io
+import re
+import csv
+import json
+import time
+import threading
+import uuid
 import zipfile
 import shutil
 import jwt
-from ai_generator import generate_website, regenerate_website, get_website_suggestions
+from ai_generator import generate_website, regenerate_website, patch_website, get_website_suggestions
 from jazzcash_payment import JazzCashPayment
-import google.generativeai as genai
 
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -23,16 +42,17 @@ CORS(app,
      allow_headers=['Content-Type', 'Authorization'],
      methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
 
-# Configure Gemini for prompt improvement
-try:
-    genai.configure(api_key=Config.GEMINI_API_KEY)
-    model = genai.GenerativeModel('gemini-2.5-pro')
-except Exception as e:
-    print(f"⚠️ Gemini configuration failed: {e}")
-    model = None
-
 db.init_app(app)
 
+# Background worker pools
+customization_queue = JobQueue('customize', Config.CUSTOMIZATION_JOB_WORKERS, kinds=('customization', 'customization_batch'))
+ingest_queue = JobQueue('ingest', Config.INGEST_JOB_WORKERS)
+ai_generation_queue = JobQueue('ai', Config.AI_JOB_WORKERS)
+
+# Customized preview pages keyed by page identity and details hash (LRU)
+_preview_cache = OrderedDict()
+_preview_cache_lock = threading.Lock()
+
 # Create upload directories
 os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(Config.TEMPLATE_FOLDER, exist_ok=True)
@@ -356,68 +376,68 @@ def get_current_user():
 
 # ==================== UPLOAD ROUTES ====================
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
-
 @app.route('/api/upload/template', methods=['POST'])
 @token_required
 @role_required(['seller', 'admin'])
 def upload_template_file():
     """Upload and extract template ZIP file"""
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file provided'}), 400
-    
-    file = request.files['file']
-    
-    if file.filename == '':
-        return jsonify({'error': 'No file selected'}), 400
-    
-    if not allowed_file(file.filename):
-        return jsonify({'error': 'Invalid file type. Only ZIP files allowed'}), 400
-    
-    filename = secure_filename(file.filename)
-    timestamp = int(datetime.utcnow().timestamp())
-    unique_filename = f"{timestamp}_{filename}"
-    
-    file_path = os.path.join(Config.TEMPLATE_FOLDER, unique_filename)
-    file.save(file_path)
-    
-    extract_path = os.path.join(Config.TEMPLATE_FOLDER, f"{timestamp}_{filename.rsplit('.', 1)[0]}")
-    os.makedirs(extract_path, exist_ok=True)
-    
-    try:
-        with zipfile.ZipFile(file_path, 'r') as zip_ref:
-            zip_ref.extractall(extract_path)
-    except Exception as e:
-        return jsonify({'error': f'Failed to extract ZIP: {str(e)}'}), 400
-    
-    return jsonify({
-        'file_path': extract_path,
-        'original_filename': filename
-    }), 200
+    result, status = handle_template_upload()
+    return jsonify(result), status
+
+
+@app.route('/api/upload/template/sessions', methods=['POST'])
+@token_required
+@role_required(['seller', 'admin'])
+def create_template_upload_session():
+    """Start a chunked, resumable template upload"""
+    result, status = create_upload_session()
+    return jsonify(result), status
+
+
+@app.route('/api/upload/template/sessions/<session_id>', methods=['GET'])
+@token_required
+@role_required(['seller', 'admin'])
+def get_template_upload_session(session_id):
+    """Received and missing chunks of a resumable upload"""
+    result, status = upload_session_status(session_id)
+    return jsonify(result), status
+
+
+@app.route('/api/upload/template/sessions/<session_id>/chunks/<int:index>', methods=['PATCH', 'PUT'])
+@token_required
+@role_required(['seller', 'admin'])
+def upload_template_chunk(session_id, index):
+    """Store one chunk (raw request body) of a resumable upload"""
+    result, status = store_upload_chunk(session_id, index)
+    return jsonify(result), status
+
+
+@app.route('/api/upload/template/sessions/<session_id>/finalize', methods=['POST'])
+@token_required
+@role_required(['seller', 'admin'])
+def finalize_template_upload(session_id):
+    """Assemble, verify and extract a resumable upload"""
+    result, status = finalize_upload_session(session_id)
+    return jsonify(result), status
 
 
 @app.route('/api/upload/images', methods=['POST'])
 @token_required
 def upload_images():
     """Upload preview images"""
-    if 'images' not in request.files:
-        return jsonify({'error': 'No images provided'}), 400
-    
-    files = request.files.getlist('images')
-    uploaded_images = []
-    
-    for file in files:
-        if file and file.filename:
-            filename = secure_filename(file.filename)
-            timestamp = int(datetime.utcnow().timestamp())
-            unique_filename = f"{timestamp}_{filename}"
-            
-            file_path = os.path.join(Config.UPLOAD_FOLDER, 'images', unique_filename)
-            file.save(file_path)
-            uploaded_images.append(f"/uploads/images/{unique_filename}")
+    result, status = handle_image_upload()
+    return jsonify(result), status
+
+
+@app.route('/api/uploads/<sha256>', methods=['GET'])
+@token_required
+def get_uploaded_artifact(sha256):
+    """Look up previously uploaded templates/images by content hash"""
+    artifacts = UploadedArtifact.query.filter_by(sha256=sha256.lower()).all()
+    if not artifacts:
+        return jsonify({'error': 'No upload with this hash'}), 404
     
-    return jsonify({'images': uploaded_images}), 200
+    return jsonify({'artifacts': [artifact.to_dict() for artifact in artifacts]}), 200
 
 
 @app.route('/uploads/<path:filename>')
@@ -484,6 +504,35 @@ def get_template(template_id):
     return jsonify({'template': template.to_dict()}), 200
 
 
+ingest_queue.register('template_ingest', run_ingest)
+
+
+def _enqueue_ingest(template, approve_on_complete=False):
+    """Queue the ingest pipeline for a template and mark every stage pending"""
+    job_id = uuid.uuid4().hex
+    template.ingest_status = {
+        'status': 'queued',
+        'job_id': job_id,
+        'approve_on_complete': approve_on_complete,
+        'stages': {name: {'status': 'pending'} for name in INGEST_STAGES}
+    }
+    db.session.commit()
+    return ingest_queue.submit('template_ingest', request.user_id, {'template_id': template.id}, job_id=job_id)
+
+
+def _live_ingest_job(template):
+    """The job ingesting a template, unless its status was left behind by a worker that died"""
+    status = template.ingest_status or {}
+    if status.get('status') not in ('queued', 'running') or not status.get('job_id'):
+        return None
+    job = db.session.get(Job, status['job_id'])
+    if job is None or job.status not in ('queued', 'running'):
+        return None
+    if job.heartbeat_at is None or job.heartbeat_at < datetime.utcnow() - timedelta(seconds=Config.JOB_STALE_SECONDS):
+        return None
+    return job
+
+
 @app.route('/api/templates', methods=['POST'])
 @token_required
 @role_required(['seller', 'admin'])
@@ -510,16 +559,20 @@ def create_template():
         preview_images=data.get('preview_images', []),
         demo_url=data.get('demo_url'),
         file_path=data['file_path'],
-        status='approved' if request.user_role == 'admin' else 'pending',
+        status='pending',
         is_editable=data.get('is_editable', False)
     )
     
     db.session.add(template)
     db.session.commit()
     
+    # Admin uploads are approved as soon as ingest finishes; seller uploads wait for review
+    job = _enqueue_ingest(template, approve_on_complete=request.user_role == 'admin')
+    
     return jsonify({
         'message': 'Template created successfully',
-        'template': template.to_dict()
+        'template': template.to_dict(),
+        'ingest_job_id': job.id
     }), 201
 
 
@@ -564,6 +617,7 @@ def delete_template(template_id):
         if template.seller_id != seller.id:
             return jsonify({'error': 'Unauthorized'}), 403
     
+    remove_artifacts(template.id)
     db.session.delete(template)
     db.session.commit()
     
@@ -790,12 +844,46 @@ def get_pending_templates():
 @role_required(['admin'])
 def approve_template(template_id):
     template = Template.query.get_or_404(template_id)
+    
+    # Templates uploaded since the ingest pipeline existed must finish it first
+    if template.ingest_status and not is_ingested(template):
+        return jsonify({
+            'error': 'Template is still being processed',
+            'ingest_status': template.ingest_status
+        }), 409
+    
     template.status = 'approved'
     db.session.commit()
     
     return jsonify({'message': 'Template approved'}), 200
 
 
+@app.route('/api/admin/templates/<int:template_id>/ingest', methods=['POST'])
+@token_required
+@role_required(['admin'])
+def reingest_template(template_id):
+    """Re-run the ingest pipeline (e.g. after the template files changed or a stage failed)"""
+    template = Template.query.get_or_404(template_id)
+    
+    if _live_ingest_job(template):
+        return jsonify({'error': 'Ingest already in progress', 'ingest_status': template.ingest_status}), 409
+    
+    # A stale job must not be recovered and run alongside the new one
+    stale_job_id = (template.ingest_status or {}).get('job_id')
+    if stale_job_id:
+        Job.query.filter(Job.id == stale_job_id, Job.status.in_(['queued', 'running'])).update(
+            {'status': 'failed', 'error': 'Superseded by a new ingest'}, synchronize_session=False
+        )
+    
+    job = _enqueue_ingest(template)
+    
+    return jsonify({
+        'message': 'Ingest queued',
+        'job_id': job.id,
+        'status_url': f'/api/customizations/{job.id}'
+    }), 202
+
+
 @app.route('/api/admin/templates/<int:template_id>/reject', methods=['POST'])
 @token_required
 @role_required(['admin'])
@@ -814,8 +902,9 @@ def admin_delete_template(template_id):
     """Delete a template completely from the system"""
     template = Template.query.get_or_404(template_id)
     
-    # Delete template file if exists
-    if template.file_path and os.path.exists(template.file_path):
+    # Delete template file if exists (deduplicated uploads may be shared by several templates)
+    shared = Template.query.filter(Template.file_path == template.file_path, Template.id != template.id).count()
+    if template.file_path and os.path.exists(template.file_path) and not shared:
         import shutil
         try:
             if os.path.isdir(template.file_path):
@@ -824,6 +913,7 @@ def admin_delete_template(template_id):
                 os.remove(template.file_path)
         except Exception as e:
             print(f"Error deleting file: {e}")
+    remove_artifacts(template.id)
     
     # Delete from database
     db.session.delete(template)
@@ -876,73 +966,323 @@ def get_admin_stats():
     }), 200
 
 
-# ==================== AI WEBSITE GENERATOR ====================
-@app.route('/api/ai/generate', methods=['POST'])
+@app.route('/api/admin/ai/cache-stats', methods=['GET'])
 @token_required
-def ai_generate_website():
-    """Generate multi-page website using AI with improved diversity and quality"""
-    data = request.json
-    description = data.get('description', '')
-    user_preferences = data.get('preferences', {})
-    
-    if not description:
-        return jsonify({'error': 'Description is required'}), 400
+@role_required(['admin'])
+def get_prompt_cache_stats():
+    """Hit rates and size of the prompt enhancement/improvement cache"""
+    return jsonify({'cache': prompt_cache.cache_stats()}), 200
+
+
+@app.route('/api/admin/ai/provider', methods=['GET', 'PUT'])
+@token_required
+@role_required(['admin'])
+def admin_llm_provider():
+    """Show or switch the LLM provider for every worker (PUT {"provider": null} restores LLM_PROVIDER)"""
+    if request.method == 'PUT':
+        try:
+            llm_providers.set_provider((request.json or {}).get('provider'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
     
-    try:
-        import zipfile
-        import io
-        
-        # Generate website using AI module (returns dict of files)
-        generated_files = generate_website(description, user_preferences)
-        
-        # Log what was generated for debugging
-        print(f"Generated {len(generated_files)} files: {list(generated_files.keys())}")
+    return jsonify({
+        'provider': llm_providers.provider_name(),
+        'default': Config.LLM_PROVIDER,
+        'available': list(llm_providers.PROVIDERS)
+    }), 200
+
+
+@app.route('/api/admin/ai/limiter', methods=['GET'])
+@token_required
+@role_required(['admin'])
+def get_llm_limiter_metrics():
+    """Shared LLM limiter state (slots, token bucket, waiters, circuit) and the AI job backlog"""
+    jobs = dict(
+        db.session.query(Job.status, db.func.count(Job.id))
+        .filter(Job.kind == 'ai_generation', Job.status.in_(['queued', 'running']))
+        .group_by(Job.status).all()
+    )
+    return jsonify({
+        'limiter': limiter.metrics(),
+        'jobs': {'queued': jobs.get('queued', 0), 'running': jobs.get('running', 0)}
+    }), 200
+
+
+@app.route('/api/admin/ai/metrics', methods=['GET'])
+@token_required
+@role_required(['admin'])
+def get_ai_generation_metrics():
+    """
+    p50/p95 latency, time to first token, parse time and tokens per generation stage,
+    with failure/retry counts and estimated cost (?hours=24&provider=&website_id=)
+    """
+    hours = request.args.get('hours', 24, type=float)
+    website_id = request.args.get('website_id', type=int)
+    summary = llm_metrics.stage_summary(hours, request.args.get('provider'), website_id)
+    if website_id is not None:
+        rows = AIGenerationMetric.query.filter_by(ai_website_id=website_id).order_by(AIGenerationMetric.created_at).all()
+        summary['calls'] = [row.to_dict() for row in rows]
+    return jsonify({'metrics': summary}), 200
+
+
+# ==================== AI WEBSITE GENERATOR ====================
+def _ai_job_folder(job_id, user_id):
+    """Folder a generation job streams its files into"""
+    return f"{Config.AI_FOLDER}/user_{user_id}_{job_id}"
+
+
+def _generated_file_path(website_folder, filename):
+    """Path for a generated file name, or None if the name would escape the website folder"""
+    file_path = os.path.normpath(os.path.join(website_folder, filename))
+    if not file_path.startswith(os.path.normpath(website_folder) + os.sep):
+        return None
+    return file_path
+
+
+def _write_generated_file(website_folder, filename, content):
+    file_path = _generated_file_path(website_folder, filename)
+    if file_path is None:
+        print(f"⚠️ Skipping generated file with unsafe name: {filename}")
+        return
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, file_path)
+
+
+def _zip_ai_website(website_folder, generated_files):
+    """(Re)build the download ZIP next to the website folder"""
+    zip_path = f"{website_folder}.zip"
+    tmp_path = f"{zip_path}.tmp"
+    with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
         for filename in generated_files.keys():
-            content_length = len(generated_files[filename]) if isinstance(generated_files[filename], str) else 0
-            print(f"  - {filename}: {content_length} characters")
-        
+            file_path = _generated_file_path(website_folder, filename)
+            if file_path and os.path.exists(file_path):
+                zipf.write(file_path, filename)
+    os.replace(tmp_path, zip_path)
+
+
+def _save_ai_website(user_id, description, generated_files, website_folder=None):
+    """
+    ZIP generated files and record the AIWebsite. Without website_folder the files are
+    written to a new folder first; otherwise they were already streamed there.
+    """
+    # Log what was generated for debugging
+    print(f"Generated {len(generated_files)} files: {list(generated_files.keys())}")
+    for filename in generated_files.keys():
+        content_length = len(generated_files[filename]) if isinstance(generated_files[filename], str) else 0
+        print(f"  - {filename}: {content_length} characters")
+    
+    if website_folder is None:
         # Create directory for this website
         timestamp = int(datetime.utcnow().timestamp())
-        website_folder = f"{Config.AI_FOLDER}/user_{request.user_id}_{timestamp}"
+        website_folder = f"{Config.AI_FOLDER}/user_{user_id}_{timestamp}"
         os.makedirs(website_folder, exist_ok=True)
         
         # Save all generated files
         for filename, content in generated_files.items():
-            file_path = os.path.join(website_folder, filename)
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(content)
-        
-        # Create ZIP file
-        zip_path = f"{website_folder}.zip"
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for filename in generated_files.keys():
-                file_path = os.path.join(website_folder, filename)
-                zipf.write(file_path, filename)
-        
-        # Save AI website to database
-        ai_website = AIWebsite(
-            user_id=request.user_id,
-            description=description,
-            generated_files=generated_files,
-            file_path=website_folder
+            _write_generated_file(website_folder, filename, content)
+    else:
+        # Drop files streamed by a failed attempt that the final result does not contain
+        for root, dirs, files in os.walk(website_folder):
+            for name in files:
+                relative = os.path.relpath(os.path.join(root, name), website_folder).replace(os.sep, '/')
+                if relative not in generated_files:
+                    os.remove(os.path.join(root, name))
+    
+    _zip_ai_website(website_folder, generated_files)
+    
+    # Save AI website to database
+    ai_website = AIWebsite(
+        user_id=user_id,
+        description=description,
+        generated_files=generated_files,
+        file_path=website_folder
+    )
+    
+    db.session.add(ai_website)
+    db.session.commit()
+    return ai_website
+
+
+def _run_ai_generation_job(progress, user_id, description, preferences):
+    """
+    Background body of /api/ai/generate: enhance, generate, validate, then package.
+    Files are written as they stream in, so clients can show pages before generation ends.
+    """
+    website_folder = _ai_job_folder(progress.job_id, user_id)
+    shutil.rmtree(website_folder, ignore_errors=True)  # Partial output of an interrupted run
+    os.makedirs(website_folder, exist_ok=True)
+    
+    # Stage metrics are saved with the job (and the website, once there is one) even if it fails
+    with llm_metrics.recording(job_id=progress.job_id, user_id=user_id) as metric_tags:
+        generated_files = generate_website(
+            description, preferences, progress=progress,
+            on_file=lambda filename, content: _write_generated_file(website_folder, filename, content)
         )
         
-        db.session.add(ai_website)
-        db.session.commit()
-        
-        return jsonify({
-            'message': 'Website generated successfully',
-            'website': ai_website.to_dict(),
-            'preview': generated_files.get('index.html', ''),
-            'download_url': f'/api/ai/websites/{ai_website.id}/download',
-            'files': list(generated_files.keys())
-        }), 201
-        
-    except Exception as e:
-        print(f"AI Generation Error: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({'error': f'Failed to generate website: {str(e)}'}), 500
+        progress(stage='packaging', force=True)
+        ai_website = _save_ai_website(user_id, description, generated_files, website_folder)
+        metric_tags['ai_website_id'] = ai_website.id
+    
+    return {
+        'website_id': ai_website.id,
+        'download_url': f'/api/ai/websites/{ai_website.id}/download',
+        'files': list(generated_files.keys())
+    }
+
+
+ai_generation_queue.register('ai_generation', _run_ai_generation_job)
+
+
+@app.before_request
+def _start_job_recovery():
+    # Lazily, so the heartbeat threads run in serving workers rather than in scripts importing the app
+    for queue in (ai_generation_queue, customization_queue, ingest_queue):
+        queue.start(app)
+
+
+# ==================== AI WEBSITE GENERATOR ====================
+@app.route('/api/ai/generate', methods=['POST'])
+@token_required
+def ai_generate_website():
+    """
+    Queue a multi-page website generation and return its job id right away.
+    Follow progress (enhancing, generating, validating, packaging) via
+    /api/ai/jobs/<job_id> or the /events stream.
+    """
+    data = request.json
+    description = data.get('description', '')
+    user_preferences = data.get('preferences', {})
+    
+    if not description:
+        return jsonify({'error': 'Description is required'}), 400
+    
+    job = ai_generation_queue.submit('ai_generation', request.user_id, {
+        'user_id': request.user_id,
+        'description': description,
+        'preferences': user_preferences
+    })
+    
+    return jsonify({
+        'message': 'Website generation queued',
+        'job_id': job.id,
+        'status_url': f'/api/ai/jobs/{job.id}',
+        'events_url': f'/api/ai/jobs/{job.id}/events'
+    }), 202
+
+
+def _get_ai_job(job_id, user_id, role):
+    """(job, error response) for a generation job the user may see"""
+    job = db.session.get(Job, job_id)
+    if job is None or job.kind != 'ai_generation':
+        return None, (jsonify({'error': 'Job not found'}), 404)
+    if job.user_id != user_id and role != 'admin':
+        return None, (jsonify({'error': 'Unauthorized'}), 403)
+    return job, None
+
+
+def _job_snapshot(job):
+    return {'status': job.status, 'progress': job.progress or {}, 'result': job.result, 'error': job.error}
+
+
+@app.route('/api/ai/jobs/<job_id>', methods=['GET'])
+@token_required
+def get_ai_generation_job(job_id):
+    """
+    Status of a generation job. With ?wait=<seconds> (max 25) this long-polls:
+    it returns as soon as the status or progress differs from ?stage=<last seen stage>.
+    """
+    job, error = _get_ai_job(job_id, request.user_id, request.user_role)
+    if error:
+        return error
+    
+    wait = min(max(request.args.get('wait', 0, type=float), 0), 25)
+    last_stage = request.args.get('stage') or None
+    deadline = time.monotonic() + wait
+    while (job.status in ('queued', 'running') and time.monotonic() < deadline
+           and (job.progress or {}).get('stage') == last_stage):
+        time.sleep(0.5)
+        db.session.refresh(job)
+    
+    return jsonify({'job': job.to_dict()}), 200
+
+
+@app.route('/api/ai/jobs/<job_id>/events', methods=['GET'])
+def stream_ai_generation_job(job_id):
+    """
+    Server-Sent Events stream of a generation job's stages. EventSource cannot send
+    headers, so the token may be passed as ?token=. The stream closes after
+    AI_EVENTS_MAX_SECONDS (before the worker timeout) and the browser reconnects.
+    """
+    token = request.args.get('token') or request.headers.get('Authorization', '').replace('Bearer ', '')
+    payload = decode_token(token) if token else None
+    if not payload:
+        return jsonify({'error': 'Token is missing or invalid'}), 401
+    
+    job, error = _get_ai_job(job_id, payload['user_id'], payload['role'])
+    if error:
+        return error
+    
+    website_folder = _ai_job_folder(job.id, job.user_id)
+    
+    def events():
+        deadline = time.monotonic() + Config.AI_EVENTS_MAX_SECONDS
+        last = None
+        last_sent = time.monotonic()
+        sent_files = set()
+        yield 'retry: 2000\n\n'
+        while time.monotonic() < deadline:
+            db.session.expire_all()
+            current = db.session.get(Job, job_id)
+            snapshot = _job_snapshot(current)
+            if snapshot != last:
+                last = snapshot
+                last_sent = time.monotonic()
+                
+                # Push each finished file once, so the first page can render before the last is generated
+                for filename in snapshot['progress'].get('files', []):
+                    file_path = _generated_file_path(website_folder, filename)
+                    if filename in sent_files or not file_path or not os.path.exists(file_path):
+                        continue
+                    sent_files.add(filename)
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        yield f'event: file\ndata: {json.dumps({"name": filename, "content": f.read()})}\n\n'
+                
+                event = 'done' if current.status in ('completed', 'failed') else 'progress'
+                yield f'event: {event}\ndata: {json.dumps(snapshot)}\n\n'
+                if event == 'done':
+                    return
+            elif time.monotonic() - last_sent > 15:
+                last_sent = time.monotonic()
+                yield ': keep-alive\n\n'
+            time.sleep(0.5)
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/ai/jobs/<job_id>/files/<path:filename>', methods=['GET'])
+@token_required
+def get_ai_generation_file(job_id, filename):
+    """A file a running (or finished) generation job has already written"""
+    job, error = _get_ai_job(job_id, request.user_id, request.user_role)
+    if error:
+        return error
+    
+    file_path = _generated_file_path(_ai_job_folder(job.id, job.user_id), filename)
+    if not file_path or filename not in (job.progress or {}).get('files', []) or not os.path.exists(file_path):
+        return jsonify({'error': 'File not generated yet'}), 404
+    
+    return send_file(os.path.abspath(file_path), mimetype=guess_type(filename)[0] or 'text/plain')
+
+
+def _llm_unavailable_response(error):
+    """503 telling the client when the AI provider is worth trying again"""
+    response = jsonify({'error': str(error), 'retry_after': round(error.retry_after or 1)})
+    response.headers['Retry-After'] = str(round(error.retry_after or 1))
+    return response, 503
 
 
 @app.route('/api/ai/improve-prompt', methods=['POST'])
@@ -955,8 +1295,16 @@ def improve_prompt():
     if not original_prompt:
         return jsonify({'error': 'Prompt is required'}), 400
     
+    cached = prompt_cache.get_cached('improve', original_prompt)
+    if cached is not None:
+        return jsonify({
+            'original_prompt': original_prompt,
+            'improved_prompt': cached,
+            'cached': True
+        }), 200
+    
     try:
-        # Use Gemini to improve the prompt
+        # Ask the configured LLM provider to improve the prompt
         improvement_prompt = f"""You are an expert at crafting detailed website requirements. A user wants to create a website and provided this description:
 
 "{original_prompt}"
@@ -973,14 +1321,22 @@ Write an improved prompt that is clear, detailed, and will help generate a bette
 
 Return ONLY the improved prompt text, no explanations or additional formatting."""
 
-        response = model.generate_content(improvement_prompt)
-        improved_prompt = response.text.strip()
+        with llm_metrics.recording(user_id=request.user_id), llm_metrics.measure('improve'):
+            response = limiter.call(
+                llm_providers.generate, improvement_prompt, 'improve',
+                queue_timeout=Config.LLM_REQUEST_QUEUE_TIMEOUT_SECONDS
+            )
+        improved_prompt = response.strip()
+        if improved_prompt:
+            prompt_cache.store('improve', original_prompt, improved_prompt)
         
         return jsonify({
             'original_prompt': original_prompt,
             'improved_prompt': improved_prompt
         }), 200
         
+    except LLMUnavailable as e:
+        return _llm_unavailable_response(e)
     except Exception as e:
         print(f"Prompt Improvement Error: {str(e)}")
         import traceback
@@ -1005,25 +1361,31 @@ def ai_regenerate_website(website_id):
     if not improvements:
         return jsonify({'error': 'Modification request is required'}), 400
     
+    # patch (default) rewrites only the sections the request concerns, across every page;
+    # rewrite regenerates the home page as a whole
+    mode = data.get('mode', 'patch')
+    files = dict(ai_website.generated_files or {})
+    
     try:
-        # Get original HTML
-        original_html = ai_website.generated_files.get('index.html', '')
-        
-        # Regenerate with improvements
-        generated_html = regenerate_website(
-            ai_website.description,
-            improvements,
-            original_html
-        )
+        with llm_metrics.recording(ai_website_id=ai_website.id, user_id=request.user_id):
+            if mode == 'patch' and any(filename.endswith('.html') for filename in files):
+                files, changed_files, sections = patch_website(ai_website.description, improvements, files)
+            else:
+                files['index.html'] = regenerate_website(
+                    ai_website.description,
+                    improvements,
+                    files.get('index.html', '')
+                )
+                changed_files, sections = ['index.html'], []
         
-        # Save updated HTML
+        # Save updated files and refresh the download
         if ai_website.file_path and os.path.exists(ai_website.file_path):
-            html_file_path = os.path.join(ai_website.file_path, 'index.html')
-            with open(html_file_path, 'w', encoding='utf-8') as f:
-                f.write(generated_html)
+            for filename in changed_files:
+                _write_generated_file(ai_website.file_path, filename, files[filename])
+            _zip_ai_website(ai_website.file_path, files)
         
         # Update the AI website
-        ai_website.generated_files = {'index.html': generated_html}
+        ai_website.generated_files = files
         ai_website.description = f"{ai_website.description}\n\n[Modifications: {improvements}]"
         db.session.commit()
         
@@ -1031,9 +1393,13 @@ def ai_regenerate_website(website_id):
             'message': 'Website updated successfully',
             'website': ai_website.to_dict(),
             'id': ai_website.id,
-            'preview': generated_html
+            'changed_files': changed_files,
+            'sections': sections,
+            'preview': files.get('index.html', '')
         }), 200
         
+    except LLMUnavailable as e:
+        return _llm_unavailable_response(e)
     except Exception as e:
         print(f"Regeneration Error: {str(e)}")
         return jsonify({'error': f'Failed to update website: {str(e)}'}), 500
@@ -1542,29 +1908,115 @@ def debug_template(template_id):
 def serve_uploaded_file(filename):
     return send_from_directory(Config.UPLOAD_FOLDER, filename)
 
+def _locate_template_root(template):
+    """Resolve a template's absolute path and the directory holding its index.html"""
+    template_path = template.file_path
+    if not os.path.isabs(template_path):
+        template_path = os.path.join(os.getcwd(), template_path)
+    
+    template_path = os.path.abspath(template_path)
+    
+    # Ingested templates know their root without walking the tree
+    manifest = load_manifest(template)
+    if manifest:
+        template_root = os.path.normpath(os.path.join(template_path, manifest['root']))
+        return template_path, template_root, os.path.join(template_path, manifest['index']) if manifest['index'] else None
+    
+    # Find index.html and template root
+    index_html_path = None
+    template_root = template_path
+    
+    for root, dirs, files in os.walk(template_path):
+        if 'index.html' in files:
+            index_html_path = os.path.join(root, 'index.html')
+            template_root = root
+            break
+    
+    return template_path, template_root, index_html_path
+
+
+def _inject_base_tag(html_content, base_url):
+    """Inject a <base> tag so relative asset paths resolve against the preview route"""
+    if '<base' not in html_content.lower():
+        base_tag = f'<base href="{base_url}">'
+        # Case-insensitive replacement for <head>
+        if re.search(r'<head>', html_content, re.IGNORECASE):
+            html_content = re.sub(r'(<head>)', f'\\1\n    {base_tag}', html_content, count=1, flags=re.IGNORECASE)
+        elif re.search(r'<html', html_content, re.IGNORECASE):
+            html_content = re.sub(r'(<html[^>]*>)', f'\\1\n<head>\n    {base_tag}\n</head>', html_content, count=1, flags=re.IGNORECASE)
+    return html_content
+
+
+def _resolve_template_file(template_path, template_root, filepath):
+    """Find a file in the template tree, falling back to a recursive search by name"""
+    file_path = os.path.abspath(os.path.join(template_root, filepath))
+    
+    # If file doesn't exist in direct path, search recursively
+    if not os.path.exists(file_path):
+        for root, dirs, files in os.walk(template_path):
+            if os.path.basename(filepath) in files:
+                file_path = os.path.join(root, os.path.basename(filepath))
+                break
+    
+    return file_path
+
+
+def _send_precomputed_asset(template, manifest, template_path, template_root, filepath):
+    """Serve an ingested template's file, preferring its WebP, gzip or minified derivative"""
+    relative = os.path.relpath(os.path.abspath(os.path.join(template_root, filepath)), template_path).replace(os.sep, '/')
+    if relative not in manifest['files']:
+        relative = manifest['by_name'].get(os.path.basename(filepath))
+        if relative is None:
+            return jsonify({'error': f'File not found: {filepath}'}), 404
+    
+    entry = manifest['files'][relative]
+    out_dir = os.path.abspath(artifacts_dir(template.id))
+    
+    if entry.get('webp') and 'image/webp' in request.headers.get('Accept', ''):
+        response = send_file(os.path.join(out_dir, 'images', f'{relative}.webp'), mimetype='image/webp')
+        response.vary.add('Accept')
+        return response
+    
+    if entry.get('gzip') and 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = send_file(os.path.join(out_dir, 'assets', f'{relative}.gz'), mimetype=entry['mimetype'])
+        response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+        return response
+    
+    if entry.get('minified'):
+        return send_file(os.path.join(out_dir, 'assets', relative), mimetype=entry['mimetype'])
+    
+    return send_file(os.path.join(template_path, relative), mimetype=entry['mimetype'])
+
+
+def _send_template_asset(template, template_path, template_root, filepath):
+    """Serve a CSS/JS/image file from the template tree"""
+    manifest = load_manifest(template)
+    if manifest:
+        return _send_precomputed_asset(template, manifest, template_path, template_root, filepath)
+    
+    file_path = _resolve_template_file(template_path, template_root, filepath)
+    
+    # Security check
+    if not file_path.startswith(template_path):
+        return jsonify({'error': 'Invalid file path'}), 403
+    
+    if not os.path.exists(file_path):
+        return jsonify({'error': f'File not found: {filepath}'}), 404
+    
+    # Determine mimetype
+    mimetype, _ = guess_type(file_path)
+    
+    return send_file(file_path, mimetype=mimetype)
+
+
 @app.route('/api/templates/<int:template_id>/preview')
 @app.route('/api/templates/<int:template_id>/preview/<path:filepath>')
 def serve_template_file(template_id, filepath='index.html'):
     """Serve template files for preview with full asset support"""
     try:
         template = Template.query.get_or_404(template_id)
-        
-        # Get absolute path
-        template_path = template.file_path
-        if not os.path.isabs(template_path):
-            template_path = os.path.join(os.getcwd(), template_path)
-        
-        template_path = os.path.abspath(template_path)
-        
-        # Find index.html and template root
-        index_html_path = None
-        template_root = template_path
-        
-        for root, dirs, files in os.walk(template_path):
-            if 'index.html' in files:
-                index_html_path = os.path.join(root, 'index.html')
-                template_root = root
-                break
+        template_path, template_root, index_html_path = _locate_template_root(template)
         
         # Serve index.html with base tag injection
         if filepath == 'index.html':
@@ -1574,43 +2026,12 @@ def serve_template_file(template_id, filepath='index.html'):
             # Read and modify HTML
             with open(index_html_path, 'r', encoding='utf-8', errors='ignore') as f:
                 html_content = f.read()
-            # Inject base tag for relative paths
-            base_url = f'http://localhost:5000/api/templates/{template_id}/preview/'
-            if '<base' not in html_content.lower():
-                base_tag = f'<base href="{base_url}">'
-                # Case-insensitive replacement for <head>
-                import re
-                if re.search(r'<head>', html_content, re.IGNORECASE):
-                    html_content = re.sub(r'(<head>)', f'\\1\n    {base_tag}', html_content, count=1, flags=re.IGNORECASE)
-                elif re.search(r'<html', html_content, re.IGNORECASE):
-                    html_content = re.sub(r'(<html[^>]*>)', f'\\1\n<head>\n    {base_tag}\n</head>', html_content, count=1, flags=re.IGNORECASE)
+            html_content = _inject_base_tag(html_content, f'{request.host_url}api/templates/{template_id}/preview/')
             
-            from flask import Response
             return Response(html_content, mimetype='text/html')
         
         # Serve other files (CSS, JS, images, etc.)
-        # Try to find the file in the template directory
-        file_path = os.path.abspath(os.path.join(template_root, filepath))
-        
-        # If file doesn't exist in direct path, search recursively
-        if not os.path.exists(file_path):
-            for root, dirs, files in os.walk(template_path):
-                if os.path.basename(filepath) in files:
-                    file_path = os.path.join(root, os.path.basename(filepath))
-                    break
-        
-        # Security check
-        if not file_path.startswith(template_path):
-            return jsonify({'error': 'Invalid file path'}), 403
-        
-        if not os.path.exists(file_path):
-            return jsonify({'error': f'File not found: {filepath}'}), 404
-        
-        # Determine mimetype
-        from mimetypes import guess_type
-        mimetype, _ = guess_type(file_path)
-        
-        return send_file(file_path, mimetype=mimetype)
+        return _send_template_asset(template, template_path, template_root, filepath)
         
     except Exception as e:
         print(f"Preview Error: {str(e)}")
@@ -1618,6 +2039,85 @@ def serve_template_file(template_id, filepath='index.html'):
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+
+def _get_preview_page(cache_key):
+    """Look up a customized preview page, marking it most recently used"""
+    with _preview_cache_lock:
+        html_content = _preview_cache.get(cache_key)
+        if html_content is not None:
+            _preview_cache.move_to_end(cache_key)
+        return html_content
+
+
+def _put_preview_page(cache_key, html_content):
+    """Store a customized preview page, evicting the least recently used ones"""
+    with _preview_cache_lock:
+        _preview_cache[cache_key] = html_content
+        _preview_cache.move_to_end(cache_key)
+        while len(_preview_cache) > Config.PREVIEW_CACHE_SIZE:
+            _preview_cache.popitem(last=False)
+
+
+@app.route('/api/templates/<int:template_id>/customize/preview')
+@app.route('/api/templates/<int:template_id>/customize/preview/<path:page>')
+def preview_customized_page(template_id, page='index.html'):
+    """
+    Preview a single customized page in memory without building a ZIP.
+    Business details come from the query string and are remembered in the session,
+    so links between pages keep the same details and stylesheets get the same brand colors.
+    """
+    from template_customizer import customization_cache_key, customize_preview
+    from template_index import load_color_index
+    from color_theme import brand_colors
+    
+    try:
+        template = Template.query.get_or_404(template_id)
+        template_path, template_root, index_html_path = _locate_template_root(template)
+        is_page = page.lower().endswith(('.html', '.htm'))
+        
+        session_key = f'preview_details_{template_id}'
+        if is_page and any(field in request.args for field in BUSINESS_DETAIL_FIELDS):
+            business_details = _business_details_from(request.args)
+            session[session_key] = business_details
+        else:
+            business_details = session.get(session_key) or _business_details_from({})
+        
+        # Stylesheets are re-themed like pages; other assets are served as-is
+        color_index = load_color_index(template.id, template.file_path) if brand_colors(business_details) else None
+        if not is_page and not (color_index and page.lower().endswith('.css')):
+            return _send_template_asset(template, template_path, template_root, page)
+        
+        page_path = _resolve_template_file(template_path, template_root, page)
+        if not page_path.startswith(template_path):
+            return jsonify({'error': 'Invalid file path'}), 403
+        if not os.path.exists(page_path):
+            return jsonify({'error': f'File not found: {page}'}), 404
+        
+        # Key on the page's identity so edits to the template invalidate cached previews
+        # (the color index fingerprint covers the stylesheets the page's colors are derived from)
+        stat = os.stat(page_path)
+        base_url = f'{request.host_url}api/templates/{template_id}/customize/preview/'
+        identity = f'{page_path}:{stat.st_size}:{stat.st_mtime_ns}:{base_url}'
+        if color_index:
+            identity += f":{color_index['fingerprint']}"
+        cache_key = customization_cache_key(identity, business_details)
+        
+        content = _get_preview_page(cache_key)
+        if content is None:
+            with open(page_path, 'r', encoding='utf-8', errors='ignore') as f:
+                content = f.read()
+            path = os.path.relpath(page_path, template_path)
+            content = customize_preview(path, content, business_details, color_index)
+            if is_page:
+                content = _inject_base_tag(content, base_url)
+            _put_preview_page(cache_key, content)
+        
+        return Response(content, mimetype='text/html' if is_page else 'text/css')
+        
+    except Exception as e:
+        print(f"Customization preview error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/templates/<int:template_id>/download', methods=['GET'])
 @token_required
 def download_template(template_id):
@@ -1641,6 +2141,17 @@ def download_template(template_id):
     
     # Create ZIP file
     zip_filename = f"{template.title.replace(' ', '_')}.zip"
+    
+    # Ingested templates ship the archive built at ingest time
+    archive_path = os.path.join(artifacts_dir(template_id), 'download.zip')
+    if is_ingested(template) and os.path.exists(archive_path):
+        return send_file(
+            os.path.abspath(archive_path),
+            as_attachment=True,
+            download_name=zip_filename,
+            mimetype='application/zip'
+        )
+    
     zip_path = os.path.join(Config.TEMPLATE_FOLDER, f"download_{template_id}_{int(datetime.utcnow().timestamp())}.zip")
     
     try:
@@ -1656,18 +2167,34 @@ def download_template(template_id):
         return jsonify({'error': f'Failed to create download: {str(e)}'}), 500
 
 
-@app.route('/api/templates/<int:template_id>/customize', methods=['POST'])
-@token_required
-def customize_template_endpoint(template_id):
-    """Customize template with business details and download"""
-    from template_customizer import customize_template
-    
-    template = Template.query.get_or_404(template_id)
-    
+BUSINESS_DETAIL_FIELDS = (
+    'businessName', 'tagline', 'description', 'email', 'phone', 'address',
+    'city', 'country', 'facebook', 'twitter', 'linkedin', 'instagram',
+    'primaryColor', 'secondaryColor', 'accentColor'
+)
+
+
+def _business_details_from(source):
+    """Read business details from form data, query args or a batch record (cache keys normalize them further)"""
+    from template_customizer import clean_business_details
+    return clean_business_details({field: str(source.get(field) or '') for field in BUSINESS_DETAIL_FIELDS})
+
+
+def _brand_color_error(business_details):
+    """Return an error message if a brand color is not a hex color"""
+    from color_theme import BRAND_COLOR_FIELDS
+    invalid = [field for field in BRAND_COLOR_FIELDS if business_details.get(field) and not re.fullmatch(r'#[0-9a-f]{6}', business_details[field])]
+    if invalid:
+        return f"Invalid color for {', '.join(invalid)} (use #rrggbb)"
+    return None
+
+
+def _customization_access_error(template):
+    """Return an error response unless the current user purchased, sells or administers the template"""
     # Check if user purchased the template
     purchase = Purchase.query.filter_by(
         buyer_id=request.user_id,
-        template_id=template_id
+        template_id=template.id
     ).first()
     
     if not purchase and request.user_role not in ['admin', 'seller']:
@@ -1678,62 +2205,176 @@ def customize_template_endpoint(template_id):
         else:
             return jsonify({'error': 'You must purchase this template first'}), 403
     
+    return None
+
+
+def _find_cached_customization(cache_key, user_id):
+    """Return an existing customization whose artifact matches the cache key, preferring the user's own"""
+    candidates = TemplateCustomization.query.filter_by(content_hash=cache_key).order_by(
+        TemplateCustomization.created_at.desc()
+    ).all()
+    candidates.sort(key=lambda c: c.user_id != user_id)
+    
+    for candidate in candidates:
+        if candidate.customized_file_path and os.path.exists(candidate.customized_file_path):
+            return candidate
+    return None
+
+
+def _apply_business_details(customization, business_details):
+    """Copy business details onto a TemplateCustomization row"""
+    customization.business_name = business_details['businessName']
+    customization.tagline = business_details['tagline']
+    customization.description = business_details['description']
+    customization.email = business_details['email']
+    customization.phone = business_details['phone']
+    customization.address = business_details['address']
+    customization.city = business_details['city']
+    customization.country = business_details['country']
+    customization.facebook = business_details['facebook']
+    customization.twitter = business_details['twitter']
+    customization.linkedin = business_details['linkedin']
+    customization.instagram = business_details['instagram']
+    customization.primary_color = business_details['primaryColor'] or None
+    customization.secondary_color = business_details['secondaryColor'] or None
+    customization.accent_color = business_details['accentColor'] or None
+
+
+def _save_customization(user_id, template_id, business_details, zip_path, cache_key, logo_file=None, template_version=None):
+    """Create a TemplateCustomization row for a built artifact"""
+    customization = TemplateCustomization(
+        user_id=user_id,
+        template_id=template_id,
+        customized_file_path=zip_path,
+        content_hash=cache_key,
+        template_version=template_version
+    )
+    _apply_business_details(customization, business_details)
+    
+    if logo_file:
+        customization.logo_path = f"logos/{logo_file.filename}"
+    
+    db.session.add(customization)
+    db.session.commit()
+    return customization
+
+
+def _build_customization(user_id, template_id, template_folder, business_details, logo_file, cache_key, progress=None):
+    """
+    Build (or reuse) the customized artifact for a cache key.
+    Returns (customization, cached, page_errors).
+    """
+    from template_customizer import customize_template, single_flight, template_fingerprint
+    from template_index import load_color_index
+    from color_theme import brand_colors
+    
+    page_errors = []
+    customization = _find_cached_customization(cache_key, user_id)
+    cached = customization is not None
+    
+    if not customization:
+        with single_flight(cache_key):
+            # A concurrent identical submission may have finished while we waited
+            customization = _find_cached_customization(cache_key, user_id)
+            cached = customization is not None
+            
+            if not customization:
+                color_index = None
+                if brand_colors(business_details):
+                    color_index = load_color_index(template_id, template_folder)
+                template_version = template_fingerprint(template_folder)
+                zip_path, page_errors = customize_template(
+                    template_folder, business_details, logo_file, progress, color_index
+                )
+                customization = _save_customization(
+                    user_id, template_id, business_details, zip_path, cache_key, logo_file, template_version
+                )
+    
+    # Another user's identical artifact gets its own record
+    if customization.user_id != user_id:
+        customization = _save_customization(
+            user_id, template_id, business_details,
+            customization.customized_file_path, cache_key, logo_file, customization.template_version
+        )
+    
+    return customization, cached, page_errors
+
+
+def _run_customization_job(progress, user_id, template_id, template_folder, business_details, logo, cache_key):
+    """Background job body for asynchronous customizations"""
+    logo_file = None
+    if logo:
+        logo_file = FileStorage(stream=io.BytesIO(logo['data']), filename=logo['filename'])
+    
+    customization, cached, page_errors = _build_customization(
+        user_id, template_id, template_folder, business_details, logo_file, cache_key, progress
+    )
+    
+    return {
+        'customization_id': customization.id,
+        'download_url': f'/api/templates/customized/{customization.id}/download',
+        'cached': cached,
+        'page_errors': page_errors
+    }
+
+
+@app.route('/api/templates/<int:template_id>/customize', methods=['POST'])
+@token_required
+def customize_template_endpoint(template_id):
+    """
+    Customize template with business details and download.
+    Pass async=true (query or form) to enqueue a job and poll /api/customizations/<job_id>.
+    """
+    from template_customizer import template_fingerprint, customization_cache_key
+    
+    template = Template.query.get_or_404(template_id)
+    
+    access_error = _customization_access_error(template)
+    if access_error:
+        return access_error
+    
     try:
         # Get business details from form data
-        business_details = {
-            'businessName': request.form.get('businessName', ''),
-            'tagline': request.form.get('tagline', ''),
-            'description': request.form.get('description', ''),
-            'email': request.form.get('email', ''),
-            'phone': request.form.get('phone', ''),
-            'address': request.form.get('address', ''),
-            'city': request.form.get('city', ''),
-            'country': request.form.get('country', ''),
-            'facebook': request.form.get('facebook', ''),
-            'twitter': request.form.get('twitter', ''),
-            'linkedin': request.form.get('linkedin', ''),
-            'instagram': request.form.get('instagram', '')
-        }
+        business_details = _business_details_from(request.form)
         
         # Get logo file if provided
         logo_file = request.files.get('logo')
+        logo_bytes = None
+        if logo_file:
+            logo_bytes = logo_file.read()
+            logo_file.stream.seek(0)
         
         # Validate required fields
         if not business_details['businessName']:
             return jsonify({'error': 'Business name is required'}), 400
+        color_error = _brand_color_error(business_details)
+        if color_error:
+            return jsonify({'error': color_error}), 400
         
         # Get template folder path
         template_folder = template.file_path
         if not os.path.exists(template_folder):
             return jsonify({'error': 'Template files not found'}), 404
         
-        # Customize template
-        zip_path = customize_template(template_folder, business_details, logo_file)
-        
-        # Save customization record
-        customization = TemplateCustomization(
-            user_id=request.user_id,
-            template_id=template_id,
-            business_name=business_details['businessName'],
-            tagline=business_details['tagline'],
-            description=business_details['description'],
-            email=business_details['email'],
-            phone=business_details['phone'],
-            address=business_details['address'],
-            city=business_details['city'],
-            country=business_details['country'],
-            facebook=business_details['facebook'],
-            twitter=business_details['twitter'],
-            linkedin=business_details['linkedin'],
-            instagram=business_details['instagram'],
-            customized_file_path=zip_path
-        )
+        # Identical submissions reuse the artifact that was already built
+        cache_key = customization_cache_key(template_fingerprint(template_folder), business_details, logo_bytes)
+        run_async = (request.args.get('async') or request.form.get('async', '')).lower() in ('1', 'true', 'yes')
         
-        if logo_file:
-            customization.logo_path = f"logos/{logo_file.filename}"
+        if run_async and not _find_cached_customization(cache_key, request.user_id):
+            logo = {'data': logo_bytes, 'filename': logo_file.filename} if logo_file else None
+            job = customization_queue.enqueue(
+                'customization', request.user_id, _run_customization_job,
+                request.user_id, template_id, template_folder, business_details, logo, cache_key
+            )
+            return jsonify({
+                'message': 'Customization queued',
+                'job_id': job.id,
+                'status_url': f'/api/customizations/{job.id}'
+            }), 202
         
-        db.session.add(customization)
-        db.session.commit()
+        customization, cached, page_errors = _build_customization(
+            request.user_id, template_id, template_folder, business_details, logo_file, cache_key
+        )
         
         # Return download URL
         download_url = f'/api/templates/customized/{customization.id}/download'
@@ -1741,7 +2382,9 @@ def customize_template_endpoint(template_id):
         return jsonify({
             'message': 'Template customized successfully',
             'customization_id': customization.id,
-            'download_url': download_url
+            'download_url': download_url,
+            'cached': cached,
+            'page_errors': page_errors
         }), 200
         
     except Exception as e:
@@ -1751,6 +2394,388 @@ def customize_template_endpoint(template_id):
         return jsonify({'error': f'Failed to customize template: {str(e)}'}), 500
 
 
+def _batch_archive_path(job_id):
+    """Location of the combined archive produced by a batch customization job"""
+    return os.path.join(Config.TEMPLATE_FOLDER, f'batch_{job_id}.zip')
+
+
+def _parse_batch_records():
+    """Read business detail records from a CSV upload ('file') or a JSON list / {"records": [...]}"""
+    csv_file = request.files.get('file')
+    if csv_file:
+        rows = list(csv.DictReader(io.StringIO(csv_file.read().decode('utf-8-sig'))))
+    else:
+        data = request.get_json(silent=True)
+        rows = data.get('records') if isinstance(data, dict) else data
+    
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        raise ValueError('Provide a CSV file or a JSON list of business detail records')
+    return [_business_details_from(row) for row in rows]
+
+
+def _run_batch_customization_job(progress, user_id, template_id, template_folder, records, cache_keys):
+    """Background job body for batch customizations: build missing artifacts, then bundle them"""
+    from template_customizer import customize_batch, template_fingerprint
+    from template_index import load_color_index
+    from color_theme import brand_colors
+    
+    # Records with an existing artifact (or repeating an earlier record) are not rebuilt
+    build_index = {}
+    build_records = []
+    for business_details, cache_key in zip(records, cache_keys):
+        if cache_key not in build_index and not _find_cached_customization(cache_key, user_id):
+            build_index[cache_key] = len(build_records)
+            build_records.append(business_details)
+    
+    builds = []
+    template_version = template_fingerprint(template_folder)
+    if build_records:
+        color_index = None
+        if any(brand_colors(record) for record in build_records):
+            color_index = load_color_index(template_id, template_folder)
+        builds = customize_batch(template_folder, build_records, progress=progress, color_index=color_index)
+    
+    results = []
+    customizations = {}
+    for index, (business_details, cache_key) in enumerate(zip(records, cache_keys)):
+        entry = {'index': index, 'businessName': business_details['businessName']}
+        build = builds[build_index[cache_key]] if cache_key in build_index else None
+        
+        if build and 'error' in build:
+            entry['error'] = build['error']
+        elif cache_key in customizations:
+            entry.update(customizations[cache_key], cached=True, page_errors=[])
+        else:
+            if build:
+                customization = _save_customization(
+                    user_id, template_id, business_details, build['zip_path'], cache_key,
+                    template_version=template_version
+                )
+                cached, page_errors = False, build['page_errors']
+            else:
+                customization, cached, page_errors = _build_customization(
+                    user_id, template_id, template_folder, business_details, None, cache_key
+                )
+            customizations[cache_key] = {
+                'customization_id': customization.id,
+                'download_url': f'/api/templates/customized/{customization.id}/download',
+                'zip_path': customization.customized_file_path
+            }
+            entry.update(customizations[cache_key], cached=cached, page_errors=page_errors)
+        results.append(entry)
+    
+    # Bundle every record's ZIP into one archive (stored, the inner ZIPs are already compressed)
+    progress(stage='archiving')
+    with zipfile.ZipFile(_batch_archive_path(progress.job_id), 'w', zipfile.ZIP_STORED) as archive:
+        for entry in results:
+            zip_path = entry.pop('zip_path', None)
+            if zip_path:
+                name = secure_filename(entry['businessName']) or 'template'
+                archive.write(zip_path, f"{entry['index'] + 1:03d}_{name}.zip")
+    
+    return {
+        'records': results,
+        'failed': sum('error' in entry for entry in results),
+        'archive_url': f'/api/customizations/{progress.job_id}/archive'
+    }
+
+
+@app.route('/api/templates/<int:template_id>/customize/batch', methods=['POST'])
+@token_required
+def customize_template_batch(template_id):
+    """
+    Customize a template for many businesses at once.
+    Accepts a JSON list of business details (or {"records": [...]}) or a CSV upload in 'file'.
+    Returns a job to poll; its result lists per-record downloads and a combined archive.
+    """
+    from template_customizer import template_fingerprint, customization_cache_key
+    
+    template = Template.query.get_or_404(template_id)
+    
+    access_error = _customization_access_error(template)
+    if access_error:
+        return access_error
+    
+    try:
+        records = _parse_batch_records()
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if not records:
+        return jsonify({'error': 'No records provided'}), 400
+    if len(records) > Config.CUSTOMIZATION_BATCH_LIMIT:
+        return jsonify({'error': f'A batch may contain at most {Config.CUSTOMIZATION_BATCH_LIMIT} records'}), 400
+    
+    missing = [index for index, record in enumerate(records) if not record['businessName']]
+    if missing:
+        return jsonify({'error': 'Business name is required', 'records': missing}), 400
+    
+    invalid = [index for index, record in enumerate(records) if _brand_color_error(record)]
+    if invalid:
+        return jsonify({'error': 'Invalid brand color (use #rrggbb)', 'records': invalid}), 400
+    
+    template_folder = template.file_path
+    if not os.path.exists(template_folder):
+        return jsonify({'error': 'Template files not found'}), 404
+    
+    template_version = template_fingerprint(template_folder)
+    cache_keys = [customization_cache_key(template_version, record) for record in records]
+    
+    job = customization_queue.enqueue(
+        'customization_batch', request.user_id, _run_batch_customization_job,
+        request.user_id, template_id, template_folder, records, cache_keys
+    )
+    
+    return jsonify({
+        'message': f'Batch of {len(records)} customizations queued',
+        'job_id': job.id,
+        'status_url': f'/api/customizations/{job.id}'
+    }), 202
+
+
+@app.route('/api/customizations/<job_id>', methods=['GET'])
+@token_required
+def get_customization_job(job_id):
+    """Report status and progress (files processed, bytes written) of a customization job"""
+    job = Job.query.get_or_404(job_id)
+    
+    if job.user_id != request.user_id and request.user_role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify({'job': job.to_dict()}), 200
+
+
+def _versioned_zip_path(zip_path, version):
+    """Path for a new version of a customized ZIP next to the original"""
+    root = re.sub(r'_v\d+$', '', os.path.splitext(zip_path)[0])
+    return f'{root}_v{version}.zip'
+
+
+def _zip_version(zip_path):
+    """Version number of a customized ZIP from its name (the original artifact is version 1)"""
+    match = re.search(r'_v(\d+)$', os.path.splitext(zip_path)[0])
+    return int(match.group(1)) if match else 1
+
+
+def _reserve_versioned_zip_path(zip_path, version):
+    """
+    Claim the first unused versioned path from version on. Artifacts may be shared between
+    customizations and versions discarded by a rollback stay on disk, so an existing file is
+    never reused or overwritten.
+    """
+    while True:
+        path = _versioned_zip_path(zip_path, version)
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return path, version
+        except FileExistsError:
+            version += 1
+
+
+@app.route('/api/customizations/<int:customization_id>', methods=['PATCH'])
+@token_required
+def update_customization(customization_id):
+    """
+    Change some business details of an existing customization.
+    Only pages containing the affected placeholders are re-processed; every other ZIP entry
+    is copied unchanged. The previous artifact is kept as a version for rollback.
+    """
+    from template_customizer import (
+        TemplateCustomizer, extract_social_links, logo_asset_files, patch_customized_zip,
+        customize_template, customization_cache_key
+    )
+    from template_index import load_placeholder_index, load_color_index, affected_files
+    from color_theme import BRAND_COLOR_FIELDS, ColorTheme
+    
+    customization = TemplateCustomization.query.get_or_404(customization_id)
+    
+    if customization.user_id != request.user_id and request.user_role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data:
+        return jsonify({'error': 'Provide the business details to change as JSON'}), 400
+    
+    unknown = sorted(set(data) - set(BUSINESS_DETAIL_FIELDS))
+    if unknown:
+        return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+    
+    old_details = customization.business_details()
+    new_details = _business_details_from({**old_details, **data})
+    if not new_details['businessName']:
+        return jsonify({'error': 'Business name is required'}), 400
+    color_error = _brand_color_error(new_details)
+    if color_error:
+        return jsonify({'error': color_error}), 400
+    
+    zip_path = customization.customized_file_path
+    if not zip_path or not os.path.exists(zip_path):
+        return jsonify({'error': 'Customized file not found'}), 404
+    
+    if new_details == old_details:
+        return jsonify({
+            'message': 'No changes',
+            'customization': customization.to_dict(),
+            'files_updated': []
+        }), 200
+    
+    template = Template.query.get_or_404(customization.template_id)
+    template_folder = template.file_path
+    if not os.path.exists(template_folder):
+        return jsonify({'error': 'Template files not found'}), 404
+    
+    new_zip_path = None
+    try:
+        index = load_placeholder_index(template.id, template_folder)
+        template_unchanged = customization.template_version == index['fingerprint']
+        if customization.logo_path and not template_unchanged:
+            # Logo bytes are not kept, so the artifact can only be patched, not rebuilt from the new source
+            return jsonify({
+                'error': 'The template has changed since this customization was built; customize it again with your logo'
+            }), 409
+        
+        versions = list(customization.versions or [])
+        current_version = _zip_version(zip_path)
+        issued = max([entry['version'] for entry in versions] + [current_version])
+        new_zip_path, new_version = _reserve_versioned_zip_path(zip_path, issued + 1)
+        
+        if customization.logo_path:
+            # Logo bytes are not kept, so the hash cannot be recomputed; reuse the logo renders in the artifact
+            with zipfile.ZipFile(zip_path, 'r') as zipf:
+                names = set(zipf.namelist())
+            customizer = TemplateCustomizer(template_folder, None)
+            customizer.logo_assets = {
+                key: f'img/{filename}' for key, filename in logo_asset_files().items() if f'img/{filename}' in names
+            }
+            logo_path = customizer.logo_assets.get('logo') or next(
+                (name for name in sorted(names) if name.startswith('img/logo.')), None
+            )
+            content_hash = None
+            incremental = True
+        else:
+            customizer = TemplateCustomizer(template_folder, None)
+            logo_path = None
+            content_hash = customization_cache_key(index['fingerprint'], new_details)
+            # An artifact built from an older version of the template cannot be patched from the current source
+            incremental = template_unchanged or (
+                customization.content_hash == customization_cache_key(index['fingerprint'], old_details)
+            )
+        
+        color_index = load_color_index(template.id, template_folder)
+        
+        if incremental:
+            files = set(affected_files(index, old_details, new_details))
+            theme = ColorTheme.from_details(color_index, new_details)
+            # A color change re-derives every colored file from the source (old mappings must be undone too)
+            if any(old_details[field] != new_details[field] for field in BRAND_COLOR_FIELDS):
+                files.update(color_index['files'])
+            files = sorted(files)
+            customizer.set_business_details(new_details)
+            plan = customizer.build_plan(extract_social_links(new_details))
+            page_errors = patch_customized_zip(
+                template_folder, zip_path, new_zip_path, files, plan, logo_path, theme
+            )
+        else:
+            files = sorted(index['files'])
+            built_path, page_errors = customize_template(template_folder, new_details, color_index=color_index)
+            os.replace(built_path, new_zip_path)
+        
+        versions.append({
+            'version': current_version,
+            'zip_path': zip_path,
+            'content_hash': customization.content_hash,
+            'template_version': customization.template_version,
+            'details': old_details,
+            'created_at': datetime.utcnow().isoformat()
+        })
+        customization.versions = versions[-Config.CUSTOMIZATION_MAX_VERSIONS:]
+        customization.customized_file_path = new_zip_path
+        customization.content_hash = content_hash
+        customization.template_version = index['fingerprint']
+        _apply_business_details(customization, new_details)
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Customization updated',
+            'customization': customization.to_dict(),
+            'download_url': f'/api/templates/customized/{customization.id}/download',
+            'version': new_version,
+            'files_updated': files,
+            'incremental': incremental,
+            'page_errors': page_errors
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        if new_zip_path and os.path.exists(new_zip_path):
+            os.remove(new_zip_path)
+        print(f"Customization update error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': f'Failed to update customization: {str(e)}'}), 500
+
+
+@app.route('/api/customizations/<int:customization_id>/rollback', methods=['POST'])
+@token_required
+def rollback_customization(customization_id):
+    """Restore a previous version of a customization (the latest one unless 'version' is given)"""
+    customization = TemplateCustomization.query.get_or_404(customization_id)
+    
+    if customization.user_id != request.user_id and request.user_role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    versions = list(customization.versions or [])
+    if not versions:
+        return jsonify({'error': 'No previous versions to restore'}), 404
+    
+    data = request.get_json(silent=True) or {}
+    position = len(versions) - 1
+    if data.get('version') is not None:
+        matches = [i for i, v in enumerate(versions) if v['version'] == data['version']]
+        if not matches:
+            return jsonify({'error': f"Version {data['version']} not found"}), 404
+        position = matches[0]
+    
+    target = versions[position]
+    if not os.path.exists(target['zip_path']):
+        return jsonify({'error': 'Files for that version are no longer available'}), 410
+    
+    # Newer versions are discarded; their files stay on disk since identical artifacts may be shared
+    customization.versions = versions[:position]
+    customization.customized_file_path = target['zip_path']
+    customization.content_hash = target['content_hash']
+    customization.template_version = target.get('template_version')
+    _apply_business_details(customization, target['details'])
+    db.session.commit()
+    
+    return jsonify({
+        'message': f"Restored version {target['version']}",
+        'customization': customization.to_dict(),
+        'download_url': f'/api/templates/customized/{customization.id}/download'
+    }), 200
+
+
+@app.route('/api/customizations/<job_id>/archive', methods=['GET'])
+@token_required
+def download_batch_archive(job_id):
+    """Download the combined archive of a completed batch customization job"""
+    job = Job.query.get_or_404(job_id)
+    
+    if job.user_id != request.user_id and request.user_role != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    archive_path = _batch_archive_path(job.id)
+    if job.kind != 'customization_batch' or job.status != 'completed' or not os.path.exists(archive_path):
+        return jsonify({'error': 'Archive not available'}), 404
+    
+    return send_file(
+        os.path.abspath(archive_path),
+        as_attachment=True,
+        download_name=f'customizations_{job.id[:8]}.zip',
+        mimetype='application/zip'
+    )
+
+
 @app.route('/api/templates/customized/<int:customization_id>/download', methods=['GET'])
 def download_customized_template(customization_id):
     """Download customized template"""
@@ -0,0 +1,119 @@
+"""
+Benchmark the AI website pipeline offline with the fake LLM provider.
+Queues N generation jobs through the real API route and job queue, so enhancement,
+generation, validation, streaming writes and zipping all run as in production;
+only the model is replaced by recorded (or synthesized) responses with the given latency.
+
+Usage: python benchmark_ai.py [--jobs N] [--mode single|fanout|layout] [--latency-ms MS] [--chars-per-second N]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] if ordered else 0
+
+
+def run_benchmark(args):
+    fixtures_dir = os.path.abspath(args.fixtures)
+    work_dir = tempfile.mkdtemp(prefix='ai_benchmark_')
+
+    # Config reads the environment at import time, so everything is set before importing the app
+    os.environ.update({
+        'LLM_PROVIDER': 'fake',
+        'LLM_FIXTURES_DIR': fixtures_dir,
+        'LLM_FAKE_LATENCY_MS': str(args.latency_ms),
+        'LLM_FAKE_CHARS_PER_SECOND': str(args.chars_per_second),
+        'AI_GENERATION_MODE': args.mode,
+        'AI_JOB_WORKERS': str(args.workers),
+        'LLM_MAX_CONCURRENCY': str(args.concurrency),
+        'LLM_REQUESTS_PER_MINUTE': str(args.rpm),
+        'LLM_BURST': str(max(args.rpm // 6, 1)),
+        'PROMPT_SIMILARITY_THRESHOLD': '2',  # Every job calls the model for its enhancement
+        'DATABASE_URL': f"sqlite:///{os.path.join(work_dir, 'benchmark.db')}"
+    })
+    os.chdir(work_dir)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    from app import app
+    from models import db, User, Job
+    from auth import create_token
+
+    with app.app_context():
+        db.create_all()
+        user = User(email='benchmark@local.test', role='buyer', is_verified=True)
+        user.set_password('benchmark')
+        db.session.add(user)
+        db.session.commit()
+        headers = {'Authorization': f'Bearer {create_token(user.id, "buyer")}'}
+
+    client = app.test_client()
+    print(f"Jobs: {args.jobs}  Mode: {args.mode}  Latency: {args.latency_ms}ms  "
+          f"Rate: {args.chars_per_second or 'instant'} chars/s  Workers: {args.workers}  Fixtures: {fixtures_dir}")
+
+    start = time.perf_counter()
+    submitted = {}
+    for i in range(args.jobs):
+        response = client.post('/api/ai/generate', headers=headers, json={
+            'description': f'Benchmark business number {i} with a modern website'
+        })
+        submitted[response.json['job_id']] = time.perf_counter()
+
+    finished = {}
+    with app.app_context():
+        while len(finished) < len(submitted):
+            for job in Job.query.filter(Job.id.in_(list(submitted))).all():
+                if job.id not in finished and job.status in ('completed', 'failed'):
+                    finished[job.id] = (time.perf_counter() - submitted[job.id], job.status, job.result, job.error)
+            db.session.remove()
+            time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+
+    latencies = [duration for duration, status, result, error in finished.values() if status == 'completed']
+    failures = [error for duration, status, result, error in finished.values() if status == 'failed']
+    ai_dir = os.path.join(work_dir, 'backend', 'uploads', 'ai_generated')
+    zip_bytes = sum(
+        os.path.getsize(os.path.join(ai_dir, name)) for name in os.listdir(ai_dir) if name.endswith('.zip')
+    ) if os.path.isdir(ai_dir) else 0
+
+    print(f"\n{'completed':<12}{len(latencies):>8}")
+    print(f"{'failed':<12}{len(failures):>8}")
+    print(f"{'total s':<12}{elapsed:>8.2f}")
+    print(f"{'jobs/min':<12}{len(latencies) / elapsed * 60:>8.1f}")
+    print(f"{'p50 s':<12}{percentile(latencies, 0.5):>8.2f}")
+    print(f"{'p95 s':<12}{percentile(latencies, 0.95):>8.2f}")
+    print(f"{'zip KB':<12}{zip_bytes / 1024:>8.1f}")
+    for error in failures[:5]:
+        print(f"  failed: {error}")
+
+    from llm_metrics import stage_summary
+    with app.app_context():
+        stages = stage_summary(hours=24)['stages']
+    print(f"\n{'stage':<12}{'calls':>7}{'p50 ms':>9}{'p95 ms':>9}{'ttft p50':>10}{'out tok p50':>13}{'parse p95':>11}")
+    for stage, summary in stages.items():
+        print(f"{stage:<12}{summary['calls']:>7}{summary['latency_ms']['p50'] or 0:>9}{summary['latency_ms']['p95'] or 0:>9}"
+              f"{summary['ttft_ms']['p50'] or 0:>10}{summary['output_tokens']['p50'] or 0:>13}{summary['parse_ms']['p95'] or 0:>11}")
+
+    if not args.keep:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    else:
+        print(f"\nOutput kept in {work_dir}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=10)
+    parser.add_argument('--mode', choices=['single', 'fanout', 'layout'], default='single')
+    parser.add_argument('--latency-ms', type=int, default=500, help='Fake time to first chunk per call')
+    parser.add_argument('--chars-per-second', type=int, default=0, help='Fake output rate (0 = instant)')
+    parser.add_argument('--workers', type=int, default=2, help='AI_JOB_WORKERS')
+    parser.add_argument('--concurrency', type=int, default=4, help='LLM_MAX_CONCURRENCY')
+    parser.add_argument('--rpm', type=int, default=6000, help='LLM_REQUESTS_PER_MINUTE')
+    parser.add_argument('--fixtures', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'llm_fixtures'))
+    parser.add_argument('--keep', action='store_true', help='Keep the generated sites and database')
+    run_benchmark(parser.parse_args())
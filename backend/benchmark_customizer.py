@@ -0,0 +1,105 @@
+"""
+Benchmark the template customizer parser backends across the templates in uploads/.
+Every page is customized with a logo using each installed backend and compared with
+the html.parser reference, both byte-for-byte and after normalizing through BeautifulSoup
+(whitespace-insensitive, since re-parsing malformed markup is not idempotent).
+
+Usage: python benchmark_customizer.py [uploads_dir] [--repeat N]
+"""
+import os
+import time
+import argparse
+from bs4 import BeautifulSoup
+from template_customizer import (
+    TemplateCustomizer, ReplacementPlan, customize_html, available_parsers
+)
+
+SKIP_DIRS = {'ai_generated', 'images', 'logo_cache', 'template_artifacts', 'upload_sessions'}
+
+SAMPLE_DETAILS = {
+    'businessName': 'Benchmark Bakery',
+    'tagline': 'Fresh Every Morning',
+    'description': 'Artisan bread and pastries',
+    'email': 'hello@benchmark.test',
+    'phone': '+92 300 0000000',
+    'address': '1 Mall Road',
+    'city': 'Lahore',
+    'country': 'Pakistan'
+}
+
+
+def find_template_pages(uploads_dir):
+    """Collect HTML pages grouped by template directory"""
+    templates = {}
+    for base in (uploads_dir, os.path.join(uploads_dir, 'templates')):
+        if not os.path.isdir(base):
+            continue
+        for name in sorted(os.listdir(base)):
+            template_dir = os.path.join(base, name)
+            if name in SKIP_DIRS or name == 'templates' or '_customized_' in name or not os.path.isdir(template_dir):
+                continue
+            pages = []
+            for root, dirs, files in os.walk(template_dir):
+                pages.extend(os.path.join(root, f) for f in files if f.endswith('.html'))
+            if pages:
+                templates[os.path.relpath(template_dir, uploads_dir)] = sorted(pages)
+    return templates
+
+
+def normalize(html):
+    return ' '.join(str(BeautifulSoup(html, 'html.parser')).split())
+
+
+def run_benchmark(uploads_dir, repeat=3):
+    templates = find_template_pages(uploads_dir)
+    contents = {}
+    for pages in templates.values():
+        for page in pages:
+            with open(page, 'r', encoding='utf-8', errors='ignore') as f:
+                contents[page] = f.read()
+
+    replacements = TemplateCustomizer(None, None).set_business_details(SAMPLE_DETAILS).replacements
+    backends = available_parsers()
+    plans = {name: ReplacementPlan(replacements, parser=name) for name in backends}
+
+    reference = {page: customize_html(content, plans['html.parser'], 'img/logo.png') for page, content in contents.items()}
+    normalized_reference = {page: normalize(html) for page, html in reference.items()}
+
+    print(f"Templates: {len(templates)}  Pages: {len(contents)}  Bytes: {sum(len(c) for c in contents.values()):,}")
+    print(f"{'backend':<14}{'total ms':>10}{'ms/page':>10}{'identical':>12}{'equivalent':>12}")
+
+    # Text path (no logo) needs no DOM at all
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for content in contents.values():
+            customize_html(content, plans['html.parser'])
+    elapsed = (time.perf_counter() - start) * 1000 / repeat
+    print(f"{'text only':<14}{elapsed:>10.1f}{elapsed / max(len(contents), 1):>10.2f}{'-':>12}{'-':>12}")
+
+    results = []
+    for name in backends:
+        outputs = {}
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for page, content in contents.items():
+                outputs[page] = customize_html(content, plans[name], 'img/logo.png')
+        elapsed = (time.perf_counter() - start) * 1000 / repeat
+
+        identical = sum(outputs[page] == reference[page] for page in contents)
+        equivalent = sum(normalize(outputs[page]) == normalized_reference[page] for page in contents)
+        results.append((name, elapsed, equivalent == len(contents)))
+        print(f"{name:<14}{elapsed:>10.1f}{elapsed / max(len(contents), 1):>10.2f}"
+              f"{identical:>8}/{len(contents):<3}{equivalent:>8}/{len(contents):<3}")
+
+    matching = [r for r in results if r[2]]
+    if matching:
+        fastest = min(matching, key=lambda r: r[1])
+        print(f"\nFastest backend with equivalent output: {fastest[0]} (set CUSTOMIZER_PARSER={fastest[0]})")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('uploads_dir', nargs='?', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads'))
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    run_benchmark(args.uploads_dir, args.repeat)
@@ -0,0 +1,247 @@
+"""
+Brand Color Re-theming
+Indexes color literals (hex, rgb/rgba and CSS variable triplets) in template CSS and inline
+styles, and rewrites the indexed positions with a palette derived from the brand colors
+"""
+
+import os
+import re
+import colorsys
+
+BRAND_COLOR_FIELDS = {
+    'primaryColor': 'primary',
+    'secondaryColor': 'secondary',
+    'accentColor': 'accent'
+}
+COLOR_ROLES = ('primary', 'secondary', 'accent')
+
+# Colors below this saturation (grays, black, white) keep their value
+MIN_SATURATION = 0.15
+HUE_BUCKETS = 12
+
+# Declarations: property name and value up to ; or } (selectors end in { and are skipped)
+DECLARATION_PATTERN = re.compile(r'([\w-]+)\s*:([^;{}]*)(?=[;}]|$)')
+COLOR_PATTERN = re.compile(
+    r'#(?:[0-9a-fA-F]{8}|[0-9a-fA-F]{6}|[0-9a-fA-F]{3,4})\b'
+    r'|rgba?\(\s*\d{1,3}\s*,\s*\d{1,3}\s*,\s*\d{1,3}\s*(?:,\s*[\d.]+%?\s*)?\)'
+)
+# Bootstrap-style channel variables, e.g. --bs-primary-rgb: 13, 110, 253
+TRIPLET_PATTERN = re.compile(r'^\s*(\d{1,3})\s*,\s*(\d{1,3})\s*,\s*(\d{1,3})\s*$')
+STYLE_ATTR_PATTERN = re.compile(r'''\sstyle\s*=\s*(["'])(.*?)\1''', re.IGNORECASE | re.DOTALL)
+STYLE_BLOCK_PATTERN = re.compile(r'<style[^>]*>(.*?)</style>', re.IGNORECASE | re.DOTALL)
+
+
+def parse_color(literal):
+    """Parse a hex, rgb() or 'r, g, b' literal into (r, g, b, alpha_text); None if it is not a color"""
+    literal = literal.strip()
+    if literal.startswith('#'):
+        digits = literal[1:]
+        if len(digits) in (3, 4):
+            digits = ''.join(ch * 2 for ch in digits)
+        if len(digits) not in (6, 8) or not re.fullmatch(r'[0-9a-fA-F]+', digits):
+            return None
+        alpha = digits[6:] or None
+        return int(digits[0:2], 16), int(digits[2:4], 16), int(digits[4:6], 16), alpha
+    
+    match = re.fullmatch(r'(?:rgba?\()?\s*(\d{1,3})\s*,\s*(\d{1,3})\s*,\s*(\d{1,3})\s*(?:,\s*([\d.]+%?)\s*)?\)?', literal)
+    if match:
+        r, g, b = (int(value) for value in match.group(1, 2, 3))
+        if max(r, g, b) <= 255:
+            return r, g, b, match.group(4)
+    return None
+
+
+def normalize_hex(literal):
+    """Normalize a color literal to #rrggbb, or return None"""
+    color = parse_color(literal)
+    if not color:
+        return None
+    return '#%02x%02x%02x' % color[:3]
+
+
+def format_color(rgb, original):
+    """Render an RGB color in the same notation (and with the same alpha) as the original literal"""
+    r, g, b = rgb
+    alpha = parse_color(original)[3]
+    if original.startswith('#'):
+        return '#%02x%02x%02x%s' % (r, g, b, alpha or '')
+    if original.lower().startswith('rgb'):
+        if alpha is not None:
+            return f'rgba({r}, {g}, {b}, {alpha})'
+        return f'rgb({r}, {g}, {b})'
+    return f'{r}, {g}, {b}'
+
+
+def _scan_declarations(content, start, end, occurrences):
+    """Record color literals in the declaration values of content[start:end]"""
+    for declaration in DECLARATION_PATTERN.finditer(content, start, end):
+        prop = declaration.group(1)
+        value_start = declaration.start(2)
+        variable = prop if prop.startswith('--') else None
+        
+        if variable and TRIPLET_PATTERN.match(declaration.group(2)):
+            value = declaration.group(2)
+            offset = len(value) - len(value.lstrip())
+            literal = value.strip()
+            occurrences.append([value_start + offset, value_start + offset + len(literal), literal, variable])
+            continue
+        
+        for color in COLOR_PATTERN.finditer(declaration.group(2)):
+            occurrences.append([value_start + color.start(), value_start + color.end(), color.group(0), variable])
+
+
+def find_colors(content, is_html=False):
+    """Color occurrences as [start, end, literal, css_variable] (HTML: style attributes and <style> blocks)"""
+    occurrences = []
+    if not is_html:
+        _scan_declarations(content, 0, len(content), occurrences)
+        return occurrences
+    
+    for block in STYLE_BLOCK_PATTERN.finditer(content):
+        _scan_declarations(content, block.start(1), block.end(1), occurrences)
+    for attr in STYLE_ATTR_PATTERN.finditer(content):
+        _scan_declarations(content, attr.start(2), attr.end(2), occurrences)
+    
+    occurrences.sort()
+    return occurrences
+
+
+def build_color_index(template_folder):
+    """Index the color literals of every CSS and HTML file in a template"""
+    files = {}
+    for root, dirs, filenames in os.walk(template_folder):
+        for filename in filenames:
+            if not filename.endswith(('.css', '.html')):
+                continue
+            file_path = os.path.join(root, filename)
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            except Exception:
+                continue
+            
+            occurrences = find_colors(content, filename.endswith('.html'))
+            if occurrences:
+                files[os.path.relpath(file_path, template_folder)] = occurrences
+    
+    return {'files': files}
+
+
+def brand_colors(business_details):
+    """Role -> (r, g, b) for the brand colors present in the business details"""
+    colors = {}
+    for field, role in BRAND_COLOR_FIELDS.items():
+        color = parse_color(business_details.get(field) or '')
+        if color:
+            colors[role] = color[:3]
+    return colors
+
+
+def _hls(rgb):
+    return colorsys.rgb_to_hls(*(channel / 255 for channel in rgb))
+
+
+def _rgb(hls):
+    hue, lightness, saturation = hls
+    lightness = min(max(lightness, 0.0), 1.0)
+    saturation = min(max(saturation, 0.0), 1.0)
+    return tuple(int(round(channel * 255)) for channel in colorsys.hls_to_rgb(hue % 1.0, lightness, saturation))
+
+
+def _hue_bucket(key):
+    return int(_hls(parse_color(key)[:3])[0] * HUE_BUCKETS) % HUE_BUCKETS
+
+
+class ColorTheme:
+    """Palette mapping from a template's colors to brand colors, applied through the color index"""
+    
+    def __init__(self, color_index, colors):
+        self.files = color_index['files']
+        self.mapping = self._build_mapping(colors)
+    
+    @classmethod
+    def from_details(cls, color_index, business_details):
+        """Theme for the brand colors in the business details, or None if none were given"""
+        colors = brand_colors(business_details)
+        return cls(color_index, colors) if colors else None
+    
+    def _build_mapping(self, colors):
+        # Tally chromatic colors by hue bucket; grays keep their value
+        counts = {}
+        roles = {}
+        for occurrences in self.files.values():
+            for start, end, literal, variable in occurrences:
+                color = parse_color(literal)
+                if not color:
+                    continue
+                hue, lightness, saturation = _hls(color[:3])
+                if saturation < MIN_SATURATION or not 0.05 < lightness < 0.97:
+                    continue
+                key = '#%02x%02x%02x' % color[:3]
+                counts[key] = counts.get(key, 0) + 1
+                # Variables named after a role (e.g. --bs-primary) pin that color to the role
+                for role in COLOR_ROLES:
+                    if variable and role in variable.lower():
+                        roles.setdefault(role, key)
+        
+        buckets = {}
+        for key, count in counts.items():
+            buckets.setdefault(_hue_bucket(key), {})[key] = count
+        
+        # Assign hue buckets to roles: pinned variables first, then by how often the bucket is used
+        assigned = {}
+        for role, key in roles.items():
+            if _hue_bucket(key) not in assigned.values():
+                assigned[role] = _hue_bucket(key)
+        ranked = sorted(buckets, key=lambda bucket: -sum(buckets[bucket].values()))
+        for role in COLOR_ROLES:
+            if role not in assigned:
+                remaining = [bucket for bucket in ranked if bucket not in assigned.values()]
+                if remaining:
+                    assigned[role] = remaining[0]
+        
+        mapping = {}
+        for role, bucket in assigned.items():
+            if role not in colors:
+                continue
+            members = buckets[bucket]
+            anchor = roles.get(role) if roles.get(role) in members else max(members, key=members.get)
+            anchor_hls = _hls(parse_color(anchor)[:3])
+            brand_hls = _hls(colors[role])
+            
+            # Shift hue, saturation and lightness by the anchor's offset so tints and shades survive
+            for key in members:
+                hls = _hls(parse_color(key)[:3])
+                mapping[key] = _rgb((
+                    brand_hls[0] + hls[0] - anchor_hls[0],
+                    brand_hls[1] + hls[1] - anchor_hls[1],
+                    brand_hls[2] + hls[2] - anchor_hls[2]
+                ))
+        
+        return mapping
+    
+    def affected_files(self):
+        """Files with at least one color the theme changes"""
+        return sorted(
+            path for path, occurrences in self.files.items()
+            if any(normalize_hex(literal) in self.mapping for start, end, literal, variable in occurrences)
+        )
+    
+    def apply(self, path, content):
+        """Rewrite the indexed color positions of one file"""
+        occurrences = self.files.get(path)
+        if not occurrences or not self.mapping:
+            return content
+        
+        parts = []
+        position = 0
+        for start, end, literal, variable in occurrences:
+            new_rgb = self.mapping.get(normalize_hex(literal))
+            # Skip positions that no longer hold the indexed literal or overlap an earlier rewrite
+            if new_rgb is None or start < position or content[start:end] != literal:
+                continue
+            parts.append(content[position:start])
+            parts.append(format_color(new_rgb, literal))
+            position = end
+        parts.append(content[position:])
+        return ''.join(parts)
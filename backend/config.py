@@ -15,6 +15,22 @@ class Config:
     # Google Gemini API Key
     GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
     
+    # LLM Provider (gemini, openai, or fake for offline benchmarks; switchable at runtime by admins)
+    LLM_PROVIDER = os.environ.get('LLM_PROVIDER', 'gemini')
+    GEMINI_MODEL = os.environ.get('GEMINI_MODEL', 'gemini-2.5-pro')
+    OPENAI_MODEL = os.environ.get('OPENAI_MODEL', 'gpt-4o')
+    OPENAI_MAX_OUTPUT_TOKENS = int(os.environ.get('OPENAI_MAX_OUTPUT_TOKENS', 16384))  # The model's completion limit
+    LLM_FIXTURES_DIR = os.environ.get('LLM_FIXTURES_DIR', 'backend/llm_fixtures')  # Recorded responses the fake provider replays
+    LLM_RECORD_FIXTURES = os.environ.get('LLM_RECORD_FIXTURES', 'False').lower() == 'true'
+    LLM_FAKE_LATENCY_MS = int(os.environ.get('LLM_FAKE_LATENCY_MS', 0))  # Fake provider time to first chunk
+    LLM_FAKE_CHARS_PER_SECOND = int(os.environ.get('LLM_FAKE_CHARS_PER_SECOND', 0))  # Fake provider output rate (0 = instant)
+    LLM_FAKE_CHUNK_CHARS = int(os.environ.get('LLM_FAKE_CHUNK_CHARS', 2000))
+    # USD per million tokens, for the cost estimates in AI generation metrics
+    GEMINI_INPUT_COST_PER_MTOK = float(os.environ.get('GEMINI_INPUT_COST_PER_MTOK', 1.25))
+    GEMINI_OUTPUT_COST_PER_MTOK = float(os.environ.get('GEMINI_OUTPUT_COST_PER_MTOK', 10.0))
+    OPENAI_INPUT_COST_PER_MTOK = float(os.environ.get('OPENAI_INPUT_COST_PER_MTOK', 2.5))
+    OPENAI_OUTPUT_COST_PER_MTOK = float(os.environ.get('OPENAI_OUTPUT_COST_PER_MTOK', 10.0))
+    
     # Admin Configuration
     ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL', 'admin@marketplace.com')
     ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD', 'SecureAdmin@2024')
@@ -31,8 +47,59 @@ class Config:
     UPLOAD_FOLDER = 'backend/uploads'
     TEMPLATE_FOLDER = 'backend/uploads/templates'
     AI_FOLDER = 'backend/uploads/ai_generated'
+    LOGO_CACHE_FOLDER = 'backend/uploads/logo_cache'
+    TEMPLATE_ARTIFACTS_FOLDER = 'backend/uploads/template_artifacts'
+    UPLOAD_SESSION_FOLDER = 'backend/uploads/upload_sessions'
     MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # 100MB max file size
     ALLOWED_EXTENSIONS = {'zip', 'rar', '7z'}
+    UPLOAD_CHUNK_SIZE = 1024 * 1024  # Streamed copy / extraction buffer
+    TEMPLATE_MAX_FILES = int(os.environ.get('TEMPLATE_MAX_FILES', 5000))  # Entries per template archive
+    TEMPLATE_MAX_UNCOMPRESSED_MB = int(os.environ.get('TEMPLATE_MAX_UNCOMPRESSED_MB', 500))
+    TEMPLATE_MAX_COMPRESSION_RATIO = int(os.environ.get('TEMPLATE_MAX_COMPRESSION_RATIO', 100))
+    UPLOAD_RATIO_MIN_BYTES = 1024 * 1024  # Ratio checks only apply to entries larger than this
+    UPLOAD_EXTRACT_WORKERS = int(os.environ.get('UPLOAD_EXTRACT_WORKERS', min(4, os.cpu_count() or 1)))
+    UPLOAD_SESSION_CHUNK_MB = int(os.environ.get('UPLOAD_SESSION_CHUNK_MB', 8))  # Chunk size for resumable uploads
+    UPLOAD_SESSION_MAX_MB = int(os.environ.get('UPLOAD_SESSION_MAX_MB', MAX_CONTENT_LENGTH // (1024 * 1024)))  # Largest archive a resumable upload accepts (same cap as a single-request upload)
+    UPLOAD_SESSION_TTL_HOURS = int(os.environ.get('UPLOAD_SESSION_TTL_HOURS', 24))  # Unfinished sessions are purged after this
+    INGEST_JOB_WORKERS = int(os.environ.get('INGEST_JOB_WORKERS', 1))  # Templates ingested concurrently per API worker
+    INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', min(4, os.cpu_count() or 1)))  # Threads per ingest stage
+    IMAGE_UPLOAD_WORKERS = int(os.environ.get('IMAGE_UPLOAD_WORKERS', min(4, os.cpu_count() or 1)))  # Images decoded in parallel per request
+    IMAGE_MAX_PIXELS = int(os.environ.get('IMAGE_MAX_PIXELS', 50_000_000))  # Larger images are rejected before decoding
+    IMAGE_MAX_DIMENSION = int(os.environ.get('IMAGE_MAX_DIMENSION', 1920))  # Longest side of the stored image
+    IMAGE_DERIVATIVE_WIDTHS = [int(w) for w in os.environ.get('IMAGE_DERIVATIVE_WIDTHS', '400,800').split(',') if w.strip()]
+    
+    # Template Customization
+    CUSTOMIZER_WORKERS = int(os.environ.get('CUSTOMIZER_WORKERS', min(4, os.cpu_count() or 1)))  # 1 = process pages in-process
+    CUSTOMIZER_PARSER = os.environ.get('CUSTOMIZER_PARSER', 'stream')  # stream, html.parser or lxml (see benchmark_customizer.py)
+    CUSTOMIZATION_BATCH_LIMIT = int(os.environ.get('CUSTOMIZATION_BATCH_LIMIT', 200))
+    CUSTOMIZATION_MAX_VERSIONS = int(os.environ.get('CUSTOMIZATION_MAX_VERSIONS', 5))
+    PREVIEW_CACHE_SIZE = int(os.environ.get('PREVIEW_CACHE_SIZE', 256))
+    CUSTOMIZATION_JOB_WORKERS = int(os.environ.get('CUSTOMIZATION_JOB_WORKERS', 2))  # Concurrent background customizations per API worker
+    
+    # AI Generation Jobs
+    AI_JOB_WORKERS = int(os.environ.get('AI_JOB_WORKERS', 2))  # Concurrent website generations per API worker
+    AI_GENERATION_MODE = os.environ.get('AI_GENERATION_MODE', 'single')  # single (one JSON response), fanout (per-page calls) or layout (shared layout once + page bodies)
+    AI_PAGE_WORKERS = int(os.environ.get('AI_PAGE_WORKERS', 4))  # Pages generated concurrently in fanout mode
+    PROMPT_CACHE_TTL_HOURS = int(os.environ.get('PROMPT_CACHE_TTL_HOURS', 168))  # Cached enhancements/improved prompts expire after this
+    PROMPT_CACHE_MAX_ENTRIES = int(os.environ.get('PROMPT_CACHE_MAX_ENTRIES', 5000))  # Least recently used entries are evicted beyond this
+    PROMPT_SIMILARITY_THRESHOLD = float(os.environ.get('PROMPT_SIMILARITY_THRESHOLD', 0.8))  # Jaccard similarity for reusing a near-duplicate enhancement (above 1 disables)
+    JOB_HEARTBEAT_SECONDS = int(os.environ.get('JOB_HEARTBEAT_SECONDS', 15))
+    JOB_STALE_SECONDS = int(os.environ.get('JOB_STALE_SECONDS', 60))  # Jobs without a heartbeat this long are re-claimed
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+    AI_EVENTS_MAX_SECONDS = int(os.environ.get('AI_EVENTS_MAX_SECONDS', 90))  # SSE streams close before the gunicorn timeout; clients reconnect. Each open stream holds one gthread thread (render.yaml)
+    
+    # LLM Rate Limiting (shared by all workers on this host)
+    LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 4))  # Model calls in flight at once
+    LLM_REQUESTS_PER_MINUTE = float(os.environ.get('LLM_REQUESTS_PER_MINUTE', 30))  # Token bucket refill rate
+    LLM_BURST = int(os.environ.get('LLM_BURST', 10))  # Token bucket capacity
+    LLM_QUEUE_TIMEOUT_SECONDS = int(os.environ.get('LLM_QUEUE_TIMEOUT_SECONDS', 120))  # Give up waiting for a slot or token after this (background jobs)
+    LLM_REQUEST_QUEUE_TIMEOUT_SECONDS = int(os.environ.get('LLM_REQUEST_QUEUE_TIMEOUT_SECONDS', 15))  # Same, for calls made while a request waits (well under the gunicorn timeout)
+    LLM_SLOT_TIMEOUT_SECONDS = int(os.environ.get('LLM_SLOT_TIMEOUT_SECONDS', 900))  # Slots held longer than this are treated as leaked
+    LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', 4))  # Retries of rate-limit/unavailable errors
+    LLM_BACKOFF_BASE_SECONDS = float(os.environ.get('LLM_BACKOFF_BASE_SECONDS', 1))
+    LLM_BACKOFF_MAX_SECONDS = float(os.environ.get('LLM_BACKOFF_MAX_SECONDS', 30))
+    LLM_BREAKER_FAILURES = int(os.environ.get('LLM_BREAKER_FAILURES', 5))  # Consecutive provider errors that open the circuit
+    LLM_BREAKER_COOLDOWN_SECONDS = int(os.environ.get('LLM_BREAKER_COOLDOWN_SECONDS', 30))  # Fail fast this long before a trial call
     
     # JazzCash Payment Gateway
     JAZZCASH_MERCHANT_ID = os.environ.get('JAZZCASH_MERCHANT_ID', 'MC12345')
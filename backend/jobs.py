@@ -0,0 +1,205 @@
+"""
+Background Job Runner
+Runs long tasks in bounded thread pools and records their status in the jobs table.
+Every job heartbeats while its worker owns it. Durable job kinds store their arguments,
+so a job whose worker died (e.g. a gunicorn restart) is claimed and re-run by another
+worker; jobs of other kinds are marked failed instead of staying queued forever.
+"""
+
+import time
+import uuid
+import threading
+import traceback
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from config import Config
+from models import db, Job
+
+
+class JobProgress:
+    """Callable that merges progress fields into a job row, throttling commits"""
+    
+    def __init__(self, job_id, min_interval=0.25):
+        self.job_id = job_id
+        self.min_interval = min_interval
+        self.fields = {}
+        self._last_flush = 0.0
+    
+    def __call__(self, force=False, **fields):
+        self.fields.update(fields)
+        now = time.monotonic()
+        if force or now - self._last_flush >= self.min_interval:
+            self._last_flush = now
+            update_job(self.job_id, progress=dict(self.fields))
+
+
+def update_job(job_id, **fields):
+    """Update a job row and commit immediately so pollers see the change"""
+    job = Job.query.get(job_id)
+    if not job:
+        return None
+    for key, value in fields.items():
+        setattr(job, key, value)
+    db.session.commit()
+    return job
+
+
+class JobQueue:
+    """Bounded worker pool so background throughput is sized separately from API workers"""
+    
+    def __init__(self, name, max_workers, kinds=()):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._handlers = {}
+        self._kinds = set(kinds)  # Non-durable kinds run here, failed when their worker dies
+        self._active = set()  # Job ids queued or running in this process
+        self._heartbeat_thread = None
+    
+    def _get_executor(self):
+        # Created lazily so threads start inside the gunicorn worker, not the pre-fork master
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+            return self._executor
+    
+    def enqueue(self, kind, user_id, fn, *args, **kwargs):
+        """
+        Record a queued job and schedule fn(progress, *args, **kwargs) on the pool.
+        The return value of fn becomes the job result.
+        """
+        job = Job(
+            id=uuid.uuid4().hex, kind=kind, user_id=user_id, status='queued', progress={},
+            attempts=1, heartbeat_at=datetime.utcnow()
+        )
+        db.session.add(job)
+        db.session.commit()
+        
+        app = current_app._get_current_object()
+        self._kinds.add(kind)
+        self.start(app)
+        with self._lock:
+            self._active.add(job.id)
+        self._get_executor().submit(self._run, app, job.id, fn, args, kwargs)
+        return job
+    
+    def register(self, kind, fn):
+        """Make a job kind durable: submit(kind, ...) jobs run as fn(progress, **payload)"""
+        self._handlers[kind] = fn
+    
+    def submit(self, kind, user_id, payload, job_id=None):
+        """
+        Record a durable job with its JSON payload (keyword arguments of the handler) and schedule it.
+        job_id lets the caller record the id elsewhere before the job can start.
+        """
+        job = Job(
+            id=job_id or uuid.uuid4().hex, kind=kind, user_id=user_id, status='queued', progress={},
+            payload=payload, attempts=1, heartbeat_at=datetime.utcnow()
+        )
+        db.session.add(job)
+        db.session.commit()
+        
+        app = current_app._get_current_object()
+        self.start(app)
+        self._schedule(app, job.id, self._handlers[kind], payload)
+        return job
+    
+    def _schedule(self, app, job_id, fn, payload):
+        with self._lock:
+            self._active.add(job_id)
+        self._get_executor().submit(self._run, app, job_id, fn, (), payload)
+    
+    def start(self, app):
+        """Start the heartbeat/recovery thread (idempotent)"""
+        with self._lock:
+            if self._heartbeat_thread is not None or not (self._handlers or self._kinds):
+                return
+            self._heartbeat_thread = threading.Thread(
+                target=self._heartbeat_loop, args=(app,), daemon=True, name=f'{self.name}-heartbeat'
+            )
+            self._heartbeat_thread.start()
+    
+    def _heartbeat_loop(self, app):
+        while True:
+            with app.app_context():
+                try:
+                    self._beat()
+                    self.recover_stale(app)
+                except Exception as e:
+                    print(f"⚠️ Job heartbeat failed ({self.name}): {e}")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+            time.sleep(Config.JOB_HEARTBEAT_SECONDS)
+    
+    def _beat(self):
+        with self._lock:
+            job_ids = list(self._active)
+        if job_ids:
+            Job.query.filter(Job.id.in_(job_ids)).update({'heartbeat_at': datetime.utcnow()}, synchronize_session=False)
+            db.session.commit()
+    
+    def recover_stale(self, app):
+        """
+        Claim and re-run durable jobs whose owning worker stopped sending heartbeats;
+        fail orphaned jobs of the other kinds, whose arguments were never stored
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=Config.JOB_STALE_SECONDS)
+        transient_kinds = list(self._kinds - set(self._handlers))
+        if transient_kinds:
+            # Rows from before jobs heartbeated have none; their age decides
+            orphaned = Job.query.filter(
+                Job.kind.in_(transient_kinds),
+                Job.status.in_(['queued', 'running']),
+                db.or_(Job.heartbeat_at < cutoff, db.and_(Job.heartbeat_at.is_(None), Job.created_at < cutoff))
+            ).update({
+                'status': 'failed',
+                'error': 'Job was interrupted by a server restart, please submit it again'
+            }, synchronize_session=False)
+            db.session.commit()
+            if orphaned:
+                print(f"♻️ Marked {orphaned} interrupted {self.name} jobs failed")
+        
+        stale = Job.query.filter(
+            Job.kind.in_(list(self._handlers)),
+            Job.status.in_(['queued', 'running']),
+            Job.heartbeat_at < cutoff
+        ).all()
+        
+        for job in stale:
+            job_id, kind, payload = job.id, job.kind, job.payload or {}
+            attempts, heartbeat_at = job.attempts or 0, job.heartbeat_at
+            
+            # Conditional update: when several workers notice the same stale job only one wins
+            claimed = Job.query.filter(Job.id == job_id, Job.heartbeat_at == heartbeat_at).update(
+                {'heartbeat_at': datetime.utcnow(), 'attempts': attempts + 1}, synchronize_session=False
+            )
+            db.session.commit()
+            if not claimed:
+                continue
+            
+            if attempts >= Config.JOB_MAX_ATTEMPTS:
+                update_job(job_id, status='failed', error=f'Job was interrupted {attempts} times')
+                continue
+            
+            print(f"♻️ Recovering {kind} job {job_id} (attempt {attempts + 1})")
+            update_job(job_id, status='queued')
+            self._schedule(app, job_id, self._handlers[kind], payload)
+    
+    def _run(self, app, job_id, fn, args, kwargs):
+        with app.app_context():
+            update_job(job_id, status='running')
+            progress = JobProgress(job_id)
+            try:
+                result = fn(progress, *args, **kwargs)
+                update_job(job_id, status='completed', result=result, progress=dict(progress.fields))
+            except Exception as e:
+                print(f"Job {job_id} failed: {e}")
+                traceback.print_exc()
+                db.session.rollback()
+                update_job(job_id, status='failed', error=str(e), progress=dict(progress.fields))
+            finally:
+                with self._lock:
+                    self._active.discard(job_id)
@@ -0,0 +1,191 @@
+"""
+Incremental JSON Object Parser
+Parses a streamed {"filename": "content", ...} object as chunks arrive and yields
+each entry as soon as its string value is complete, so generated files can be
+written and shown before the rest of the response has been produced
+"""
+
+import re
+import json
+
+WHITESPACE = ' \t\r\n'
+
+
+class JsonObjectStream:
+    """
+    Feed text chunks in order; feed() returns the (key, value) pairs completed by the chunk.
+    Text before the opening brace (e.g. a ```json fence) and after the closing brace is ignored.
+    Consumed text is dropped, so memory holds only the entry currently being received.
+    """
+    
+    def __init__(self):
+        self.buffer = ''
+        self.state = 'start'  # start, key, colon, value, comma, done
+        self.key = None
+        self.scan_from = 0  # Resume point for the closing-quote search of an unfinished string
+        self.received = 0
+    
+    @property
+    def complete(self):
+        return self.state == 'done'
+    
+    def feed(self, chunk):
+        self.received += len(chunk)
+        if self.state == 'done':
+            return []
+        self.buffer += chunk
+        
+        entries = []
+        position = 0
+        while True:
+            if self.state == 'start':
+                brace = self.buffer.find('{', position)
+                if brace == -1:
+                    position = len(self.buffer)
+                    break
+                position = brace + 1
+                self.state = 'key'
+                continue
+            
+            position = self._skip_whitespace(position)
+            if position >= len(self.buffer):
+                break
+            char = self.buffer[position]
+            
+            if self.state == 'comma':
+                if char == ',':
+                    position += 1
+                    self.state = 'key'
+                elif char == '}':
+                    position += 1
+                    self.state = 'done'
+                    break
+                else:
+                    raise ValueError(f"Expected ',' or '}}' after entry {self.key!r}, got {char!r}")
+            
+            elif self.state == 'key':
+                if char == '}':
+                    position += 1
+                    self.state = 'done'
+                    break
+                if char != '"':
+                    raise ValueError(f'Expected a quoted key, got {char!r}')
+                end = self._string_end(position)
+                if end == -1:
+                    break
+                self.key = json.loads(self.buffer[position:end + 1])
+                position = end + 1
+                self.state = 'colon'
+            
+            elif self.state == 'colon':
+                if char != ':':
+                    raise ValueError(f"Expected ':' after key {self.key!r}")
+                position += 1
+                self.state = 'value'
+            
+            elif self.state == 'value':
+                if char != '"':
+                    raise ValueError(f'Value of {self.key!r} is not a string')
+                end = self._string_end(position)
+                if end == -1:
+                    break
+                entries.append((self.key, json.loads(self.buffer[position:end + 1])))
+                position = end + 1
+                self.state = 'comma'
+        
+        # Drop consumed text; keep the unfinished token from its opening quote
+        self.buffer = self.buffer[position:]
+        self.scan_from = max(self.scan_from - position, 0)
+        return entries
+    
+    def _skip_whitespace(self, position):
+        while position < len(self.buffer) and self.buffer[position] in WHITESPACE:
+            position += 1
+        return position
+    
+    def _string_end(self, start):
+        """Index of the quote closing the string that opens at start, or -1 if it has not arrived yet"""
+        search = max(start + 1, self.scan_from)
+        while True:
+            quote = self.buffer.find('"', search)
+            if quote == -1:
+                # Resume later without rescanning, but keep a trailing backslash in view
+                self.scan_from = max(len(self.buffer) - 1, start + 1)
+                return -1
+            backslashes = 0
+            while self.buffer[quote - 1 - backslashes] == '\\':
+                backslashes += 1
+            if backslashes % 2 == 0:
+                self.scan_from = 0
+                return quote
+            search = quote + 1
+
+
+# A file entry key: "name.ext": " preceded by the object brace, a comma or (missing comma) the previous value's quote
+SALVAGE_FILE_KEY = r'[\w\-./]+\.(?:html|css|js)'
+SALVAGE_KEY_FORMAT = r'(?<=[{{,"])\s*"({keys})"\s*:\s*"'
+SALVAGE_KEY_PATTERN = re.compile(SALVAGE_KEY_FORMAT.format(keys=SALVAGE_FILE_KEY))
+SALVAGE_SEPARATOR_PATTERN = re.compile(r'"?\s*,?\s*$')
+SALVAGE_END_PATTERN = re.compile(r'"\s*}\s*(?:```)?\s*$')
+VALID_ESCAPES = '"\\/bfnrtu'
+
+
+def _decode_loose_string(raw):
+    """Decode a JSON string body, escaping stray quotes, raw control characters and invalid escapes"""
+    try:
+        return json.loads(f'"{raw}"')
+    except ValueError:
+        pass
+    
+    repaired = []
+    position = 0
+    while position < len(raw):
+        char = raw[position]
+        if char == '\\':
+            following = raw[position + 1:position + 2]
+            if following and following in VALID_ESCAPES:
+                repaired.append(char + following)
+                position += 2
+                continue
+            repaired.append('\\\\')
+        elif char == '"':
+            repaired.append('\\"')
+        elif char == '\n':
+            repaired.append('\\n')
+        elif char == '\r':
+            repaired.append('\\r')
+        elif char == '\t':
+            repaired.append('\\t')
+        else:
+            repaired.append(char)
+        position += 1
+    return json.loads('"' + ''.join(repaired) + '"', strict=False)
+
+
+def salvage_file_entries(text, extra_keys=()):
+    """
+    Recover every complete "filename": "content" entry from a truncated or slightly malformed
+    JSON object. Values are delimited by the next file key rather than by their closing quote,
+    so unescaped quotes inside content survive; an entry cut off by truncation is dropped.
+    Only .html/.css/.js keys are recognized, plus the string-valued extra_keys given.
+    """
+    pattern = SALVAGE_KEY_PATTERN
+    if extra_keys:
+        keys = '|'.join([SALVAGE_FILE_KEY] + [re.escape(key) for key in extra_keys])
+        pattern = re.compile(SALVAGE_KEY_FORMAT.format(keys=keys))
+    keys = list(pattern.finditer(text))
+    entries = {}
+    for i, match in enumerate(keys):
+        if i + 1 < len(keys):
+            raw = text[match.end():keys[i + 1].start()]
+            raw = raw[:SALVAGE_SEPARATOR_PATTERN.search(raw).start()]
+        else:
+            end = SALVAGE_END_PATTERN.search(text, match.end())
+            if end is None:
+                continue
+            raw = text[match.end():end.start()]
+        try:
+            entries[match.group(1)] = _decode_loose_string(raw)
+        except ValueError:
+            continue
+    return entries
@@ -0,0 +1,275 @@
+"""
+LLM Call Limiter
+Every model call goes through here: a token bucket and a concurrency cap shared by all
+gunicorn workers (state in a flock-guarded file), exponential backoff with jitter on
+rate-limit/unavailable errors, and a circuit breaker that fails fast while the
+provider is unhealthy
+"""
+
+import os
+import json
+import time
+import uuid
+import random
+import inspect
+import threading
+from contextlib import contextmanager
+from config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines only get in-process locking
+    fcntl = None
+
+# HTTP statuses (and provider exception names) worth retrying
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+RETRYABLE_NAMES = {
+    'ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable', 'InternalServerError',
+    'DeadlineExceeded', 'RateLimitError', 'APITimeoutError', 'APIConnectionError'
+}
+POLL_SECONDS = 0.25
+
+
+class LLMUnavailable(Exception):
+    """The provider is unhealthy (circuit open) or the limiter queue timed out"""
+    
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_retryable(error):
+    code = getattr(error, 'code', None) or getattr(error, 'status_code', None)
+    return code in RETRYABLE_CODES or type(error).__name__ in RETRYABLE_NAMES
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+class LLMLimiter:
+    """Shared limiter; state lives in a JSON file so every worker process sees the same bucket and slots"""
+    
+    def __init__(self, state_path):
+        self.state_path = state_path
+        self.guard = threading.RLock()
+        self.local = threading.local()
+        self.counters = {'calls': 0, 'retries': 0, 'throttled': 0, 'rejected': 0, 'failures': 0}
+    
+    def _count(self, name):
+        with self.guard:
+            self.counters[name] += 1
+    
+    @contextmanager
+    def _state(self):
+        """Read-modify-write the shared state under an exclusive lock"""
+        with self.guard:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            with open(self.state_path, 'a+') as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    try:
+                        state = json.loads(f.read() or '{}')
+                    except ValueError:
+                        state = {}
+                    state.setdefault('tokens', float(Config.LLM_BURST))
+                    state.setdefault('refilled_at', time.time())
+                    state.setdefault('slots', {})
+                    state.setdefault('waiting', {})
+                    state.setdefault('circuit', {'state': 'closed', 'failures': 0, 'opened_at': None, 'trial': None})
+                    self._refill(state)
+                    yield state
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(state))
+                    f.flush()
+                finally:
+                    if fcntl:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+    
+    def _refill(self, state):
+        now = time.time()
+        rate = Config.LLM_REQUESTS_PER_MINUTE / 60.0
+        state['tokens'] = min(float(Config.LLM_BURST), state['tokens'] + (now - state['refilled_at']) * rate)
+        state['refilled_at'] = now
+        # Slots and waiters of crashed or hung workers would otherwise block everyone
+        for table in ('slots', 'waiting'):
+            state[table] = {
+                key: entry for key, entry in state[table].items()
+                if _pid_alive(entry['pid']) and now - entry['since'] < Config.LLM_SLOT_TIMEOUT_SECONDS
+            }
+    
+    def _check_circuit(self, state, owner):
+        """Raise while the circuit is open; after the cooldown let a single trial call (slot owner) through"""
+        circuit = state['circuit']
+        if circuit['state'] == 'closed':
+            return
+        if circuit['state'] == 'half_open' and circuit.get('trial') == owner:
+            return
+        remaining = circuit['opened_at'] + Config.LLM_BREAKER_COOLDOWN_SECONDS - time.time()
+        trial_lost = circuit['state'] == 'half_open' and circuit.get('trial') not in state['slots']
+        if (circuit['state'] == 'open' and remaining <= 0) or trial_lost:
+            # A trial whose slot is gone (call abandoned, worker crashed) passes to the next caller
+            circuit.update(state='half_open', trial=owner)
+            return
+        self._count('rejected')
+        raise LLMUnavailable('AI provider is temporarily unavailable, please try again shortly', max(remaining, 1))
+    
+    def _wait_for(self, take, waiter_id, queue_timeout=None):
+        """Poll the shared state until take(state) succeeds, registering as a waiter meanwhile"""
+        if queue_timeout is None:
+            queue_timeout = Config.LLM_QUEUE_TIMEOUT_SECONDS
+        deadline = time.time() + queue_timeout
+        throttled = False
+        try:
+            while True:
+                with self._state() as state:
+                    if take(state):
+                        state['waiting'].pop(waiter_id, None)
+                        return
+                    state['waiting'][waiter_id] = {'pid': os.getpid(), 'since': time.time()}
+                if not throttled:
+                    throttled = True
+                    self._count('throttled')
+                if time.time() > deadline:
+                    raise LLMUnavailable('AI service is busy, please try again shortly', queue_timeout)
+                time.sleep(POLL_SECONDS * (1 + random.random()))
+        except BaseException:
+            with self._state() as state:
+                state['waiting'].pop(waiter_id, None)
+            raise
+    
+    @contextmanager
+    def slot(self, queue_timeout=None):
+        """
+        Hold one of LLM_MAX_CONCURRENCY shared call slots (re-entrant within a thread).
+        queue_timeout overrides LLM_QUEUE_TIMEOUT_SECONDS for callers that cannot wait that long.
+        """
+        depth = getattr(self.local, 'depth', 0)
+        if depth:
+            self.local.depth = depth + 1
+            try:
+                yield
+            finally:
+                self.local.depth -= 1
+            return
+        
+        slot_id = uuid.uuid4().hex
+        
+        def take(state):
+            if len(state['slots']) >= Config.LLM_MAX_CONCURRENCY:
+                return False
+            self._check_circuit(state, slot_id)
+            state['slots'][slot_id] = {'pid': os.getpid(), 'since': time.time()}
+            return True
+        
+        self._wait_for(take, slot_id, queue_timeout)
+        self.local.depth = 1
+        self.local.slot_id = slot_id
+        try:
+            yield
+        finally:
+            self.local.depth = 0
+            self.local.slot_id = None
+            with self._state() as state:
+                state['slots'].pop(slot_id, None)
+    
+    def _take_token(self, queue_timeout=None):
+        def take(state):
+            self._check_circuit(state, getattr(self.local, 'slot_id', None))
+            if state['tokens'] < 1:
+                return False
+            state['tokens'] -= 1
+            return True
+        
+        self._wait_for(take, uuid.uuid4().hex, queue_timeout)
+    
+    def _record(self, success):
+        with self._state() as state:
+            circuit = state['circuit']
+            if success:
+                state['circuit'] = {'state': 'closed', 'failures': 0, 'opened_at': None, 'trial': None}
+                return
+            circuit['failures'] += 1
+            if circuit['state'] == 'half_open' or circuit['failures'] >= Config.LLM_BREAKER_FAILURES:
+                if circuit['state'] != 'open':
+                    print(f"🔌 LLM circuit opened after {circuit['failures']} consecutive provider errors")
+                circuit.update(state='open', opened_at=time.time())
+    
+    def call(self, fn, *args, queue_timeout=None, **kwargs):
+        """
+        Call fn (a model request) under a slot and a rate token, retrying rate-limit and
+        availability errors with exponential backoff and jitter. Request handlers pass a short
+        queue_timeout so a busy limiter answers 503 before the worker timeout.
+        """
+        with self.slot(queue_timeout):
+            for attempt in range(Config.LLM_MAX_RETRIES + 1):
+                self._take_token(queue_timeout)
+                self._count('calls')
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception as e:
+                    if not is_retryable(e):
+                        # The provider answered; a bad request says nothing about its health
+                        self._record(success=True)
+                        raise
+                    self._count('failures')
+                    self._record(success=False)
+                    if attempt == Config.LLM_MAX_RETRIES:
+                        raise
+                    # Full jitter: spread retries so workers do not hit the provider in lockstep
+                    delay = random.uniform(0, min(Config.LLM_BACKOFF_MAX_SECONDS, Config.LLM_BACKOFF_BASE_SECONDS * 2 ** attempt))
+                    print(f"⏳ LLM call failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                    self._count('retries')
+                    time.sleep(delay)
+                    continue
+                # A streamed response is only known to be healthy once it has been read (see stream())
+                if not inspect.isgenerator(result):
+                    self._record(success=True)
+                return result
+    
+    def stream(self, chunks):
+        """
+        Iterate a streamed response from call(). Provider errors raised while it is read
+        (after call() has returned) count toward the circuit breaker, and only a stream
+        read to the end counts as a success.
+        """
+        try:
+            yield from chunks
+        except Exception as e:
+            if is_retryable(e):
+                self._count('failures')
+                self._record(success=False)
+            raise
+        self._record(success=True)
+    
+    def metrics(self):
+        """Shared limiter state plus this worker's counters"""
+        with self._state() as state:
+            circuit = dict(state['circuit'])
+            snapshot = {
+                'in_flight': len(state['slots']),
+                'max_concurrency': Config.LLM_MAX_CONCURRENCY,
+                'queue_depth': len(state['waiting']),
+                'tokens': round(state['tokens'], 2),
+                'burst': Config.LLM_BURST,
+                'requests_per_minute': Config.LLM_REQUESTS_PER_MINUTE
+            }
+        
+        if circuit['state'] == 'open':
+            circuit['retry_after'] = max(round(circuit['opened_at'] + Config.LLM_BREAKER_COOLDOWN_SECONDS - time.time(), 1), 0)
+        snapshot['circuit'] = circuit
+        with self.guard:
+            snapshot['worker'] = dict(self.counters, pid=os.getpid())
+        return snapshot
+
+
+limiter = LLMLimiter(os.path.join(Config.TEMPLATE_FOLDER, '.locks', 'llm_limiter.json'))
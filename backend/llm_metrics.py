@@ -0,0 +1,204 @@
+"""
+LLM Stage Metrics
+Per-stage instrumentation of AI generation: prompt and output tokens, time to first token,
+total latency, retries, parse/validation time and estimated cost. Call sites wrap a stage
+in measure(); llm_providers.generate fills in what each model call reports. Inside
+recording() (a generation job or regeneration request) stages are buffered and saved with
+its job and website ids, otherwise each stage is saved as soon as it ends.
+"""
+
+import time
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from flask import has_app_context
+from config import Config
+
+# Rough size of a token, for providers (and failed streams) that report no usage
+CHARS_PER_TOKEN = 4
+SUMMARY_FIELDS = ('latency_ms', 'ttft_ms', 'parse_ms', 'prompt_tokens', 'output_tokens')
+SUMMARY_MAX_ROWS = 50000
+
+_current = contextvars.ContextVar('llm_stage_metric', default=None)
+_recording = contextvars.ContextVar('llm_metrics_recording', default=None)
+
+
+class StageMetric:
+    """Measurements of one stage; a stage may make several model calls (limiter retries)"""
+    
+    def __init__(self, stage):
+        self.stage = stage
+        self.provider = None
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.tokens_estimated = False
+        self.ttft_ms = None
+        self.parse_seconds = 0.0
+        self.started = time.perf_counter()
+        self.latency_ms = None
+        self.success = False
+        self.error = None
+        self._call = None
+    
+    @property
+    def retries(self):
+        return max(self.calls - 1, 0)
+    
+    def start_call(self, provider, prompt):
+        self.calls += 1
+        self.provider = provider
+        self._call = {'started': time.perf_counter(), 'prompt_chars': len(prompt), 'usage': None}
+    
+    def first_token(self):
+        if self._call is not None:
+            self.ttft_ms = int((time.perf_counter() - self._call['started']) * 1000)
+    
+    def report_usage(self, prompt_tokens, output_tokens):
+        """Token counts as reported by the provider for the call in progress"""
+        if self._call is not None and prompt_tokens is not None and output_tokens is not None:
+            self._call['usage'] = (int(prompt_tokens), int(output_tokens))
+    
+    def end_call(self, output_chars):
+        if self._call is None:
+            return
+        usage = self._call['usage']
+        if usage is None:
+            usage = (self._call['prompt_chars'] // CHARS_PER_TOKEN, output_chars // CHARS_PER_TOKEN)
+            self.tokens_estimated = True
+        self.prompt_tokens += usage[0]
+        self.output_tokens += usage[1]
+        self._call = None
+    
+    @contextmanager
+    def parsing(self):
+        """Time spent parsing and validating the response"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.parse_seconds += time.perf_counter() - start
+    
+    @property
+    def cost_usd(self):
+        prefix = (self.provider or '').upper()
+        input_cost = getattr(Config, f'{prefix}_INPUT_COST_PER_MTOK', 0.0)
+        output_cost = getattr(Config, f'{prefix}_OUTPUT_COST_PER_MTOK', 0.0)
+        return round((self.prompt_tokens * input_cost + self.output_tokens * output_cost) / 1_000_000, 6)
+
+
+def current():
+    """The stage being measured in this context, if any"""
+    return _current.get()
+
+
+@contextmanager
+def measure(stage):
+    """Measure one stage of generation; the metric is recorded whether it succeeds or raises"""
+    metric = StageMetric(stage)
+    token = _current.set(metric)
+    try:
+        yield metric
+        metric.success = True
+    except Exception as e:
+        metric.error = f'{type(e).__name__}: {str(e)}'[:500]
+        raise
+    finally:
+        _current.reset(token)
+        metric.latency_ms = int((time.perf_counter() - metric.started) * 1000)
+        buffer = _recording.get()
+        if buffer is not None:
+            buffer['metrics'].append(metric)
+        elif has_app_context():
+            save([metric])
+
+
+@contextmanager
+def recording(**tags):
+    """
+    Buffer the stages measured in this context (and in threads started with its context
+    copied) and save them on exit. Yields the tags dict so ids known only at the end,
+    such as the saved website, can be added.
+    """
+    buffer = {'tags': dict(tags), 'metrics': []}
+    token = _recording.set(buffer)
+    try:
+        yield buffer['tags']
+    finally:
+        _recording.reset(token)
+        save(buffer['metrics'], **buffer['tags'])
+
+
+def save(metrics, job_id=None, ai_website_id=None, user_id=None):
+    """Store measured stages; metrics never fail the request they describe"""
+    from models import db, AIGenerationMetric
+    
+    if not metrics:
+        return
+    try:
+        db.session.add_all([
+            AIGenerationMetric(
+                stage=metric.stage,
+                provider=metric.provider,
+                job_id=job_id,
+                ai_website_id=ai_website_id,
+                user_id=user_id,
+                success=metric.success,
+                error=metric.error,
+                prompt_tokens=metric.prompt_tokens,
+                output_tokens=metric.output_tokens,
+                tokens_estimated=metric.tokens_estimated,
+                ttft_ms=metric.ttft_ms,
+                latency_ms=metric.latency_ms,
+                parse_ms=int(metric.parse_seconds * 1000),
+                retries=metric.retries,
+                cost_usd=metric.cost_usd
+            )
+            for metric in metrics
+        ])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"⚠️ Could not save AI generation metrics: {str(e)}")
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] if ordered else None
+
+
+def stage_summary(hours=24, provider=None, ai_website_id=None):
+    """Per-stage call counts, failure and retry totals, cost, and p50/p95 of each measurement"""
+    from models import AIGenerationMetric
+    
+    query = AIGenerationMetric.query.filter(AIGenerationMetric.created_at >= datetime.utcnow() - timedelta(hours=hours))
+    if provider:
+        query = query.filter_by(provider=provider)
+    if ai_website_id is not None:
+        query = query.filter_by(ai_website_id=ai_website_id)
+    rows = query.order_by(AIGenerationMetric.created_at.desc()).limit(SUMMARY_MAX_ROWS).all()
+    
+    by_stage = {}
+    for row in rows:
+        by_stage.setdefault(row.stage, []).append(row)
+    
+    stages = {}
+    for stage, stage_rows in sorted(by_stage.items()):
+        summary = {
+            'calls': len(stage_rows),
+            'failures': sum(1 for row in stage_rows if not row.success),
+            'retries': sum(row.retries or 0 for row in stage_rows),
+            'estimated_tokens': sum(1 for row in stage_rows if row.tokens_estimated),
+            'cost_usd': round(sum(row.cost_usd or 0 for row in stage_rows), 4)
+        }
+        for field in SUMMARY_FIELDS:
+            values = [getattr(row, field) for row in stage_rows if getattr(row, field) is not None]
+            summary[field] = {'p50': _percentile(values, 0.5), 'p95': _percentile(values, 0.95)}
+        stages[stage] = summary
+    
+    return {
+        'hours': hours,
+        'rows': len(rows),
+        'cost_usd': round(sum(row.cost_usd or 0 for row in rows), 4),
+        'stages': stages
+    }
@@ -0,0 +1,383 @@
+"""
+LLM Providers
+One interface over the model backends: generate(prompt, purpose, ...) returns the response
+text, or an iterator of text chunks when streaming. Gemini and OpenAI call the real APIs;
+the fake replays recorded responses (or synthesizes valid ones) with configurable latency,
+so the whole generate/validate/write/zip pipeline can be benchmarked offline.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from config import Config
+import llm_metrics
+
+# What a call is for; the fake picks recorded responses by purpose
+PURPOSES = ('enhance', 'improve', 'website', 'layout', 'contract', 'page', 'regenerate', 'plan', 'patch')
+OVERRIDE_CHECK_SECONDS = 5
+
+
+class GeminiProvider:
+    name = 'gemini'
+    
+    def __init__(self):
+        import google.generativeai as genai
+        genai.configure(api_key=Config.GEMINI_API_KEY)
+        self.genai = genai
+        self.model = genai.GenerativeModel(Config.GEMINI_MODEL)
+    
+    def generate(self, prompt, temperature, max_output_tokens, stream):
+        response = self.model.generate_content(
+            prompt,
+            generation_config=self.genai.types.GenerationConfig(
+                temperature=temperature,
+                max_output_tokens=max_output_tokens,
+            ),
+            stream=stream
+        )
+        if not stream:
+            self._report_usage(response)
+            return response.text
+        return self._stream(response)
+    
+    def _stream(self, response):
+        for chunk in response:
+            text = self._chunk_text(chunk)
+            if text:
+                yield text
+        # Usage is aggregated on the response once the stream is consumed
+        self._report_usage(response)
+    
+    @staticmethod
+    def _report_usage(response):
+        metric = llm_metrics.current()
+        usage = getattr(response, 'usage_metadata', None)
+        if metric is not None and usage is not None:
+            metric.report_usage(getattr(usage, 'prompt_token_count', None), getattr(usage, 'candidates_token_count', None))
+    
+    @staticmethod
+    def _chunk_text(chunk):
+        try:
+            return chunk.text
+        except ValueError:
+            # Chunks without text parts, e.g. the final one carrying only the finish reason
+            return ''
+
+
+class OpenAIProvider:
+    name = 'openai'
+    
+    def __init__(self):
+        from openai import OpenAI
+        self.client = OpenAI(api_key=Config.OPENAI_API_KEY)
+    
+    def generate(self, prompt, temperature, max_output_tokens, stream):
+        response = self.client.chat.completions.create(
+            model=Config.OPENAI_MODEL,
+            messages=[{'role': 'user', 'content': prompt}],
+            temperature=min(temperature, 2.0),
+            max_tokens=min(max_output_tokens, Config.OPENAI_MAX_OUTPUT_TOKENS),
+            stream=stream,
+            **({'stream_options': {'include_usage': True}} if stream else {})
+        )
+        if not stream:
+            self._report_usage(response.usage)
+            return response.choices[0].message.content or ''
+        return self._stream(response)
+    
+    def _stream(self, response):
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            if getattr(chunk, 'usage', None):
+                # Only the final chunk carries usage
+                self._report_usage(chunk.usage)
+    
+    @staticmethod
+    def _report_usage(usage):
+        metric = llm_metrics.current()
+        if metric is not None and usage is not None:
+            metric.report_usage(usage.prompt_tokens, usage.completion_tokens)
+
+
+class FakeProvider:
+    """
+    Deterministic offline provider. Replays responses recorded under LLM_FIXTURES_DIR
+    (an exact prompt match first, otherwise round-robin per purpose); without recordings
+    it synthesizes minimal valid responses from what the prompt asks for.
+    """
+    name = 'fake'
+    
+    def __init__(self):
+        self.fixtures = load_fixtures(Config.LLM_FIXTURES_DIR)
+        self.counters = {}
+        self.lock = threading.Lock()
+    
+    def generate(self, prompt, temperature, max_output_tokens, stream, purpose='website'):
+        text = self._replay(prompt, purpose)
+        if text is None:
+            text = synthesize_response(prompt, purpose)
+        
+        time.sleep(Config.LLM_FAKE_LATENCY_MS / 1000)
+        if not stream:
+            time.sleep(self._transfer_seconds(len(text)))
+            return text
+        return self._stream(text)
+    
+    def _transfer_seconds(self, size):
+        rate = Config.LLM_FAKE_CHARS_PER_SECOND
+        return size / rate if rate > 0 else 0
+    
+    def _stream(self, text):
+        size = Config.LLM_FAKE_CHUNK_CHARS
+        for start in range(0, len(text), size):
+            chunk = text[start:start + size]
+            time.sleep(self._transfer_seconds(len(chunk)))
+            yield chunk
+    
+    def _replay(self, prompt, purpose):
+        recorded = self.fixtures.get(purpose)
+        if not recorded:
+            return None
+        prompt_sha = _prompt_sha(prompt)
+        for entry in recorded:
+            if entry.get('prompt_sha256') == prompt_sha:
+                return entry['response']
+        with self.lock:
+            index = self.counters.get(purpose, 0)
+            self.counters[purpose] = index + 1
+        return recorded[index % len(recorded)]['response']
+
+
+PROVIDERS = {
+    'gemini': GeminiProvider,
+    'openai': OpenAIProvider,
+    'fake': FakeProvider
+}
+
+
+def check_configured_provider():
+    """Refuse to start with an unknown LLM_PROVIDER rather than quietly calling another (paid) provider"""
+    if Config.LLM_PROVIDER not in PROVIDERS:
+        raise ValueError(f"Unknown LLM_PROVIDER '{Config.LLM_PROVIDER}'. Available: {', '.join(PROVIDERS)}")
+
+
+check_configured_provider()
+
+_instances = {}
+_instances_lock = threading.Lock()
+_override = {'name': None, 'checked_at': 0}
+_unknown_overrides = set()
+
+
+def _prompt_sha(prompt):
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+
+def _override_path():
+    return os.path.join(Config.TEMPLATE_FOLDER, '.locks', 'llm_provider.json')
+
+
+def provider_name():
+    """Active provider: the runtime override shared through a file (checked every few seconds), else LLM_PROVIDER"""
+    now = time.time()
+    if now - _override['checked_at'] > OVERRIDE_CHECK_SECONDS:
+        try:
+            with open(_override_path(), 'r', encoding='utf-8') as f:
+                _override['name'] = json.load(f).get('provider')
+        except (OSError, ValueError):
+            _override['name'] = None
+        _override['checked_at'] = now
+    name = _override['name'] or Config.LLM_PROVIDER
+    if name not in PROVIDERS:
+        # An override written by another release may name a provider this one lacks; report it once
+        with _instances_lock:
+            warn = name not in _unknown_overrides
+            _unknown_overrides.add(name)
+        if warn:
+            print(f"⚠️ Unknown LLM provider override '{name}', using LLM_PROVIDER ({Config.LLM_PROVIDER})")
+        name = Config.LLM_PROVIDER
+    return name
+
+
+def set_provider(name):
+    """Switch every worker to another provider (None returns to LLM_PROVIDER)"""
+    if name is not None and name not in PROVIDERS:
+        raise ValueError(f"Unknown provider '{name}'. Available: {', '.join(PROVIDERS)}")
+    path = _override_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'provider': name}, f)
+    os.replace(tmp_path, path)
+    _override.update(name=name, checked_at=time.time())
+
+
+def get_provider(name=None):
+    """Provider instance, created on first use so importing this module never touches an API"""
+    name = name or provider_name()
+    with _instances_lock:
+        if name not in _instances:
+            _instances[name] = PROVIDERS[name]()
+        return _instances[name]
+
+
+def generate(prompt, purpose, temperature=1.0, max_output_tokens=8192, stream=False):
+    """Response text (or an iterator of text chunks when streaming) from the active provider"""
+    provider = get_provider()
+    metric = llm_metrics.current()
+    if metric is not None:
+        metric.start_call(provider.name, prompt)
+    
+    if isinstance(provider, FakeProvider):
+        response = provider.generate(prompt, temperature, max_output_tokens, stream, purpose=purpose)
+    else:
+        response = provider.generate(prompt, temperature, max_output_tokens, stream)
+        if Config.LLM_RECORD_FIXTURES:
+            if stream:
+                response = _record_stream(purpose, prompt, provider.name, response)
+            else:
+                record_fixture(purpose, prompt, provider.name, response)
+    
+    if metric is None:
+        return response
+    if stream:
+        return _measure_stream(metric, response)
+    metric.first_token()
+    metric.end_call(len(response))
+    return response
+
+
+def _measure_stream(metric, chunks):
+    received = 0
+    for chunk in chunks:
+        if not received:
+            metric.first_token()
+        received += len(chunk)
+        yield chunk
+    metric.end_call(received)
+
+
+def _record_stream(purpose, prompt, provider, chunks):
+    received = []
+    for chunk in chunks:
+        received.append(chunk)
+        yield chunk
+    record_fixture(purpose, prompt, provider, ''.join(received))
+
+
+# ==================== RECORDED FIXTURES ====================
+
+_fixtures_lock = threading.Lock()
+
+
+def load_fixtures(fixtures_dir):
+    """purpose -> recorded entries, from <fixtures_dir>/<purpose>.jsonl"""
+    fixtures = {}
+    for purpose in PURPOSES:
+        path = os.path.join(fixtures_dir, f'{purpose}.jsonl')
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            fixtures[purpose] = [json.loads(line) for line in f if line.strip()]
+    return fixtures
+
+
+def record_fixture(purpose, prompt, provider, response):
+    """Append a real response so the fake provider can replay it"""
+    os.makedirs(Config.LLM_FIXTURES_DIR, exist_ok=True)
+    entry = {'provider': provider, 'prompt_sha256': _prompt_sha(prompt), 'response': response}
+    with _fixtures_lock:
+        with open(os.path.join(Config.LLM_FIXTURES_DIR, f'{purpose}.jsonl'), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+
+
+# ==================== SYNTHESIZED RESPONSES ====================
+
+def _fake_sections(page):
+    title = page.replace('-', ' ').title()
+    return ''.join(
+        f'<section class="section"><div class="container"><h2>{title} section {i}</h2>'
+        f'<p>Deterministic placeholder content for benchmarking the {page} page.</p>'
+        f'<img src="https://picsum.photos/id/{10 + i}/800/600" alt="{title} {i}"></div></section>\n'
+        for i in range(1, 6)
+    )
+
+
+def _fake_page(page):
+    title = page.replace('-', ' ').title()
+    sections = _fake_sections(page)
+    return (
+        f'<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="UTF-8">\n<title>{title}</title>\n'
+        f'<link rel="stylesheet" href="styles.css">\n</head>\n<body>\n<!-- NAV -->\n'
+        f'<main>\n{sections}</main>\n<!-- FOOTER -->\n<script src="script.js"></script>\n</body>\n</html>'
+    )
+
+
+FAKE_CSS = ''.join(
+    f'.section:nth-child({i}) {{ padding: {i}rem 0; background: #f{i % 10}f{i % 10}f{i % 10}; }}\n' for i in range(1, 40)
+)
+FAKE_JS = "document.querySelectorAll('.nav-toggle').forEach(b => b.addEventListener('click', () => b.nextElementSibling.classList.toggle('open')));\n"
+
+
+def synthesize_response(prompt, purpose):
+    """Minimal valid response for what the prompt asks for"""
+    if purpose == 'enhance':
+        return json.dumps({
+            'enhanced_description': 'A modern, responsive website with clear calls to action.',
+            'business_type': 'general',
+            'target_audience': 'local customers',
+            'key_features': ['responsive design', 'contact form', 'gallery'],
+            'pages': ['index', 'about', 'services', 'contact'],
+            'visual_style': 'modern',
+            'color_mood': 'professional'
+        })
+    if purpose == 'improve':
+        return 'A modern, responsive website for a local business with home, about, services and contact pages.'
+    if purpose in ('contract', 'layout'):
+        shared = {
+            'business_name': 'Benchmark Business',
+            'design_notes': 'Sections use .section > .container; headings are h2.',
+            'head.html': '<link rel="preconnect" href="https://fonts.googleapis.com">',
+            'footer.html': '<footer class="footer"><div class="container"><p>&copy; Benchmark Business</p></div></footer>',
+            'styles.css': FAKE_CSS,
+            'script.js': FAKE_JS
+        }
+        if purpose == 'contract':
+            del shared['head.html']
+            return json.dumps(shared)
+        # The layout keys and page bodies the prompt asks for, in its order
+        response = {}
+        for key in re.findall(r'^  "([\w.-]+)": "', prompt, re.MULTILINE):
+            response[key] = shared[key] if key in shared else _fake_sections(key[:-5])
+        return json.dumps(response)
+    if purpose == 'page':
+        match = re.search(r'WRITE THIS PAGE: ([\w-]+)\.html', prompt)
+        return _fake_page(match.group(1) if match else 'index')
+    if purpose == 'regenerate':
+        return _fake_page('index')
+    if purpose == 'plan':
+        # The first section of the outline
+        match = re.search(r'^(\S+#\d+) \[', prompt, re.MULTILINE)
+        return json.dumps({'sections': [match.group(1)] if match else []})
+    if purpose == 'patch':
+        # Sections come back unchanged apart from a marker comment
+        patches = {}
+        for section_id, source in re.findall(r'<<<SECTION (\S+)>>>\n(.*?)\n<<<END>>>', prompt, re.DOTALL):
+            marker = '/* patched */' if re.search(r'\.(?:css|js)#', section_id) else '<!-- patched -->'
+            patches[section_id] = f'{source}\n{marker}'
+        return json.dumps(patches)
+    
+    # Whole site (or the missing files of one): every file named in the requested JSON shape
+    files = {}
+    for filename in re.findall(r'"([\w-]+\.(?:html|css|js))":\s*"', prompt):
+        if filename.endswith('.html'):
+            files.setdefault(filename, _fake_page(filename[:-5]))
+        elif filename.endswith('.css'):
+            files.setdefault(filename, FAKE_CSS)
+        else:
+            files.setdefault(filename, FAKE_JS)
+    return json.dumps(files)
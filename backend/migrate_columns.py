@@ -0,0 +1,37 @@
+"""
+Database migration script to add columns introduced after tables were created.
+db.create_all() only creates missing tables, so run this after pulling model changes.
+"""
+
+from app import app, db
+
+# (table, column, DDL type)
+NEW_COLUMNS = [
+    ('template_customizations', 'content_hash', 'VARCHAR(64)'),
+    ('template_customizations', 'versions', 'JSON'),
+    ('template_customizations', 'primary_color', 'VARCHAR(7)'),
+    ('template_customizations', 'secondary_color', 'VARCHAR(7)'),
+    ('template_customizations', 'accent_color', 'VARCHAR(7)'),
+    ('template_customizations', 'template_version', 'VARCHAR(64)'),
+    ('templates', 'ingest_status', 'JSON'),
+    ('uploaded_artifacts', 'image_meta', 'JSON'),
+    ('jobs', 'payload', 'JSON'),
+    ('jobs', 'attempts', 'INTEGER'),
+    ('jobs', 'heartbeat_at', 'TIMESTAMP'),
+]
+
+with app.app_context():
+    db.create_all()
+    inspector = db.inspect(db.engine)
+    
+    for table, column, ddl_type in NEW_COLUMNS:
+        existing = {c['name'] for c in inspector.get_columns(table)}
+        if column in existing:
+            print(f"   - {table}.{column} already exists")
+            continue
+        
+        with db.engine.begin() as connection:
+            connection.execute(db.text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl_type}'))
+        print(f"✅ Added {table}.{column}")
+    
+    print("✅ Database columns up to date!")
@@ -96,6 +96,7 @@ class Template(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_editable = db.Column(db.Boolean, default=False)  # Admin templates that can be AI-edited
+    ingest_status = db.Column(db.JSON)  # Ingest pipeline status per stage (None for templates added before ingest)
     
     purchases = db.relationship('Purchase', backref='template', lazy=True, cascade='all, delete-orphan')
     reviews = db.relationship('Review', backref='template', lazy=True, cascade='all, delete-orphan')
@@ -115,7 +116,8 @@ class Template(db.Model):
             'views': self.views,
             'rating': self.rating,
             'created_at': self.created_at.isoformat(),
-            'is_editable': self.is_editable
+            'is_editable': self.is_editable,
+            'ingest_status': self.ingest_status
         }
 
 
@@ -182,6 +184,176 @@ class AIWebsite(db.Model):
         }
 
 
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    kind = db.Column(db.String(50), nullable=False)  # customization, ...
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    status = db.Column(db.String(20), default='queued')  # queued, running, completed, failed
+    progress = db.Column(db.JSON)
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    payload = db.Column(db.JSON)  # Arguments of durable jobs, so another worker can re-run them
+    attempts = db.Column(db.Integer, default=0)
+    heartbeat_at = db.Column(db.DateTime)  # Refreshed while a worker owns the job
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'user_id': self.user_id,
+            'status': self.status,
+            'progress': self.progress or {},
+            'result': self.result,
+            'error': self.error,
+            'attempts': self.attempts,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class PromptCacheEntry(db.Model):
+    __tablename__ = 'prompt_cache'
+    __table_args__ = (db.UniqueConstraint('kind', 'key', name='uq_prompt_cache_key'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # enhance, improve
+    key = db.Column(db.String(64), nullable=False)  # SHA-256 of the normalized description
+    description = db.Column(db.Text, nullable=False)  # Normalized description
+    value = db.Column(db.JSON, nullable=False)
+    hits = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'description': self.description,
+            'hits': self.hits,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'last_used_at': self.last_used_at.isoformat() if self.last_used_at else None
+        }
+
+
+class AIGenerationMetric(db.Model):
+    __tablename__ = 'ai_generation_metrics'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    stage = db.Column(db.String(20), nullable=False, index=True)  # enhance, website, contract, page, regenerate, plan, patch, improve
+    provider = db.Column(db.String(20))
+    job_id = db.Column(db.String(32), index=True)
+    ai_website_id = db.Column(db.Integer, db.ForeignKey('ai_websites.id'), nullable=True, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    success = db.Column(db.Boolean, default=True)
+    error = db.Column(db.Text)
+    prompt_tokens = db.Column(db.Integer, default=0)
+    output_tokens = db.Column(db.Integer, default=0)
+    tokens_estimated = db.Column(db.Boolean, default=False)  # Counted from characters; the provider reported no usage
+    ttft_ms = db.Column(db.Integer)  # Time to first token of the last model call
+    latency_ms = db.Column(db.Integer)  # Whole stage, including queueing, retries and parsing
+    parse_ms = db.Column(db.Integer)  # Parsing and validating the response
+    retries = db.Column(db.Integer, default=0)
+    cost_usd = db.Column(db.Float, default=0.0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'stage': self.stage,
+            'provider': self.provider,
+            'job_id': self.job_id,
+            'ai_website_id': self.ai_website_id,
+            'user_id': self.user_id,
+            'success': self.success,
+            'error': self.error,
+            'prompt_tokens': self.prompt_tokens,
+            'output_tokens': self.output_tokens,
+            'tokens_estimated': self.tokens_estimated,
+            'ttft_ms': self.ttft_ms,
+            'latency_ms': self.latency_ms,
+            'parse_ms': self.parse_ms,
+            'retries': self.retries,
+            'cost_usd': self.cost_usd,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class UploadSession(db.Model):
+    __tablename__ = 'upload_sessions'
+    
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    chunk_size = db.Column(db.Integer, nullable=False)
+    sha256 = db.Column(db.String(64))  # Expected digest of the whole archive, if the client sent one
+    status = db.Column(db.String(20), default='active')  # active, finalizing, completed, failed
+    result = db.Column(db.JSON)  # Upload result once finalized
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime)
+    
+    @property
+    def total_chunks(self):
+        return max(1, -(-self.total_size // self.chunk_size))
+    
+    def chunk_length(self, index):
+        """Expected byte length of chunk number index"""
+        if index < self.total_chunks - 1:
+            return self.chunk_size
+        return self.total_size - self.chunk_size * (self.total_chunks - 1)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'total_size': self.total_size,
+            'chunk_size': self.chunk_size,
+            'total_chunks': self.total_chunks,
+            'sha256': self.sha256,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
+
+
+class UploadedArtifact(db.Model):
+    __tablename__ = 'uploaded_artifacts'
+    __table_args__ = (db.UniqueConstraint('kind', 'sha256', name='uq_uploaded_artifact_hash'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # template, image
+    sha256 = db.Column(db.String(64), nullable=False, index=True)
+    path = db.Column(db.String(255), nullable=False)  # Extraction directory or stored file
+    url = db.Column(db.String(255))  # Public URL for images
+    size = db.Column(db.Integer)
+    file_count = db.Column(db.Integer)
+    original_filename = db.Column(db.String(255))
+    image_meta = db.Column(db.JSON)  # Dimensions, format and derivative URLs of processed images
+    uploaded_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'sha256': self.sha256,
+            'path': self.path,
+            'url': self.url,
+            'size': self.size,
+            'file_count': self.file_count,
+            'original_filename': self.original_filename,
+            'image_meta': self.image_meta,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
 class Payment(db.Model):
     __tablename__ = 'payments'
     
@@ -257,12 +429,40 @@ class TemplateCustomization(db.Model):
     linkedin = db.Column(db.String(255))
     instagram = db.Column(db.String(255))
     
+    # Brand Colors (#rrggbb)
+    primary_color = db.Column(db.String(7))
+    secondary_color = db.Column(db.String(7))
+    accent_color = db.Column(db.String(7))
+    
     # Files
     logo_path = db.Column(db.String(255))
     customized_file_path = db.Column(db.String(255))
+    content_hash = db.Column(db.String(64), index=True)  # Cache key of template version + details + logo
+    template_version = db.Column(db.String(64))  # Fingerprint of the template source the artifact was built from
+    versions = db.Column(db.JSON)  # Previous artifacts and details, kept for rollback
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    def business_details(self):
+        """Business details in the field names used by the customize endpoints"""
+        return {
+            'businessName': self.business_name or '',
+            'tagline': self.tagline or '',
+            'description': self.description or '',
+            'email': self.email or '',
+            'phone': self.phone or '',
+            'address': self.address or '',
+            'city': self.city or '',
+            'country': self.country or '',
+            'facebook': self.facebook or '',
+            'twitter': self.twitter or '',
+            'linkedin': self.linkedin or '',
+            'instagram': self.instagram or '',
+            'primaryColor': self.primary_color or '',
+            'secondaryColor': self.secondary_color or '',
+            'accentColor': self.accent_color or ''
+        }
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -280,7 +480,13 @@ class TemplateCustomization(db.Model):
             'twitter': self.twitter,
             'linkedin': self.linkedin,
             'instagram': self.instagram,
+            'primary_color': self.primary_color,
+            'secondary_color': self.secondary_color,
+            'accent_color': self.accent_color,
             'logo_path': self.logo_path,
             'customized_file_path': self.customized_file_path,
+            'versions': [
+                {'version': v['version'], 'created_at': v['created_at']} for v in (self.versions or [])
+            ],
             'created_at': self.created_at.isoformat()
         }
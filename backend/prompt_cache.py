@@ -0,0 +1,169 @@
+"""
+Prompt Cache
+Persists LLM results for prompt enhancement and prompt improvement, keyed by the
+normalized description, with TTL expiry and LRU eviction, so repeated descriptions
+skip a multi-second model call
+"""
+
+import re
+import copy
+import hashlib
+import time
+import threading
+from datetime import datetime, timedelta
+from flask import has_app_context
+from sqlalchemy.exc import IntegrityError
+from config import Config
+from models import db, PromptCacheEntry
+from similarity import SimilarityIndex
+
+# In-process lookup counters per kind (hits/misses since this worker started)
+_stats = {}
+_stats_lock = threading.Lock()
+
+# Per-kind similarity index over stored descriptions, reloaded periodically to pick up other workers' entries
+SIMILARITY_RELOAD_SECONDS = 300
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def normalize_description(description):
+    """Case, whitespace and surrounding punctuation do not change what the user asked for"""
+    text = re.sub(r'\s+', ' ', (description or '').lower()).strip()
+    return text.strip(' .,!?;:"\'')
+
+
+def _cache_key(normalized):
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def _count(kind, outcome):
+    with _stats_lock:
+        counters = _stats.setdefault(kind, {'hits': 0, 'misses': 0, 'similar_hits': 0})
+        counters[outcome] += 1
+
+
+def get_cached(kind, description):
+    """Cached value for a description, or None (also None outside an app context)"""
+    if not has_app_context():
+        return None
+    
+    normalized = normalize_description(description)
+    try:
+        entry = PromptCacheEntry.query.filter_by(kind=kind, key=_cache_key(normalized)).first()
+        if entry and entry.created_at < datetime.utcnow() - timedelta(hours=Config.PROMPT_CACHE_TTL_HOURS):
+            db.session.delete(entry)
+            db.session.commit()
+            entry = None
+        
+        if entry is None:
+            _count(kind, 'misses')
+            return None
+        
+        entry.hits = (entry.hits or 0) + 1
+        entry.last_used_at = datetime.utcnow()
+        value = copy.deepcopy(entry.value)  # Callers may mutate the result
+        db.session.commit()
+    except Exception as e:
+        print(f"⚠️ Prompt cache lookup failed: {e}")
+        db.session.rollback()
+        return None
+    
+    _count(kind, 'hits')
+    print(f"⚡ Prompt cache hit ({kind}): '{normalized[:60]}'")
+    return value
+
+
+def store(kind, description, value):
+    """Cache a value, evicting the least recently used entries beyond PROMPT_CACHE_MAX_ENTRIES"""
+    if not has_app_context():
+        return
+    
+    normalized = normalize_description(description)
+    key = _cache_key(normalized)
+    try:
+        entry = PromptCacheEntry.query.filter_by(kind=kind, key=key).first()
+        if entry is None:
+            entry = PromptCacheEntry(kind=kind, key=key, description=normalized, hits=0)
+            db.session.add(entry)
+        entry.value = value
+        entry.created_at = entry.last_used_at = datetime.utcnow()
+        db.session.commit()
+        _similarity_index(kind).add(key, normalized)
+        
+        excess = PromptCacheEntry.query.count() - Config.PROMPT_CACHE_MAX_ENTRIES
+        if excess > 0:
+            stale_ids = [row.id for row in PromptCacheEntry.query.order_by(PromptCacheEntry.last_used_at).limit(excess)]
+            PromptCacheEntry.query.filter(PromptCacheEntry.id.in_(stale_ids)).delete(synchronize_session=False)
+            db.session.commit()
+    except IntegrityError:
+        # Another worker cached the same description first
+        db.session.rollback()
+    except Exception as e:
+        print(f"⚠️ Prompt cache store failed: {e}")
+        db.session.rollback()
+
+
+def _similarity_index(kind):
+    with _indexes_lock:
+        index, loaded_at = _indexes.get(kind, (None, 0))
+        if index is None or time.time() - loaded_at > SIMILARITY_RELOAD_SECONDS:
+            index = SimilarityIndex()
+            rows = db.session.query(PromptCacheEntry.key, PromptCacheEntry.description).filter_by(kind=kind)
+            for key, description in rows:
+                index.add(key, description)
+            _indexes[kind] = (index, time.time())
+        return index
+
+
+def find_similar(kind, description):
+    """
+    (similarity, value) of the closest cached description at or above
+    PROMPT_SIMILARITY_THRESHOLD, or None
+    """
+    if not has_app_context() or Config.PROMPT_SIMILARITY_THRESHOLD > 1:
+        return None
+    
+    try:
+        index = _similarity_index(kind)
+        cutoff = datetime.utcnow() - timedelta(hours=Config.PROMPT_CACHE_TTL_HOURS)
+        for similarity, key in index.query(description, Config.PROMPT_SIMILARITY_THRESHOLD):
+            entry = PromptCacheEntry.query.filter_by(kind=kind, key=key).first()
+            if entry is None or entry.created_at < cutoff:
+                # Evicted or expired since the index was loaded
+                index.remove(key)
+                continue
+            
+            entry.hits = (entry.hits or 0) + 1
+            entry.last_used_at = datetime.utcnow()
+            value = copy.deepcopy(entry.value)
+            db.session.commit()
+            
+            _count(kind, 'similar_hits')
+            print(f"⚡ Prompt cache near-duplicate ({kind}, {similarity:.2f}): '{entry.description[:60]}'")
+            return similarity, value
+    except Exception as e:
+        print(f"⚠️ Prompt similarity lookup failed: {e}")
+        db.session.rollback()
+    return None
+
+
+def cache_stats():
+    """Hit rate per kind for this worker, plus what is stored"""
+    with _stats_lock:
+        counters = copy.deepcopy(_stats)
+    
+    for kind, counter in counters.items():
+        lookups = counter['hits'] + counter['misses']
+        counter['hit_rate'] = round(counter['hits'] / lookups, 3) if lookups else None
+    
+    stored = db.session.query(
+        PromptCacheEntry.kind, db.func.count(PromptCacheEntry.id), db.func.sum(PromptCacheEntry.hits)
+    ).group_by(PromptCacheEntry.kind).all()
+    
+    return {
+        'worker': counters,
+        'stored': {kind: {'entries': entries, 'total_hits': int(hits or 0)} for kind, entries, hits in stored},
+        'ttl_hours': Config.PROMPT_CACHE_TTL_HOURS,
+        'max_entries': Config.PROMPT_CACHE_MAX_ENTRIES
+    }
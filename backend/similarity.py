@@ -0,0 +1,109 @@
+"""
+Description Similarity Index
+MinHash signatures with LSH banding over the content words of short descriptions,
+so near-duplicates ("bakery website in Lahore" / "website for a bakery, Lahore")
+are found without comparing against every stored description
+"""
+
+import re
+import hashlib
+import threading
+
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+MERSENNE_PRIME = (1 << 61) - 1
+
+# Words that say nothing about what kind of site is wanted
+STOPWORDS = {
+    'a', 'an', 'the', 'and', 'or', 'for', 'of', 'in', 'on', 'at', 'to', 'with', 'by', 'from',
+    'my', 'our', 'me', 'we', 'i', 'is', 'are', 'be', 'it', 'that', 'this', 'which',
+    'want', 'need', 'would', 'like', 'please', 'create', 'make', 'build', 'based',
+    'website', 'websites', 'site', 'web', 'page', 'webpage', 'online'
+}
+
+
+def _permutations():
+    # Fixed seeds so signatures are stable across processes
+    params = []
+    for i in range(NUM_PERMUTATIONS):
+        digest = hashlib.sha256(f'minhash-{i}'.encode()).digest()
+        a = int.from_bytes(digest[:8], 'big') % MERSENNE_PRIME or 1
+        b = int.from_bytes(digest[8:16], 'big') % MERSENNE_PRIME
+        params.append((a, b))
+    return params
+
+
+PERMUTATIONS = _permutations()
+
+
+def tokenize(text):
+    """Content words of a description, lowercased and with a plural 's' dropped"""
+    words = re.findall(r'[a-z0-9]+', (text or '').lower())
+    tokens = set()
+    for word in words:
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        tokens.add(word)
+    return frozenset(tokens)
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def minhash(tokens):
+    """MinHash signature of a token set"""
+    hashes = [int.from_bytes(hashlib.md5(token.encode()).digest()[:8], 'big') for token in tokens]
+    if not hashes:
+        return (0,) * NUM_PERMUTATIONS
+    return tuple(min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in PERMUTATIONS)
+
+
+class SimilarityIndex:
+    """In-memory LSH index of token sets; candidates are confirmed with exact Jaccard similarity"""
+    
+    def __init__(self):
+        self.tokens = {}  # key -> token set
+        self.buckets = {}  # (band, band signature) -> set of keys
+        self.lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self.tokens)
+    
+    def _bands(self, signature):
+        for band in range(BANDS):
+            yield band, signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+    
+    def add(self, key, text):
+        tokens = tokenize(text)
+        if not tokens:
+            return
+        with self.lock:
+            self.tokens[key] = tokens
+            for band in self._bands(minhash(tokens)):
+                self.buckets.setdefault(band, set()).add(key)
+    
+    def remove(self, key):
+        with self.lock:
+            tokens = self.tokens.pop(key, None)
+            if tokens is None:
+                return
+            for band in self._bands(minhash(tokens)):
+                self.buckets.get(band, set()).discard(key)
+    
+    def query(self, text, threshold):
+        """[(similarity, key)] of indexed texts at or above the threshold, most similar first"""
+        tokens = tokenize(text)
+        if not tokens:
+            return []
+        with self.lock:
+            candidates = set()
+            for band in self._bands(minhash(tokens)):
+                candidates.update(self.buckets.get(band, ()))
+            scored = [(jaccard(tokens, self.tokens[key]), key) for key in candidates]
+        return sorted((item for item in scored if item[0] >= threshold), reverse=True)
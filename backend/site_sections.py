@@ -0,0 +1,274 @@
+"""
+Addressable Site Sections
+Splits a generated site into sections (top-level blocks of each page body, stylesheet rule
+groups and scripts) with exact source offsets, so an edit can be applied to just the sections
+it concerns. Blocks repeated on several pages (navigation, footer) become one shared section
+and a patch to it is applied to every page.
+"""
+
+import re
+import hashlib
+from html.parser import HTMLParser
+
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+# Containers whose children are the real sections
+TRANSPARENT_TAGS = {'main'}
+CSS_GROUP_CHARS = 2000
+ACTIVE_CLASS_PATTERN = re.compile(r'(class\s*=\s*["\'][^"\']*?)\s*(?<![\w-])active(?![\w-])')
+CLASS_ATTR_PATTERN = re.compile(r'(class\s*=\s*(["\']))(.*?)\2', re.IGNORECASE)
+LINK_PATTERN = re.compile(r'<a\b[^>]*>', re.IGNORECASE)
+
+
+class _SectionScanner(HTMLParser):
+    """Tokenizer recording [start, end) offsets of the top-level elements of <body>"""
+    
+    def __init__(self, content):
+        super().__init__(convert_charrefs=True)
+        self.content = content
+        self.stack = []
+        self.section_depth = None
+        self.current = None
+        self.sections = []
+        # HTMLParser counts lines on \n only, so offsets must too
+        self._line_offsets = [0] + [match.end() for match in re.finditer('\n', content)]
+    
+    def _offset(self):
+        line, column = self.getpos()
+        return self._line_offsets[line - 1] + column
+    
+    def handle_starttag(self, tag, attrs):
+        start = self._offset()
+        if tag == 'body' and self.section_depth is None:
+            self.stack.append(tag)
+            self.section_depth = len(self.stack)
+            return
+        
+        at_section_level = self.section_depth is not None and self.current is None and len(self.stack) == self.section_depth
+        if at_section_level and tag in TRANSPARENT_TAGS:
+            self.stack.append(tag)
+            self.section_depth = len(self.stack)
+            return
+        if at_section_level and tag not in ('script', 'style'):
+            attributes = dict(attrs)
+            self.current = {
+                'start': start, 'tag': tag, 'id': attributes.get('id'), 'class': attributes.get('class'),
+                'heading': None, 'text': []
+            }
+            if tag in VOID_TAGS:
+                self._close_section(start + len(self.get_starttag_text()))
+                return
+        
+        if tag not in VOID_TAGS:
+            self.stack.append(tag)
+        if self.current is not None and self.current['heading'] is None and tag in ('h1', 'h2', 'h3'):
+            self.current['heading'] = []
+    
+    def handle_startendtag(self, tag, attrs):
+        if self.section_depth is not None and self.current is None and len(self.stack) == self.section_depth:
+            attributes = dict(attrs)
+            start = self._offset()
+            self.current = {
+                'start': start, 'tag': tag, 'id': attributes.get('id'), 'class': attributes.get('class'),
+                'heading': None, 'text': []
+            }
+            self._close_section(start + len(self.get_starttag_text()))
+    
+    def handle_data(self, data):
+        if self.current is None:
+            return
+        self.current['text'].append(data)
+        if isinstance(self.current['heading'], list):
+            self.current['heading'].append(data)
+    
+    def handle_endtag(self, tag):
+        if tag not in self.stack:
+            return  # Stray end tag
+        # Close implicitly-ended elements (e.g. unclosed <p>) up to the matching tag
+        while self.stack and self.stack[-1] != tag:
+            self.stack.pop()
+        self.stack.pop()
+        
+        if self.current is not None:
+            if isinstance(self.current['heading'], list) and tag in ('h1', 'h2', 'h3'):
+                self.current['heading'] = ' '.join(' '.join(self.current['heading']).split())
+            if len(self.stack) <= self.section_depth:
+                end = self.content.find('>', self._offset()) + 1
+                self._close_section(end)
+        if self.section_depth is not None and len(self.stack) < self.section_depth:
+            # Left <main> or <body>
+            self.section_depth = len(self.stack) if self.stack and self.stack[-1] in TRANSPARENT_TAGS | {'body'} else None
+    
+    def _close_section(self, end):
+        section = self.current
+        self.current = None
+        heading = section['heading'] if isinstance(section['heading'], str) else None
+        self.sections.append({
+            'start': section['start'],
+            'end': end,
+            'tag': section['tag'],
+            'id': section['id'],
+            'class': section['class'],
+            'heading': heading,
+            'text': ' '.join(' '.join(section['text']).split())[:100]
+        })
+
+
+def html_sections(content):
+    """Top-level body blocks of a page as dicts with start/end offsets and a short description"""
+    scanner = _SectionScanner(content)
+    try:
+        scanner.feed(content)
+        scanner.close()
+    except Exception:
+        return []
+    return [section for section in scanner.sections if content[section['start']:section['end']].strip()]
+
+
+def css_sections(content):
+    """Groups of consecutive top-level CSS rules (each under CSS_GROUP_CHARS where possible)"""
+    rules = []
+    depth = 0
+    rule_start = 0
+    position = 0
+    while position < len(content):
+        char = content[position]
+        if content.startswith('/*', position):
+            comment_end = content.find('*/', position + 2)
+            position = len(content) if comment_end == -1 else comment_end + 2
+            continue
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth = max(depth - 1, 0)
+            if depth == 0:
+                rules.append((rule_start, position + 1))
+                rule_start = position + 1
+        position += 1
+    
+    groups = []
+    for start, end in rules:
+        if groups and end - groups[-1][0] <= CSS_GROUP_CHARS:
+            groups[-1][1] = end
+        else:
+            groups.append([start, end])
+    if groups:
+        groups[-1][1] = len(content)
+    
+    sections = []
+    for start, end in groups:
+        rules_text = re.sub(r'/\*.*?\*/', '', content[start:end], flags=re.DOTALL)
+        selectors = re.findall(r'(?:^|})\s*([^{}]+?)\s*{', rules_text)
+        sections.append({
+            'start': start, 'end': end, 'tag': 'css', 'id': None, 'class': None, 'heading': None,
+            'text': ', '.join(' '.join(selector.split()) for selector in selectors)[:160]
+        })
+    return sections
+
+
+def _shared_key(source):
+    """Identity of a block across pages, ignoring which navigation link is marked active"""
+    return hashlib.sha256(ACTIVE_CLASS_PATTERN.sub(r'\1', source).encode('utf-8')).hexdigest()
+
+
+def _describe(section):
+    attributes = ''.join(f' {name}="{section[name]}"' for name in ('id', 'class') if section.get(name))
+    label = f'<{section["tag"]}{attributes}>' if section['tag'] != 'css' else 'CSS rules'
+    heading = f' "{section["heading"]}"' if section.get('heading') else ''
+    return f'{label}{heading}: {section["text"][:100]}'
+
+
+def split_site(files):
+    """
+    section id -> {'description', 'source', 'locations': [(filename, start, end)]} for every
+    addressable block of a site. Ids are "<file>#<n>" for blocks on one page and "shared#<n>"
+    for blocks repeated across pages.
+    """
+    by_key = {}
+    ordered = []
+    for filename in sorted(files, key=lambda name: (not name.endswith('.html'), name != 'index.html', name)):
+        content = files[filename]
+        if not isinstance(content, str):
+            continue
+        if filename.endswith('.html'):
+            found = html_sections(content)
+        elif filename.endswith('.css'):
+            found = css_sections(content)
+        elif filename.endswith('.js') and content.strip():
+            found = [{'start': 0, 'end': len(content), 'tag': 'script', 'id': None, 'class': None,
+                      'heading': None, 'text': ' '.join(content.split())[:100]}]
+        else:
+            found = []
+        
+        for section in found:
+            source = content[section['start']:section['end']]
+            key = _shared_key(source) if filename.endswith('.html') else f'{filename}:{section["start"]}'
+            if key not in by_key:
+                by_key[key] = {'section': section, 'source': source, 'locations': []}
+                ordered.append(key)
+            by_key[key]['locations'].append((filename, section['start'], section['end']))
+    
+    sections = {}
+    counters = {}
+    for key in ordered:
+        entry = by_key[key]
+        files_with_block = sorted({filename for filename, start, end in entry['locations']})
+        prefix = 'shared' if len(files_with_block) > 1 else files_with_block[0]
+        counters[prefix] = counters.get(prefix, 0) + 1
+        section_id = f'{prefix}#{counters[prefix]}'
+        description = _describe(entry['section'])
+        if prefix == 'shared':
+            description += f' (on {len(files_with_block)} pages)'
+        sections[section_id] = {'description': description, 'source': entry['source'], 'locations': entry['locations']}
+    return sections
+
+
+def site_outline(sections):
+    """One line per section for the model to choose from"""
+    return '\n'.join(f'{section_id} [{len(section["source"])} chars] {section["description"]}' for section_id, section in sections.items())
+
+
+def _retarget_active(html, filename):
+    """Mark the navigation link to this page active (and no other), as generated pages do"""
+    def relink(match):
+        tag = ACTIVE_CLASS_PATTERN.sub(r'\1', match.group(0))
+        if re.search(r'href\s*=\s*["\']' + re.escape(filename) + r'["\']', tag):
+            if CLASS_ATTR_PATTERN.search(tag):
+                tag = CLASS_ATTR_PATTERN.sub(lambda attr: f'{attr.group(1)}{attr.group(3)} active{attr.group(2)}', tag, count=1)
+            else:
+                tag = tag[:-1] + ' class="active">'
+        return tag
+    return LINK_PATTERN.sub(relink, html)
+
+
+def apply_patches(files, sections, patches):
+    """
+    New file contents with each patched section's source replaced at every location it
+    occupies; returns (files, changed filenames)
+    """
+    edits = {}
+    for section_id, replacement in patches.items():
+        section = sections.get(section_id)
+        if section is None or not isinstance(replacement, str):
+            continue
+        shared = len(section['locations']) > 1
+        for filename, start, end in section['locations']:
+            original = files[filename][start:end]
+            text = replacement
+            if shared and original != section['source'] and ACTIVE_CLASS_PATTERN.search(original):
+                text = _retarget_active(replacement, filename)
+            edits.setdefault(filename, []).append((start, end, text))
+    
+    updated = dict(files)
+    for filename, file_edits in edits.items():
+        content = files[filename]
+        parts = []
+        position = 0
+        for start, end, text in sorted(file_edits):
+            parts.append(content[position:start])
+            parts.append(text)
+            position = end
+        parts.append(content[position:])
+        updated[filename] = ''.join(parts)
+    
+    changed = sorted(filename for filename in edits if updated[filename] != files[filename])
+    return updated, changed
@@ -1,10 +1,362 @@
 import os
 import re
+import json
+import hashlib
 import shutil
+import threading
+import uuid
+from io import BytesIO
+from html import escape
+from html.parser import HTMLParser
 from bs4 import BeautifulSoup
 from PIL import Image
 import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
+from config import Config
+from color_theme import BRAND_COLOR_FIELDS, ColorTheme, brand_colors, build_color_index, normalize_hex
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines only get in-process locking
+    fcntl = None
+
+# Bump whenever customization output changes so cached artifacts are rebuilt
+CUSTOMIZATION_VERSION = 4
+
+# Logo derivatives rendered from a single decode; bump LOGO_ASSET_VERSION when these change
+LOGO_ASSET_VERSION = 1
+LOGO_MAX_SIZE = (300, 100)
+FAVICON_FILES = {
+    16: 'favicon-16x16.png',
+    32: 'favicon-32x32.png',
+    180: 'apple-touch-icon.png'
+}
+
+# Default placeholder values that exist in templates
+DEFAULT_COMPANY = "GrowMark"
+DEFAULT_EMAIL = "info@example.com"
+DEFAULT_PHONE = "+012 345 67890"
+DEFAULT_ADDRESS = "123 Street, New York, USA"
+
+SOCIAL_PATTERNS = {
+    'facebook': r'href="[^"]*facebook[^"]*"',
+    'twitter': r'href="[^"]*twitter[^"]*"',
+    'linkedin': r'href="[^"]*linkedin[^"]*"',
+    'instagram': r'href="[^"]*instagram[^"]*"'
+}
+
+# <link rel="icon"> or rel="shortcut icon" (not apple-touch-icon)
+ICON_LINK_PATTERN = re.compile(r'''<link\b[^>]*\brel\s*=\s*["']?(?:[^"'>]*\s)?icon[\s"'/>]''', re.IGNORECASE)
+
+# Process pools are expensive to start, so one pool per worker count is kept for the process lifetime
+_page_pools = {}
+
+# Batch workers keep recent template snapshots, keyed by folder and fingerprint, so tasks only carry a record
+WORKER_SNAPSHOT_CACHE_SIZE = 4
+_worker_snapshots = OrderedDict()
+
+# In-process locks for single-flight builds, keyed by cache key: [lock, waiters]
+_flight_locks = {}
+_flight_guard = threading.Lock()
+_parser_fallbacks = set()
+
+
+class ReplacementPlan:
+    """Precompiled text replacements shared by every page of one customization"""
+    
+    def __init__(self, replacements, social_links=None, company_name=DEFAULT_COMPANY, parser=None, logo_assets=None):
+        # DOM backend used only when a logo has to be injected
+        self.parser = resolve_parser(parser or Config.CUSTOMIZER_PARSER)
+        
+        # Favicon set produced by process_logo; existing icon links point at the 32px favicon,
+        # pages without one get a link to it
+        logo_assets = logo_assets or {}
+        self.favicon_path = logo_assets.get('favicon_32')
+        self.favicon_link = ''
+        if self.favicon_path:
+            self.favicon_link = f'<link rel="icon" type="image/png" sizes="32x32" href="{self.favicon_path}">\n'
+        self.head_links = ''
+        if logo_assets.get('favicon_16'):
+            self.head_links += f'<link rel="icon" type="image/png" sizes="16x16" href="{logo_assets["favicon_16"]}">\n'
+        if logo_assets.get('favicon_180'):
+            self.head_links += f'<link rel="apple-touch-icon" sizes="180x180" href="{logo_assets["favicon_180"]}">\n'
+        
+        # Only replace if new value exists
+        self.replacements = {old: new for old, new in replacements.items() if new}
+        self.company_name = company_name
+        self.logo_alt = replacements.get(company_name, company_name)
+        self.logo_webp = logo_assets.get('webp')
+        
+        # One alternation regex replaces every placeholder in a single pass (longest match first)
+        keys = sorted(self.replacements, key=len, reverse=True)
+        self.pattern = re.compile('|'.join(re.escape(key) for key in keys)) if keys else None
+        
+        self.social_links = []
+        for platform, pattern in SOCIAL_PATTERNS.items():
+            if social_links and social_links.get(platform):
+                self.social_links.append((re.compile(pattern), f'href="{social_links[platform]}"'))
+    
+    def apply(self, content):
+        """Apply text and social link replacements to page content"""
+        if self.pattern:
+            content = self.pattern.sub(lambda match: self.replacements[match.group(0)], content)
+        for pattern, href in self.social_links:
+            content = pattern.sub(lambda match, href=href: href, content)
+        return content
+
+
+def replace_logo_in_soup(soup, logo_path, plan):
+    """Replace favicon and logo images in a parsed page"""
+    # Update favicon
+    favicon_tags = soup.find_all('link', rel='icon')
+    for tag in favicon_tags:
+        tag['href'] = plan.favicon_path or logo_path
+    
+    # Find and replace logo images (common patterns)
+    # Look for h1/h2 with company name and replace with logo
+    for tag in soup.find_all(['h1', 'h2']):
+        if plan.company_name in tag.get_text():
+            # Replace text with image, offering the WebP render to browsers that support it
+            new_img = soup.new_tag('img', src=logo_path, alt=plan.logo_alt)
+            new_img['style'] = 'height: 40px; width: auto;'
+            tag.clear()
+            if plan.logo_webp:
+                picture = soup.new_tag('picture')
+                picture.append(soup.new_tag('source', srcset=plan.logo_webp, type='image/webp'))
+                picture.append(new_img)
+                tag.append(picture)
+            else:
+                tag.append(new_img)
+
+
+def _logo_img_html(logo_path, plan):
+    """Logo markup matching what the BeautifulSoup backends produce"""
+    img = f'<img src="{escape(logo_path)}" alt="{escape(plan.logo_alt)}" style="height: 40px; width: auto;"/>'
+    if plan.logo_webp:
+        return f'<picture><source srcset="{escape(plan.logo_webp)}" type="image/webp"/>{img}</picture>'
+    return img
+
+
+def _bs4_logo_backend(features):
+    def replace_logo(content, logo_path, plan):
+        soup = BeautifulSoup(content, features)
+        replace_logo_in_soup(soup, logo_path, plan)
+        return str(soup)
+    return replace_logo
+
+
+class _LogoStreamRewriter(HTMLParser):
+    """Tokenizer that records source edits for logo injection instead of building a DOM"""
+    
+    def __init__(self, content, logo_path, plan):
+        super().__init__(convert_charrefs=True)
+        self.content = content
+        self.logo_path = logo_path
+        self.plan = plan
+        self.edits = []
+        self.heading = None
+        # HTMLParser counts lines on \n only, so offsets must too
+        self._line_offsets = [0] + [match.end() for match in re.finditer('\n', content)]
+    
+    def _offset(self):
+        line, column = self.getpos()
+        return self._line_offsets[line - 1] + column
+    
+    def _handle_tag(self, tag, attrs, self_closing):
+        start = self._offset()
+        raw = self.get_starttag_text()
+        
+        if tag == 'link' and 'icon' in (dict(attrs).get('rel') or '').lower().split():
+            rendered = []
+            for name, value in attrs:
+                if name == 'href':
+                    value = self.plan.favicon_path or self.logo_path
+                rendered.append(name if value is None else f'{name}="{escape(value)}"')
+            closing = '/>' if self_closing else '>'
+            self.edits.append((start, start + len(raw), f"<link {' '.join(rendered)}{closing}"))
+        
+        if tag in ('h1', 'h2') and not self_closing:
+            if self.heading is None:
+                self.heading = {'tag': tag, 'depth': 0, 'start': start + len(raw), 'text': []}
+            elif tag == self.heading['tag']:
+                self.heading['depth'] += 1
+    
+    def handle_starttag(self, tag, attrs):
+        self._handle_tag(tag, attrs, False)
+    
+    def handle_startendtag(self, tag, attrs):
+        self._handle_tag(tag, attrs, True)
+    
+    def handle_data(self, data):
+        if self.heading is not None:
+            self.heading['text'].append(data)
+    
+    def handle_endtag(self, tag):
+        if self.heading is None or tag != self.heading['tag']:
+            return
+        if self.heading['depth']:
+            self.heading['depth'] -= 1
+            return
+        
+        if self.plan.company_name in ''.join(self.heading['text']):
+            self.edits.append((self.heading['start'], self._offset(), _logo_img_html(self.logo_path, self.plan)))
+        self.heading = None
+    
+    def rewrite(self):
+        self.feed(self.content)
+        self.close()
+        
+        parts = []
+        position = 0
+        for start, end, replacement in sorted(self.edits):
+            parts.append(self.content[position:start])
+            parts.append(replacement)
+            position = end
+        parts.append(self.content[position:])
+        return ''.join(parts)
+
+
+def _stream_replace_logo(content, logo_path, plan):
+    """Logo injection with the stdlib tokenizer, leaving untouched markup byte-for-byte"""
+    return _LogoStreamRewriter(content, logo_path, plan).rewrite()
+
+
+# DOM backends for logo injection: name -> (required module, replace_logo(content, logo_path, plan))
+PARSER_BACKENDS = {
+    'html.parser': (None, _bs4_logo_backend('html.parser')),
+    'lxml': ('lxml', _bs4_logo_backend('lxml')),
+    'stream': (None, _stream_replace_logo),
+}
+
+
+def available_parsers():
+    """Names of parser backends whose optional dependencies are installed"""
+    names = []
+    for name, (module, _) in PARSER_BACKENDS.items():
+        try:
+            if module:
+                __import__(module)
+            names.append(name)
+        except ImportError:
+            continue
+    return names
+
+
+def resolve_parser(name):
+    """Validate a parser backend name, falling back to html.parser if its dependency is missing"""
+    if name not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend '{name}'. Choose from: {', '.join(PARSER_BACKENDS)}")
+    if name not in available_parsers():
+        # Every ReplacementPlan resolves its parser, so only the first fallback is reported
+        with _flight_guard:
+            warn = name not in _parser_fallbacks
+            _parser_fallbacks.add(name)
+        if warn:
+            print(f"⚠️ Parser backend '{name}' is not installed, falling back to html.parser")
+        return 'html.parser'
+    return name
+
+
+def customize_html(content, plan, logo_path=None):
+    """Return customized page content without touching the filesystem"""
+    # Only logo injection needs a DOM; plain replacements stay on the text path
+    if logo_path:
+        replace_logo = PARSER_BACKENDS[plan.parser][1]
+        content = replace_logo(content, logo_path, plan)
+        head_links = plan.head_links
+        if plan.favicon_link and not ICON_LINK_PATTERN.search(content):
+            head_links = plan.favicon_link + head_links
+        if head_links:
+            content = re.sub(r'</head>', lambda match: head_links + match.group(0), content, count=1, flags=re.IGNORECASE)
+    
+    # Replace text content and social media links
+    return plan.apply(content)
+
+
+def customize_page(file_path, plan, logo_path=None):
+    """Customize a single HTML file in place (module level so it can run in a process pool)"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    
+    content = customize_html(content, plan, logo_path)
+    
+    # Write updated content
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    
+    return file_path
+
+
+def _get_page_pool(workers):
+    """Return the shared process pool for the given worker count"""
+    pool = _page_pools.get(workers)
+    if pool is None:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        _page_pools[workers] = pool
+    return pool
+
+
+def logo_asset_files(logo_name='logo'):
+    """Cached logo renders: asset key -> file name"""
+    files = {'logo': f'{logo_name}.png', 'webp': f'{logo_name}.webp'}
+    for size, filename in FAVICON_FILES.items():
+        files[f'favicon_{size}'] = filename
+    return files
+
+
+def _square_icon(img, size, background=None):
+    """Fit an image into a centered square canvas of the given size"""
+    icon = img.copy()
+    icon.thumbnail((size, size), Image.Resampling.LANCZOS)
+    canvas = Image.new('RGBA', (size, size), background or (0, 0, 0, 0))
+    canvas.paste(icon, ((size - icon.width) // 2, (size - icon.height) // 2), icon)
+    return canvas
+
+
+def render_logo_assets(logo_bytes, logo_name='logo'):
+    """
+    Decode a logo once and render every derivative into a cache directory keyed by content hash.
+    Returns the cache directory, or None if the bytes are not a decodable image.
+    """
+    digest = hashlib.sha256(logo_bytes)
+    digest.update(f'{LOGO_ASSET_VERSION}:{LOGO_MAX_SIZE}:{sorted(FAVICON_FILES)}:{logo_name}'.encode('utf-8'))
+    cache_dir = os.path.join(Config.LOGO_CACHE_FOLDER, digest.hexdigest())
+    if os.path.isdir(cache_dir):
+        return cache_dir
+    
+    try:
+        with Image.open(BytesIO(logo_bytes)) as source:
+            img = source.convert('RGBA')
+    except Exception as e:
+        print(f"Logo decode error: {e}")
+        return None
+    
+    files = logo_asset_files(logo_name)
+    staging_dir = f"{cache_dir}.tmp-{uuid.uuid4().hex[:8]}"
+    os.makedirs(staging_dir)
+    
+    # Header logo keeps transparency; only shrink, never upscale
+    header = img.copy()
+    header.thumbnail(LOGO_MAX_SIZE, Image.Resampling.LANCZOS)
+    header.save(os.path.join(staging_dir, files['logo']), optimize=True)
+    header.save(os.path.join(staging_dir, files['webp']), 'WEBP', quality=85)
+    
+    for size, filename in FAVICON_FILES.items():
+        # iOS renders transparent touch icons on black, so flatten the large one onto white
+        background = (255, 255, 255, 255) if size >= 180 else None
+        _square_icon(img, size, background).save(os.path.join(staging_dir, filename), optimize=True)
+    
+    try:
+        os.rename(staging_dir, cache_dir)
+    except OSError:
+        # Another request rendered the same logo first
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    return cache_dir
+
 
 class TemplateCustomizer:
     """Handles template customization with business details"""
@@ -13,26 +365,25 @@ class TemplateCustomizer:
         self.template_path = template_path
         self.output_path = output_path
         self.replacements = {}
+        self.logo_assets = {}
+        self.page_errors = []
+        self._progress = None
+        self._files_processed = 0
+        self._files_total = 0
         
     def set_business_details(self, details):
         """Set business details for replacement"""
-        # Default placeholder values that exist in templates
-        default_company = "GrowMark"
-        default_email = "info@example.com"
-        default_phone = "+012 345 67890"
-        default_address = "123 Street, New York, USA"
-        
         # Build replacement dictionary
         self.replacements = {
             # Company name variations
-            default_company: details.get('businessName', default_company),
-            default_company.upper(): details.get('businessName', default_company).upper(),
-            default_company.lower(): details.get('businessName', default_company).lower(),
+            DEFAULT_COMPANY: details.get('businessName', DEFAULT_COMPANY),
+            DEFAULT_COMPANY.upper(): details.get('businessName', DEFAULT_COMPANY).upper(),
+            DEFAULT_COMPANY.lower(): details.get('businessName', DEFAULT_COMPANY).lower(),
             
             # Contact details
-            default_email: details.get('email', default_email),
-            default_phone: details.get('phone', default_phone),
-            default_address: self._build_full_address(details),
+            DEFAULT_EMAIL: details.get('email', DEFAULT_EMAIL),
+            DEFAULT_PHONE: details.get('phone', DEFAULT_PHONE),
+            DEFAULT_ADDRESS: self._build_full_address(details),
             
             # Meta tags
             'content=""': f'content="{details.get("description", "")}"',
@@ -57,10 +408,15 @@ class TemplateCustomizer:
         
         if parts:
             return ', '.join(parts)
-        return "123 Street, New York, USA"
+        return DEFAULT_ADDRESS
     
     def process_logo(self, logo_file, logo_name='logo'):
-        """Process and save logo file"""
+        """
+        Process and save logo file
+        
+        The upload is decoded once into the header logo, a WebP copy and the favicon set.
+        Renders are cached by content hash, so a repeated logo skips image processing.
+        """
         if not logo_file:
             return None
             
@@ -69,132 +425,350 @@ class TemplateCustomizer:
             img_dir = os.path.join(self.output_path, 'img')
             os.makedirs(img_dir, exist_ok=True)
             
-            # Determine file extension
-            ext = os.path.splitext(logo_file.filename)[1] or '.png'
-            logo_filename = f'{logo_name}{ext}'
-            logo_path = os.path.join(img_dir, logo_filename)
+            logo_bytes = logo_file.read()
+            cache_dir = render_logo_assets(logo_bytes)
             
-            # Save logo
-            logo_file.save(logo_path)
+            if cache_dir is None:
+                # Not a raster image Pillow can decode (e.g. SVG): ship it untouched
+                ext = os.path.splitext(logo_file.filename)[1] or '.png'
+                logo_filename = f'{logo_name}{ext}'
+                with open(os.path.join(img_dir, logo_filename), 'wb') as f:
+                    f.write(logo_bytes)
+                self.logo_assets = {'logo': f'img/{logo_filename}'}
+                return self.logo_assets['logo']
             
-            # Optimize logo size
-            self._optimize_logo(logo_path)
+            self.logo_assets = {}
+            for key, filename in logo_asset_files(logo_name).items():
+                shutil.copyfile(os.path.join(cache_dir, filename), os.path.join(img_dir, filename))
+                self.logo_assets[key] = f'img/{filename}'
             
-            return f'img/{logo_filename}'
+            return self.logo_assets['logo']
         except Exception as e:
             print(f"Logo processing error: {e}")
             return None
     
-    def _optimize_logo(self, logo_path, max_width=300, max_height=100):
-        """Optimize logo dimensions"""
-        try:
-            with Image.open(logo_path) as img:
-                # Convert RGBA to RGB if needed
-                if img.mode == 'RGBA':
-                    background = Image.new('RGB', img.size, (255, 255, 255))
-                    background.paste(img, mask=img.split()[3])
-                    img = background
-                
-                # Resize if too large
-                if img.width > max_width or img.height > max_height:
-                    img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
-                    img.save(logo_path, optimize=True, quality=85)
-        except Exception as e:
-            print(f"Logo optimization error: {e}")
+    def build_plan(self, social_links=None):
+        """Compile the current replacements into a plan shared by all pages"""
+        return ReplacementPlan(self.replacements, social_links, logo_assets=self.logo_assets)
     
-    def customize_html_files(self, logo_path=None, social_links=None):
-        """Process all HTML files in template"""
+    def apply_brand_colors(self, theme):
+        """Rewrite indexed color literals in the output's CSS and HTML (before text replacement)"""
+        for path in theme.affected_files():
+            file_path = os.path.join(self.output_path, path)
+            with open(file_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            with open(file_path, 'w', encoding='utf-8') as f:
+                f.write(theme.apply(path, content))
+    
+    def customize_html_files(self, logo_path=None, social_links=None, workers=None, progress=None):
+        """
+        Process all HTML files in template
+        
+        Pages are customized in a process pool when more than one worker is configured.
+        Failures are collected per page in self.page_errors instead of aborting the run.
+        progress, if given, is called with files_processed/files_total as pages finish.
+        """
         html_files = []
         
         for root, dirs, files in os.walk(self.output_path):
             for file in files:
                 if file.endswith('.html'):
-                    file_path = os.path.join(root, file)
-                    html_files.append(file_path)
-                    self._customize_html_file(file_path, logo_path, social_links)
+                    html_files.append(os.path.join(root, file))
+        
+        plan = self.build_plan(social_links)
+        self.page_errors = []
+        self._progress = progress
+        self._files_processed = 0
+        self._files_total = len(html_files)
+        self._report_progress()
+        
+        if workers is None:
+            workers = Config.CUSTOMIZER_WORKERS
+        
+        pending = html_files
+        if workers > 1 and len(html_files) > 1:
+            pending = self._customize_in_pool(html_files, plan, logo_path, workers)
+        
+        for file_path in pending:
+            try:
+                customize_page(file_path, plan, logo_path)
+            except Exception as e:
+                self._record_page_error(file_path, e)
+            self._report_progress(1)
         
         return len(html_files)
     
+    def _report_progress(self, processed=0):
+        """Advance the processed page counter and notify the progress callback"""
+        self._files_processed += processed
+        if self._progress:
+            self._progress(
+                stage='customizing',
+                files_processed=self._files_processed,
+                files_total=self._files_total
+            )
+    
+    def _customize_in_pool(self, html_files, plan, logo_path, workers):
+        """Run pages in the shared process pool, returning pages that still need processing"""
+        pool = _get_page_pool(workers)
+        try:
+            futures = {pool.submit(customize_page, path, plan, logo_path): path for path in html_files}
+        except BrokenProcessPool:
+            _page_pools.pop(workers, None)
+            return html_files
+        
+        pending = []
+        for future in as_completed(futures):
+            file_path = futures[future]
+            try:
+                future.result()
+            except BrokenProcessPool:
+                # A worker died; drop the pool and finish remaining pages in-process
+                _page_pools.pop(workers, None)
+                pending.append(file_path)
+                continue
+            except Exception as e:
+                self._record_page_error(file_path, e)
+            self._report_progress(1)
+        return pending
+    
+    def _record_page_error(self, file_path, error):
+        """Remember a failed page so callers can report it"""
+        self.page_errors.append({
+            'file': os.path.relpath(file_path, self.output_path),
+            'error': str(error)
+        })
+    
     def _customize_html_file(self, file_path, logo_path=None, social_links=None):
         """Customize a single HTML file"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Parse HTML
-            soup = BeautifulSoup(content, 'html.parser')
-            
-            # Replace logo if provided
-            if logo_path:
-                self._replace_logo_in_html(soup, logo_path)
-            
-            # Replace text content
-            content = str(soup)
-            for old, new in self.replacements.items():
-                if new:  # Only replace if new value exists
-                    content = content.replace(old, new)
-            
-            # Update social media links
-            if social_links:
-                content = self._update_social_links(content, social_links)
-            
-            # Write updated content
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(content)
-                
+            customize_page(file_path, self.build_plan(social_links), logo_path)
         except Exception as e:
-            print(f"Error customizing {file_path}: {e}")
+            self._record_page_error(file_path, e)
     
     def _replace_logo_in_html(self, soup, logo_path):
         """Replace favicon and logo images in HTML"""
-        # Update favicon
-        favicon_tags = soup.find_all('link', rel='icon')
-        for tag in favicon_tags:
-            tag['href'] = logo_path
-        
-        # Find and replace logo images (common patterns)
-        # Look for h1/h2 with company name and replace with logo
-        company_name = list(self.replacements.keys())[0]  # First replacement is company name
-        
-        # Find headers with company name
-        for tag in soup.find_all(['h1', 'h2']):
-            if company_name in tag.get_text():
-                # Replace text with image
-                new_img = soup.new_tag('img', src=logo_path, alt=self.replacements[company_name])
-                new_img['style'] = 'height: 40px; width: auto;'
-                tag.clear()
-                tag.append(new_img)
+        replace_logo_in_soup(soup, logo_path, self.build_plan())
     
-    def _update_social_links(self, content, social_links):
-        """Update social media links in HTML"""
-        social_patterns = {
-            'facebook': r'href="[^"]*facebook[^"]*"',
-            'twitter': r'href="[^"]*twitter[^"]*"',
-            'linkedin': r'href="[^"]*linkedin[^"]*"',
-            'instagram': r'href="[^"]*instagram[^"]*"'
-        }
+    def create_zip(self, zip_filename, progress=None):
+        """Create ZIP file from customized template, reporting bytes written to progress"""
+        zip_path = os.path.join(os.path.dirname(self.output_path), zip_filename)
         
-        for platform, pattern in social_patterns.items():
-            if social_links.get(platform):
-                content = re.sub(pattern, f'href="{social_links[platform]}"', content)
+        with open(zip_path, 'wb') as zip_file:
+            with zipfile.ZipFile(zip_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                for root, dirs, files in os.walk(self.output_path):
+                    for file in files:
+                        file_path = os.path.join(root, file)
+                        arcname = os.path.relpath(file_path, self.output_path)
+                        zipf.write(file_path, arcname)
+                        if progress:
+                            progress(stage='zipping', bytes_written=zip_file.tell())
+            if progress:
+                progress(stage='zipping', bytes_written=zip_file.tell())
         
+        return zip_path
+
+
+def extract_social_links(business_details):
+    """Pick the social profile URLs out of the business details"""
+    return {network: business_details.get(network) for network in SOCIAL_PATTERNS}
+
+
+def customize_preview(path, content, business_details, color_index=None):
+    """
+    Customize a single page or stylesheet in memory for live previews (no logo).
+    Brand colors need the template's color index, so the preview matches the customized ZIP.
+    """
+    customizer = TemplateCustomizer(None, None)
+    customizer.set_business_details(business_details)
+    theme = ColorTheme.from_details(color_index, business_details) if color_index else None
+    if theme:
+        content = theme.apply(path, content)
+    if path.endswith('.css'):
         return content
+    return customize_html(content, customizer.build_plan(extract_social_links(business_details)))
+
+
+class TemplateSnapshot:
+    """Template pages read into memory once and shared by every record of a batch"""
     
-    def create_zip(self, zip_filename):
-        """Create ZIP file from customized template"""
-        zip_path = os.path.join(os.path.dirname(self.output_path), zip_filename)
+    def __init__(self, template_folder, color_index=None):
+        self.template_folder = template_folder
+        self.color_index = color_index
+        self.pages = {}
+        self.assets = []
+        self.page_errors = []
         
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, dirs, files in os.walk(self.output_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, self.output_path)
-                    zipf.write(file_path, arcname)
+        for root, dirs, files in os.walk(template_folder):
+            dirs.sort()
+            for file in sorted(files):
+                file_path = os.path.join(root, file)
+                arcname = os.path.relpath(file_path, template_folder)
+                if file.endswith('.html'):
+                    try:
+                        with open(file_path, 'r', encoding='utf-8') as f:
+                            self.pages[arcname] = f.read()
+                        continue
+                    except Exception as e:
+                        # Undecodable pages ship unchanged, as customize_page would leave them
+                        self.page_errors.append({'file': arcname, 'error': str(e)})
+                self.assets.append((file_path, arcname))
+
+
+def build_record_zip(snapshot, business_details, zip_path):
+    """
+    Customize a snapshot's pages in memory and write them, with the untouched assets, straight into a ZIP.
+    Module level so it can run in a process pool. Returns the per-page errors.
+    """
+    customizer = TemplateCustomizer(snapshot.template_folder, None)
+    customizer.set_business_details(business_details)
+    plan = customizer.build_plan(extract_social_links(business_details))
+    theme = ColorTheme.from_details(snapshot.color_index, business_details) if snapshot.color_index else None
+    page_errors = list(snapshot.page_errors)
+    
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for arcname, content in snapshot.pages.items():
+            try:
+                content = customize_source(arcname, content, plan, theme=theme)
+            except Exception as e:
+                page_errors.append({'file': arcname, 'error': str(e)})
+            zipf.writestr(arcname, content)
+        for file_path, arcname in snapshot.assets:
+            if theme and arcname in theme.files:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    zipf.writestr(arcname, theme.apply(arcname, f.read()))
+            else:
+                zipf.write(file_path, arcname)
+    
+    return page_errors
+
+
+def _worker_snapshot(template_folder, fingerprint, with_colors):
+    """This worker process's snapshot of a template version, read on first use"""
+    key = (template_folder, fingerprint, with_colors)
+    snapshot = _worker_snapshots.get(key)
+    if snapshot is None:
+        snapshot = TemplateSnapshot(template_folder, build_color_index(template_folder) if with_colors else None)
+        _worker_snapshots[key] = snapshot
+        while len(_worker_snapshots) > WORKER_SNAPSHOT_CACHE_SIZE:
+            _worker_snapshots.popitem(last=False)
+    else:
+        _worker_snapshots.move_to_end(key)
+    return snapshot
+
+
+def build_pooled_record_zip(template_folder, fingerprint, with_colors, business_details, zip_path):
+    """Pool task for customize_batch: build_record_zip on the worker's cached snapshot"""
+    return build_record_zip(_worker_snapshot(template_folder, fingerprint, with_colors), business_details, zip_path)
+
+
+def customize_batch(template_folder, records, workers=None, progress=None, color_index=None):
+    """
+    Customize one template for many business detail records
+    
+    The template is read once per process and records are built in parallel in the shared process pool;
+    workers cache the snapshot by template fingerprint, so each task only sends its record.
+    
+    Returns:
+        List in record order of {'zip_path', 'page_errors'} or {'error'} for records that failed
+    """
+    with_colors = any(brand_colors(record) for record in records)
+    if workers is None:
+        workers = Config.CUSTOMIZER_WORKERS
+    
+    timestamp = int(datetime.utcnow().timestamp())
+    zip_paths = []
+    for business_details in records:
+        suffix = uuid.uuid4().hex[:8]
+        zip_filename = f"customized_{business_details.get('businessName', 'template').replace(' ', '_')}_{timestamp}_{suffix}.zip"
+        zip_paths.append(os.path.join(os.path.dirname(template_folder), zip_filename))
+    
+    results = [None] * len(records)
+    
+    def finish(index, page_errors=None, error=None):
+        if error is not None:
+            results[index] = {'error': str(error)}
+        else:
+            results[index] = {'zip_path': zip_paths[index], 'page_errors': page_errors}
+        if progress:
+            processed = sum(result is not None for result in results)
+            progress(stage='customizing', records_processed=processed, records_total=len(records))
+    
+    pending = list(range(len(records)))
+    if workers > 1 and len(records) > 1:
+        pool = _get_page_pool(workers)
+        fingerprint = template_fingerprint(template_folder)
+        try:
+            futures = {
+                pool.submit(build_pooled_record_zip, template_folder, fingerprint, with_colors, records[index], zip_paths[index]): index
+                for index in pending
+            }
+            pending = []
+        except BrokenProcessPool:
+            _page_pools.pop(workers, None)
+            futures = {}
         
-        return zip_path
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                finish(index, future.result())
+            except BrokenProcessPool:
+                # A worker died; drop the pool and finish remaining records in-process
+                _page_pools.pop(workers, None)
+                pending.append(index)
+            except Exception as e:
+                finish(index, error=e)
+    
+    if pending:
+        if color_index is None and with_colors:
+            color_index = build_color_index(template_folder)
+        snapshot = TemplateSnapshot(template_folder, color_index)
+    for index in pending:
+        try:
+            finish(index, build_record_zip(snapshot, records[index], zip_paths[index]))
+        except Exception as e:
+            finish(index, error=e)
+    
+    return results
+
+
+def customize_source(path, content, plan, logo_path=None, theme=None):
+    """Customize one file of the template source: brand colors first, then HTML text and logo"""
+    if theme:
+        content = theme.apply(path, content)
+    if path.endswith('.html'):
+        content = customize_html(content, plan, logo_path)
+    return content
+
+
+def patch_customized_zip(template_folder, zip_path, new_zip_path, files, plan, logo_path=None, theme=None):
+    """
+    Write a new version of a customized ZIP in which only the given files are
+    re-customized from the template source; every other entry is copied as-is.
+    Returns the per-page errors.
+    """
+    files = set(files)
+    page_errors = []
+    
+    with zipfile.ZipFile(zip_path, 'r') as source_zip, \
+            zipfile.ZipFile(new_zip_path, 'w', zipfile.ZIP_DEFLATED) as target_zip:
+        for info in source_zip.infolist():
+            if info.filename not in files:
+                target_zip.writestr(info, source_zip.read(info))
+                continue
+            
+            try:
+                with open(os.path.join(template_folder, info.filename), 'r', encoding='utf-8') as f:
+                    content = customize_source(info.filename, f.read(), plan, logo_path, theme)
+                target_zip.writestr(info.filename, content)
+            except Exception as e:
+                page_errors.append({'file': info.filename, 'error': str(e)})
+                target_zip.writestr(info, source_zip.read(info))
+    
+    return page_errors
 
 
-def customize_template(template_folder, business_details, logo_file=None):
+def customize_template(template_folder, business_details, logo_file=None, progress=None, color_index=None):
     """
     Main function to customize a template with business details
     
@@ -202,15 +776,20 @@ def customize_template(template_folder, business_details, logo_file=None):
         template_folder: Path to the template folder
         business_details: Dict with business info (name, email, phone, address, etc.)
         logo_file: FileStorage object for logo (optional)
+        progress: Optional callable receiving stage, files_processed, files_total and bytes_written
+        color_index: Precomputed color index of the template (built on demand for brand colors)
     
     Returns:
-        Path to customized ZIP file
+        Tuple of (path to customized ZIP file, list of per-page errors)
     """
-    # Create temporary output directory
+    # Create temporary output directory (suffix keeps concurrent builds in the same second apart)
     timestamp = int(datetime.utcnow().timestamp())
-    output_dir = f"{template_folder}_customized_{timestamp}"
+    suffix = uuid.uuid4().hex[:8]
+    output_dir = f"{template_folder}_customized_{timestamp}_{suffix}"
     
     # Copy template to output directory
+    if progress:
+        progress(stage='copying')
     shutil.copytree(template_folder, output_dir)
     
     # Initialize customizer
@@ -222,20 +801,19 @@ def customize_template(template_folder, business_details, logo_file=None):
     if logo_file:
         logo_path = customizer.process_logo(logo_file)
     
-    # Extract social links
-    social_links = {
-        'facebook': business_details.get('facebook'),
-        'twitter': business_details.get('twitter'),
-        'linkedin': business_details.get('linkedin'),
-        'instagram': business_details.get('instagram')
-    }
+    # Re-theme brand colors first: the index positions refer to the untouched source
+    if brand_colors(business_details):
+        theme = ColorTheme.from_details(color_index or build_color_index(template_folder), business_details)
+        customizer.apply_brand_colors(theme)
     
     # Customize all HTML files
-    customizer.customize_html_files(logo_path, social_links)
+    customizer.customize_html_files(logo_path, extract_social_links(business_details), progress=progress)
+    for page_error in customizer.page_errors:
+        print(f"Error customizing {page_error['file']}: {page_error['error']}")
     
     # Create ZIP file
-    zip_filename = f"customized_{business_details.get('businessName', 'template').replace(' ', '_')}_{timestamp}.zip"
-    zip_path = customizer.create_zip(zip_filename)
+    zip_filename = f"customized_{business_details.get('businessName', 'template').replace(' ', '_')}_{timestamp}_{suffix}.zip"
+    zip_path = customizer.create_zip(zip_filename, progress)
     
     # Clean up temporary directory
     try:
@@ -243,4 +821,98 @@ def customize_template(template_folder, business_details, logo_file=None):
     except:
         pass
     
-    return zip_path
+    return zip_path, customizer.page_errors
+
+
+def clean_business_details(details):
+    """Business details as written into the site: trimmed, with brand colors as #rrggbb"""
+    cleaned = {}
+    for key, value in details.items():
+        value = (value or '').strip()
+        if key in BRAND_COLOR_FIELDS and value:
+            value = normalize_hex(value) or value
+        cleaned[key] = value
+    return cleaned
+
+
+def normalize_business_details(details):
+    """
+    Trim and collapse whitespace so trivially different submissions compare equal.
+    Only for cache keys: the customized site keeps the details as submitted.
+    """
+    normalized = {}
+    for key, value in details.items():
+        value = ' '.join((value or '').split())
+        if key == 'email':
+            value = value.lower()
+        if key in BRAND_COLOR_FIELDS and value:
+            value = normalize_hex(value) or value
+        normalized[key] = value
+    return normalized
+
+
+def template_fingerprint(template_folder):
+    """Fingerprint a template tree from file names, sizes and modification times"""
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(template_folder):
+        dirs.sort()
+        for file in sorted(files):
+            file_path = os.path.join(root, file)
+            stat = os.stat(file_path)
+            digest.update(f"{os.path.relpath(file_path, template_folder)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def customization_cache_key(template_version, business_details, logo_bytes=None):
+    """Hash template version, normalized business details and logo bytes into a cache key"""
+    payload = json.dumps({
+        'customizer': CUSTOMIZATION_VERSION,
+        'template': template_version,
+        'details': normalize_business_details(business_details)
+    }, sort_keys=True)
+    digest = hashlib.sha256(payload.encode('utf-8'))
+    digest.update(hashlib.sha256(logo_bytes or b'').digest())
+    return digest.hexdigest()
+
+
+@contextmanager
+def single_flight(key):
+    """Serialize builds of the same key across threads and gunicorn worker processes"""
+    with _flight_guard:
+        entry = _flight_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    
+    lock_dir = os.path.join(Config.TEMPLATE_FOLDER, '.locks')
+    os.makedirs(lock_dir, exist_ok=True)
+    lock_path = os.path.join(lock_dir, f'{key}.lock')
+    
+    try:
+        with entry[0]:
+            while True:
+                lock_file = open(lock_path, 'a')
+                if not fcntl:
+                    break
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                # The previous holder removes the file on release; a lock on the removed file is stale
+                try:
+                    current = os.stat(lock_path)
+                except FileNotFoundError:
+                    current = None
+                opened = os.fstat(lock_file.fileno())
+                if current and (current.st_dev, current.st_ino) == (opened.st_dev, opened.st_ino):
+                    break
+                lock_file.close()
+            try:
+                yield
+            finally:
+                # Removed while still held so lock files do not pile up, one per cache key
+                try:
+                    os.remove(lock_path)
+                except OSError:
+                    pass
+                lock_file.close()
+    finally:
+        with _flight_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                _flight_locks.pop(key, None)
@@ -0,0 +1,110 @@
+"""
+Template Placeholder Index
+Records which files of a template contain which customization placeholders,
+so editing one business field only re-processes the pages that use it
+"""
+
+import os
+import re
+import json
+import uuid
+from config import Config
+from color_theme import build_color_index
+from template_customizer import (
+    TemplateCustomizer, SOCIAL_PATTERNS, CUSTOMIZATION_VERSION, template_fingerprint
+)
+
+
+def placeholder_replacements(business_details):
+    """Placeholder -> value map a customization applies (empty values are skipped, as in ReplacementPlan)"""
+    replacements = TemplateCustomizer(None, None).set_business_details(business_details).replacements
+    replacements = {old: new for old, new in replacements.items() if new}
+    
+    for platform in SOCIAL_PATTERNS:
+        if business_details.get(platform):
+            replacements[f'social:{platform}'] = business_details[platform]
+    return replacements
+
+
+def placeholder_keys():
+    """Every placeholder a customization can touch"""
+    sample = {'tagline': 'tagline'}
+    sample.update({platform: platform for platform in SOCIAL_PATTERNS})
+    return list(placeholder_replacements(sample))
+
+
+def build_placeholder_index(template_folder):
+    """Scan a template's pages and map each placeholder to the files containing it"""
+    keys = [key for key in placeholder_keys() if not key.startswith('social:')]
+    text_pattern = re.compile('|'.join(re.escape(key) for key in sorted(keys, key=len, reverse=True)))
+    social_patterns = {f'social:{platform}': re.compile(pattern) for platform, pattern in SOCIAL_PATTERNS.items()}
+    
+    files = {}
+    for root, dirs, filenames in os.walk(template_folder):
+        for filename in filenames:
+            if not filename.endswith('.html'):
+                continue
+            file_path = os.path.join(root, filename)
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            except Exception:
+                continue
+            
+            found = set(match.group(0) for match in text_pattern.finditer(content))
+            found.update(key for key, pattern in social_patterns.items() if pattern.search(content))
+            files[os.path.relpath(file_path, template_folder)] = sorted(found)
+    
+    return files
+
+
+def _load_template_index(template_id, template_folder, name, build):
+    """
+    Return a stored per-template index, rebuilding it when the template files
+    or the customizer version changed since it was written
+    """
+    index_dir = os.path.join(Config.TEMPLATE_ARTIFACTS_FOLDER, str(template_id))
+    index_path = os.path.join(index_dir, f'{name}.json')
+    fingerprint = template_fingerprint(template_folder)
+    
+    if os.path.exists(index_path):
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('fingerprint') == fingerprint and index.get('version') == CUSTOMIZATION_VERSION:
+                return index
+        except (ValueError, OSError):
+            pass
+    
+    index = build(template_folder)
+    index.update(fingerprint=fingerprint, version=CUSTOMIZATION_VERSION)
+    
+    os.makedirs(index_dir, exist_ok=True)
+    tmp_path = f"{index_path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, index_path)
+    
+    return index
+
+
+def load_placeholder_index(template_id, template_folder):
+    """Placeholder -> files index for a template"""
+    return _load_template_index(
+        template_id, template_folder, 'placeholder_index',
+        lambda folder: {'files': build_placeholder_index(folder)}
+    )
+
+
+def load_color_index(template_id, template_folder):
+    """Color literal positions for a template's CSS and inline styles"""
+    return _load_template_index(template_id, template_folder, 'color_index', build_color_index)
+
+
+def affected_files(index, old_details, new_details):
+    """Pages whose output differs between two sets of business details"""
+    old = placeholder_replacements(old_details)
+    new = placeholder_replacements(new_details)
+    changed = {key for key in set(old) | set(new) if old.get(key) != new.get(key)}
+    
+    return sorted(path for path, keys in index['files'].items() if changed.intersection(keys))
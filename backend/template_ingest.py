@@ -0,0 +1,295 @@
+"""
+Template Ingest Pipeline
+Precomputes what request paths need for a newly uploaded template: root detection,
+file manifest, minified/precompressed text assets, image derivatives, customization
+indexes and the download ZIP. Stage status is recorded on Template.ingest_status.
+"""
+
+import os
+import re
+import copy
+import gzip
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import zipfile
+from functools import lru_cache
+from mimetypes import guess_type
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from PIL import Image
+from config import Config
+from models import db, Template
+
+INGEST_STAGES = ('root', 'manifest', 'assets', 'images', 'indexes', 'archive')
+TEXT_EXTENSIONS = {'.css', '.js', '.html', '.htm', '.svg', '.json', '.txt', '.xml'}
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+MIN_PRECOMPRESS_BYTES = 1024  # Smaller files gain nothing from gzip
+
+
+def artifacts_dir(template_id):
+    """Directory holding a template's precomputed artifacts"""
+    return os.path.join(Config.TEMPLATE_ARTIFACTS_FOLDER, str(template_id))
+
+
+def is_ingested(template):
+    return (template.ingest_status or {}).get('status') == 'completed'
+
+
+def detect_root(template_folder):
+    """Find the shallowest directory containing index.html; returns (root, index) relative to the folder"""
+    candidates = []
+    for root, dirs, files in os.walk(template_folder):
+        dirs[:] = [d for d in dirs if not d.startswith('.') and d != '__MACOSX']
+        if 'index.html' in files:
+            relative = os.path.relpath(root, template_folder)
+            candidates.append((0 if relative == '.' else relative.count(os.sep) + 1, relative))
+    
+    if not candidates:
+        raise ValueError('index.html not found')
+    
+    root = min(candidates)[1]
+    return root, os.path.normpath(os.path.join(root, 'index.html'))
+
+
+def build_manifest(template_folder):
+    """List every file with its size, SHA-256 and mimetype"""
+    files = {}
+    for root, dirs, filenames in os.walk(template_folder):
+        for filename in filenames:
+            file_path = os.path.join(root, filename)
+            digest = hashlib.sha256()
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(Config.UPLOAD_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+            files[os.path.relpath(file_path, template_folder).replace(os.sep, '/')] = {
+                'size': os.path.getsize(file_path),
+                'sha256': digest.hexdigest(),
+                'mimetype': guess_type(filename)[0]
+            }
+    return files
+
+
+def minify_css(css):
+    """Conservative CSS minifier: drops comments and collapses whitespace around block punctuation"""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,])\s*', r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _precompress(template_folder, out_dir, path, entry):
+    """Minify (CSS) and gzip one text asset; returns (bytes before, bytes served)"""
+    with open(os.path.join(template_folder, path), 'rb') as f:
+        data = f.read()
+    
+    if path.endswith('.css') and not path.endswith('.min.css'):
+        try:
+            minified = minify_css(data.decode('utf-8')).encode('utf-8')
+            if len(minified) < len(data):
+                data = minified
+                entry['minified'] = True
+                _write_atomic(os.path.join(out_dir, 'assets', path), data)
+        except UnicodeDecodeError:
+            pass
+    
+    served = len(data)
+    if len(data) >= MIN_PRECOMPRESS_BYTES:
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(compressed) < len(data):
+            entry['gzip'] = True
+            served = len(compressed)
+            _write_atomic(os.path.join(out_dir, 'assets', f'{path}.gz'), compressed)
+    
+    return entry['size'], served
+
+
+def _image_derivative(template_folder, out_dir, path, entry):
+    """Write a WebP derivative of one image when it is smaller; returns (bytes before, bytes served)"""
+    webp_path = os.path.join(out_dir, 'images', f'{path}.webp')
+    with Image.open(os.path.join(template_folder, path)) as img:
+        img = img.convert('RGBA') if img.mode in ('RGBA', 'LA', 'P') else img.convert('RGB')
+        os.makedirs(os.path.dirname(webp_path), exist_ok=True)
+        tmp_path = f"{webp_path}.{uuid.uuid4().hex[:8]}.tmp"
+        img.save(tmp_path, 'WEBP', quality=80, method=4)
+    
+    if os.path.getsize(tmp_path) < entry['size']:
+        os.replace(tmp_path, webp_path)
+        entry['webp'] = True
+        return entry['size'], os.path.getsize(webp_path)
+    
+    os.remove(tmp_path)
+    return entry['size'], entry['size']
+
+
+def _run_parallel(fn, template_folder, out_dir, manifest, paths):
+    """Run a per-file stage across a thread pool, collecting failures instead of aborting"""
+    before = after = 0
+    errors = []
+    with ThreadPoolExecutor(max_workers=Config.INGEST_WORKERS) as pool:
+        futures = {pool.submit(fn, template_folder, out_dir, path, manifest[path]): path for path in paths}
+        for future, path in futures.items():
+            try:
+                original, served = future.result()
+                before += original
+                after += served
+            except Exception as e:
+                errors.append({'file': path, 'error': str(e)})
+    return {'files': len(paths), 'bytes_before': before, 'bytes_after': after, 'errors': errors[:20]}
+
+
+def stage_root(context):
+    if not os.path.isdir(context['folder']):
+        raise ValueError('Template folder not found')
+    try:
+        root, index = detect_root(context['folder'])
+    except ValueError as e:
+        # Not every template is a static site (e.g. framework projects); it can still be sold
+        context['root'], context['index'] = '.', None
+        return {'root': '.', 'index': None, 'warning': str(e)}
+    context['root'], context['index'] = root, index
+    return {'root': root, 'index': index}
+
+
+def stage_manifest(context):
+    context['manifest'] = build_manifest(context['folder'])
+    return {'files': len(context['manifest']), 'bytes': sum(f['size'] for f in context['manifest'].values())}
+
+
+def stage_assets(context):
+    manifest = context['manifest']
+    paths = [path for path in manifest if os.path.splitext(path)[1].lower() in TEXT_EXTENSIONS]
+    return _run_parallel(_precompress, context['folder'], context['out_dir'], manifest, paths)
+
+
+def stage_images(context):
+    manifest = context['manifest']
+    paths = [path for path in manifest if os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS]
+    return _run_parallel(_image_derivative, context['folder'], context['out_dir'], manifest, paths)
+
+
+def stage_indexes(context):
+    from template_index import load_placeholder_index, load_color_index
+    placeholders = load_placeholder_index(context['template_id'], context['folder'])
+    colors = load_color_index(context['template_id'], context['folder'])
+    return {'pages': len(placeholders['files']), 'colored_files': len(colors['files'])}
+
+
+def stage_archive(context):
+    archive_path = os.path.join(context['out_dir'], 'download.zip')
+    tmp_path = f"{archive_path}.{uuid.uuid4().hex[:8]}.tmp"
+    with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for path in sorted(context['manifest']):
+            zipf.write(os.path.join(context['folder'], path), path)
+    os.replace(tmp_path, archive_path)
+    
+    # The manifest is written last so readers only ever see a complete set of artifacts
+    _write_atomic(
+        os.path.join(context['out_dir'], 'manifest.json'),
+        json.dumps({'root': context['root'], 'index': context['index'], 'files': context['manifest']}).encode('utf-8')
+    )
+    return {'bytes': os.path.getsize(archive_path)}
+
+
+STAGE_FUNCTIONS = {
+    'root': stage_root,
+    'manifest': stage_manifest,
+    'assets': stage_assets,
+    'images': stage_images,
+    'indexes': stage_indexes,
+    'archive': stage_archive
+}
+
+
+def _save_status(template, status):
+    # Assign a copy so SQLAlchemy sees the JSON column change
+    template.ingest_status = copy.deepcopy(status)
+    db.session.commit()
+
+
+def run_ingest(progress, template_id):
+    """Background job body: run every ingest stage in order, recording status on the template"""
+    template = db.session.get(Template, template_id)
+    if template is None:
+        raise ValueError(f'Template {template_id} not found')
+    
+    previous = template.ingest_status or {}
+    status = {
+        'status': 'running',
+        'job_id': progress.job_id,
+        'approve_on_complete': previous.get('approve_on_complete', False),
+        'started_at': datetime.utcnow().isoformat(),
+        'stages': {name: {'status': 'pending'} for name in INGEST_STAGES}
+    }
+    _save_status(template, status)
+    
+    context = {
+        'template_id': template_id,
+        'folder': template.file_path,
+        'out_dir': artifacts_dir(template_id)
+    }
+    os.makedirs(context['out_dir'], exist_ok=True)
+    
+    for name in INGEST_STAGES:
+        stage = status['stages'][name]
+        stage.update(status='running', started_at=datetime.utcnow().isoformat())
+        _save_status(template, status)
+        progress(stage=name, force=True)
+        
+        start = time.perf_counter()
+        try:
+            stage['result'] = STAGE_FUNCTIONS[name](context)
+            stage['status'] = 'completed'
+        except Exception as e:
+            stage.update(status='failed', error=str(e))
+            status['status'] = 'failed'
+            raise
+        finally:
+            stage['duration_ms'] = round((time.perf_counter() - start) * 1000)
+            if status['status'] == 'failed':
+                status['finished_at'] = datetime.utcnow().isoformat()
+            _save_status(template, status)
+    
+    status.update(status='completed', finished_at=datetime.utcnow().isoformat())
+    if status.pop('approve_on_complete') and template.status == 'pending':
+        template.status = 'approved'
+    _save_status(template, status)
+    
+    return {'template_id': template_id, 'stages': {name: status['stages'][name].get('result') for name in INGEST_STAGES}}
+
+
+@lru_cache(maxsize=256)
+def _read_manifest(template_id, finished_at):
+    with open(os.path.join(artifacts_dir(template_id), 'manifest.json'), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    # Basename lookup mirrors the recursive search of the raw preview route
+    by_name = {}
+    for path in sorted(manifest['files'], key=lambda p: (p.count('/'), p)):
+        by_name.setdefault(os.path.basename(path), path)
+    manifest['by_name'] = by_name
+    return manifest
+
+
+def load_manifest(template):
+    """Precomputed manifest of an ingested template, or None"""
+    if not is_ingested(template):
+        return None
+    try:
+        return _read_manifest(template.id, template.ingest_status.get('finished_at'))
+    except (OSError, ValueError):
+        return None
+
+
+def remove_artifacts(template_id):
+    """Delete precomputed artifacts (before a re-ingest or when the template is deleted)"""
+    shutil.rmtree(artifacts_dir(template_id), ignore_errors=True)
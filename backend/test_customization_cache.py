@@ -0,0 +1,112 @@
+"""Tests for customization cache keys and customized artifacts (run with pytest or directly)"""
+
+import os
+import zipfile
+import tempfile
+
+from color_theme import build_color_index
+
+from template_customizer import (
+    TemplateCustomizer, clean_business_details, customization_cache_key, customize_template, customize_preview,
+    patch_customized_zip, extract_social_links, DEFAULT_ADDRESS, DEFAULT_EMAIL
+)
+
+PAGE = f"""<!DOCTYPE html>
+<html><head><meta name="description" content=""></head>
+<body><p>{DEFAULT_ADDRESS}</p><a href="mailto:{DEFAULT_EMAIL}">{DEFAULT_EMAIL}</a></body></html>
+"""
+
+
+def template_folder_in(root, pages):
+    template_folder = os.path.join(root, 'site')
+    os.makedirs(template_folder)
+    for filename, content in pages.items():
+        with open(os.path.join(template_folder, filename), 'w', encoding='utf-8') as f:
+            f.write(content)
+    return template_folder
+
+
+def details(**values):
+    fields = ['businessName', 'tagline', 'description', 'email', 'phone', 'address', 'city', 'country',
+              'facebook', 'twitter', 'linkedin', 'instagram', 'primaryColor', 'secondaryColor', 'accentColor']
+    return clean_business_details({field: values.get(field, '') for field in fields})
+
+
+def test_clean_details_only_trim_and_normalize_colors():
+    cleaned = details(description='  First line.\n\nSecond  line. ', email=' Jane.Doe@Example.com ', primaryColor='#ABC')
+    assert cleaned['description'] == 'First line.\n\nSecond  line.'
+    assert cleaned['email'] == 'Jane.Doe@Example.com'
+    assert cleaned['primaryColor'] == '#aabbcc'
+
+
+def test_whitespace_and_email_case_share_a_cache_entry():
+    first = details(businessName='Acme', description='Line one.\nLine two.', email='Jane@Example.com', address='1 Main St\nSuite 2')
+    second = details(businessName=' Acme ', description='Line one.  Line two.', email='jane@example.com', address='1 Main St Suite 2')
+    assert customization_cache_key('v1', first) == customization_cache_key('v1', second)
+    assert customization_cache_key('v1', first) != customization_cache_key('v2', first)
+    assert customization_cache_key('v1', first) != customization_cache_key('v1', details(businessName='Other'))
+
+
+def test_artifact_keeps_the_submitted_text():
+    with tempfile.TemporaryDirectory() as root:
+        template_folder = template_folder_in(root, {'index.html': PAGE})
+        submitted = details(businessName='Acme', description='Line one.\nLine two.', email='Jane@Example.com', address='1 Main St\nSuite 2')
+        zip_path, page_errors = customize_template(template_folder, submitted)
+        with zipfile.ZipFile(zip_path) as zipf:
+            page = zipf.read('index.html').decode('utf-8')
+    
+    assert page_errors == []
+    assert 'content="Line one.\nLine two."' in page
+    assert '1 Main St\nSuite 2' in page
+    assert 'mailto:Jane@Example.com' in page
+
+
+def test_patched_zip_round_trips():
+    pages = {'index.html': PAGE, 'about.html': '<html><body><p>About</p></body></html>', 'styles.css': 'body { color: red; }'}
+    with tempfile.TemporaryDirectory() as root:
+        template_folder = template_folder_in(root, pages)
+        zip_path, _ = customize_template(template_folder, details(businessName='Acme', email='old@example.com'))
+        
+        new_details = details(businessName='Acme', email='new@example.com')
+        customizer = TemplateCustomizer(template_folder, None)
+        customizer.set_business_details(new_details)
+        plan = customizer.build_plan(extract_social_links(new_details))
+        new_zip_path = os.path.join(root, 'patched.zip')
+        assert patch_customized_zip(template_folder, zip_path, new_zip_path, ['index.html'], plan) == []
+        
+        with zipfile.ZipFile(zip_path) as old_zip, zipfile.ZipFile(new_zip_path) as new_zip:
+            assert new_zip.testzip() is None
+            assert new_zip.namelist() == old_zip.namelist()
+            for name in old_zip.namelist():
+                if name != 'index.html':
+                    assert new_zip.read(name) == old_zip.read(name)
+            page = new_zip.read('index.html').decode('utf-8')
+    
+    assert 'mailto:new@example.com' in page
+    assert 'old@example.com' not in page
+
+
+def test_preview_applies_brand_colors_like_the_zip():
+    pages = {
+        'index.html': '<html><head><style>h1 { color: #0d6efd; }</style></head><body><h1 style="color:#0d6efd">Hi</h1></body></html>',
+        'styles.css': ':root { --primary: #0d6efd; }\n.btn { background: #0b5ed7; }'
+    }
+    with tempfile.TemporaryDirectory() as root:
+        template_folder = template_folder_in(root, pages)
+        submitted = details(businessName='Acme', primaryColor='#ff6600')
+        zip_path, _ = customize_template(template_folder, submitted)
+        with zipfile.ZipFile(zip_path) as zipf:
+            expected = {name: zipf.read(name).decode('utf-8') for name in pages}
+        color_index = build_color_index(template_folder)
+    
+    assert '#ff6600' in expected['styles.css']
+    for name, content in pages.items():
+        assert customize_preview(name, content, submitted, color_index) == expected[name]
+    assert customize_preview('styles.css', pages['styles.css'], details(businessName='Acme'), color_index) == pages['styles.css']
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
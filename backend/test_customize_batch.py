@@ -0,0 +1,77 @@
+"""Tests for batch customization in the shared process pool (run with pytest or directly)"""
+
+import os
+import time
+import zipfile
+import tempfile
+
+import template_customizer
+from template_customizer import customize_batch, template_fingerprint, _worker_snapshot, WORKER_SNAPSHOT_CACHE_SIZE
+
+PAGES = {
+    'index.html': '<html><head><style>h1 { color: #0d6efd; }</style></head><body><h1>GrowMark</h1><p>info@example.com</p></body></html>',
+    'about.html': '<html><body><p>About GrowMark</p></body></html>',
+    'css/style.css': ':root { --primary: #0d6efd; }'
+}
+RECORDS = [
+    {'businessName': 'Acme', 'email': 'acme@example.com'},
+    {'businessName': 'Beta', 'email': 'beta@example.com', 'primaryColor': '#ff6600'},
+    {'businessName': 'Gamma', 'email': 'gamma@example.com'}
+]
+
+
+def write_template(root):
+    template_folder = os.path.join(root, 'site')
+    for filename, content in PAGES.items():
+        os.makedirs(os.path.dirname(os.path.join(template_folder, filename)), exist_ok=True)
+        with open(os.path.join(template_folder, filename), 'w', encoding='utf-8') as f:
+            f.write(content)
+    return template_folder
+
+
+def contents(results):
+    archives = []
+    for result in results:
+        with zipfile.ZipFile(result['zip_path']) as zipf:
+            archives.append({name: zipf.read(name) for name in zipf.namelist()})
+    return archives
+
+
+def test_pooled_batch_matches_in_process_batch():
+    with tempfile.TemporaryDirectory() as root:
+        template_folder = write_template(root)
+        pooled = customize_batch(template_folder, RECORDS, workers=2)
+        in_process = customize_batch(template_folder, RECORDS, workers=1)
+        
+        assert [result['page_errors'] for result in pooled] == [[], [], []]
+        assert contents(pooled) == contents(in_process)
+        assert b'#ff6600' in contents(pooled)[1]['css/style.css']
+        assert b'#0d6efd' in contents(pooled)[0]['css/style.css']
+
+
+def test_worker_snapshot_is_read_once_per_template_version():
+    with tempfile.TemporaryDirectory() as root:
+        template_folder = write_template(root)
+        fingerprint = template_fingerprint(template_folder)
+        snapshot = _worker_snapshot(template_folder, fingerprint, False)
+        assert _worker_snapshot(template_folder, fingerprint, False) is snapshot
+        assert _worker_snapshot(template_folder, fingerprint, True).color_index['files']
+        
+        # An edited template has a new fingerprint and is read again
+        time.sleep(0.01)
+        with open(os.path.join(template_folder, 'about.html'), 'w', encoding='utf-8') as f:
+            f.write('<html><body>Edited</body></html>')
+        edited = _worker_snapshot(template_folder, template_fingerprint(template_folder), False)
+        assert edited is not snapshot
+        assert edited.pages['about.html'] == '<html><body>Edited</body></html>'
+        
+        for version in range(WORKER_SNAPSHOT_CACHE_SIZE + 2):
+            _worker_snapshot(template_folder, f'version-{version}', False)
+        assert len(template_customizer._worker_snapshots) == WORKER_SNAPSHOT_CACHE_SIZE
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
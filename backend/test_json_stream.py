@@ -0,0 +1,110 @@
+"""Tests for the streamed JSON object parser and salvage (run with pytest or directly)"""
+
+import json
+
+import pytest
+
+from json_stream import JsonObjectStream, salvage_file_entries
+
+
+FILES = {
+    'index.html': '<!DOCTYPE html><html><body><p class="lead">Say "hi" \\o/</p></body></html>',
+    'styles.css': 'body { content: "\\201C"; }\n',
+    'script.js': 'const s = "{\\"a\\": 1}";'
+}
+
+
+def feed_in_chunks(text, size):
+    parser = JsonObjectStream()
+    entries = []
+    for i in range(0, len(text), size):
+        entries.extend(parser.feed(text[i:i + size]))
+    return parser, entries
+
+
+def test_entries_complete_at_any_chunk_size():
+    text = json.dumps(FILES)
+    for size in (1, 2, 3, 7, 64, len(text)):
+        parser, entries = feed_in_chunks(text, size)
+        assert parser.complete
+        assert dict(entries) == FILES
+        assert [key for key, _ in entries] == list(FILES)
+
+
+def test_entry_is_yielded_as_soon_as_its_value_closes():
+    parser = JsonObjectStream()
+    assert parser.feed('{"index.html": "<p>a</p>"') == [('index.html', '<p>a</p>')]
+    assert parser.feed(', "styles.css": "body{') == []
+    assert parser.feed('}"}') == [('styles.css', 'body{}')]
+    assert parser.complete
+
+
+def test_escaped_quote_split_across_chunks():
+    parser = JsonObjectStream()
+    assert parser.feed('{"a.js": "x\\') == []
+    assert parser.feed('"y"}') == [('a.js', 'x"y')]
+
+
+def test_code_fence_and_trailing_text_are_ignored():
+    text = '```json\n' + json.dumps(FILES) + '\n```\nDone!'
+    parser, entries = feed_in_chunks(text, 5)
+    assert parser.complete
+    assert dict(entries) == FILES
+    assert parser.feed('more') == []
+
+
+def test_consumed_text_is_dropped():
+    parser = JsonObjectStream()
+    parser.feed('{"index.html": "' + 'x' * 10000 + '", "b.css": "ab')
+    assert len(parser.buffer) < 10
+
+
+def test_truncated_object_is_not_complete():
+    parser, entries = feed_in_chunks(json.dumps(FILES)[:-20], 10)
+    assert not parser.complete
+    assert list(dict(entries)) == ['index.html', 'styles.css']
+
+
+def test_malformed_input_raises():
+    with pytest.raises(ValueError):
+        JsonObjectStream().feed('{"index.html": 42}')
+    with pytest.raises(ValueError):
+        JsonObjectStream().feed('{"index.html" "x"}')
+    with pytest.raises(ValueError):
+        JsonObjectStream().feed('{"a.html": "x" "b.html": "y"}')
+
+
+def test_salvage_recovers_complete_entries_of_a_truncated_response():
+    text = json.dumps(FILES)
+    cut = text[:text.index('"script.js"') + 20]
+    assert salvage_file_entries(cut) == {'index.html': FILES['index.html'], 'styles.css': FILES['styles.css']}
+    assert salvage_file_entries(text) == FILES
+
+
+def test_salvage_keeps_unescaped_quotes_and_raw_newlines():
+    text = '{"index.html": "<a href="x.html">Go</a>\n<p>ok</p>", "styles.css": "a{}"}'
+    assert salvage_file_entries(text) == {
+        'index.html': '<a href="x.html">Go</a>\n<p>ok</p>',
+        'styles.css': 'a{}'
+    }
+
+
+def test_salvage_repairs_invalid_escapes():
+    assert salvage_file_entries('{"a.css": "a::before { content: \\"\\f101\\"; } \\d"}') == {
+        'a.css': 'a::before { content: "\x0c101"; } \\d'
+    }
+
+
+def test_salvage_extra_keys():
+    text = '{"business_name": "Acme", "design_notes": "use .card", "styles.css": "a{}", "index.html": "<p>cut'
+    assert salvage_file_entries(text) == {'styles.css': 'a{}'}
+    assert salvage_file_entries(text, extra_keys=('business_name', 'design_notes')) == {
+        'business_name': 'Acme', 'design_notes': 'use .card', 'styles.css': 'a{}'
+    }
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
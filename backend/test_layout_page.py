@@ -0,0 +1,84 @@
+"""Tests for layout-mode page assembly (run with pytest or directly)"""
+
+import re
+
+from ai_generator import render_layout_page
+
+PAGES = ['index', 'about', 'contact']
+LAYOUT = {
+    'business_name': 'Acme & Sons',
+    'head.html': '<link rel="stylesheet" href="fonts.css">',
+    'footer.html': '<footer class="footer"><p>&copy; Acme</p></footer>',
+    'styles.css': '.hero{}',
+    'script.js': '//'
+}
+TESTIMONIAL = '<section class="testimonials"><blockquote><p>Great work</p><footer>Jane, CEO</footer></blockquote></section>'
+
+
+def main_of(page_html):
+    return re.search(r'<main>\n(.*)\n</main>', page_html, re.DOTALL).group(1)
+
+
+def test_body_is_wrapped_in_the_shared_layout():
+    page_html = render_layout_page('<section class="hero"><h1>About</h1></section>', 'about', PAGES, LAYOUT)
+    assert page_html.startswith('<!DOCTYPE html>')
+    assert '<title>About | Acme &amp; Sons</title>' in page_html
+    assert LAYOUT['head.html'] in page_html
+    assert page_html.count('<nav') == 1
+    assert '<a href="about.html" class="nav-link active">' in page_html
+    assert page_html.count(' active"') == 1
+    assert page_html.count(LAYOUT['footer.html']) == 1
+    assert page_html.count('<script src="script.js"></script>') == 1
+    assert main_of(page_html) == '<section class="hero"><h1>About</h1></section>'
+
+
+def test_code_fence_is_stripped():
+    page_html = render_layout_page('```html\n<section>x</section>\n```', 'index', PAGES, LAYOUT)
+    assert main_of(page_html) == '<section>x</section>'
+    assert '<title>Home | Acme &amp; Sons</title>' in page_html
+
+
+def test_footers_inside_content_are_kept():
+    page_html = render_layout_page(TESTIMONIAL, 'about', PAGES, LAYOUT)
+    assert main_of(page_html) == TESTIMONIAL
+
+
+def test_repeated_shared_parts_are_removed():
+    body = (
+        '<nav class="navbar"><a href="index.html">Home</a></nav>\n' + TESTIMONIAL +
+        '\n<footer class="site-footer">Copy of the footer</footer>\n<script src="script.js"></script>'
+    )
+    page_html = render_layout_page(body, 'about', PAGES, LAYOUT)
+    assert main_of(page_html) == TESTIMONIAL
+    assert 'Copy of the footer' not in page_html
+    assert page_html.count('<nav') == 1
+
+
+def test_whole_document_keeps_only_main():
+    document = (
+        '<!DOCTYPE html><html><head><title>x</title></head><body>'
+        '<nav>n</nav><main class="content">' + TESTIMONIAL + '<nav class="tabs">t</nav></main>'
+        '<footer>site</footer><script src="script.js"></script></body></html>'
+    )
+    page_html = render_layout_page(document, 'contact', PAGES, LAYOUT)
+    assert main_of(page_html) == TESTIMONIAL + '<nav class="tabs">t</nav>'
+    assert '>site<' not in page_html
+
+
+def test_layout_footer_copy_is_removed_anywhere():
+    page_html = render_layout_page('<section>x</section>' + LAYOUT['footer.html'] + '<section>y</section>', 'about', PAGES, LAYOUT)
+    assert main_of(page_html) == '<section>x</section><section>y</section>'
+
+
+def test_defaults_without_optional_layout_parts():
+    layout = {'footer.html': '<footer>f</footer>', 'styles.css': '', 'script.js': ''}
+    page_html = render_layout_page('<section>x</section>', 'index', PAGES, layout)
+    assert 'BusinessName' in page_html
+    assert 'font-awesome' in page_html
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,172 @@
+"""Tests for the LLM call limiter and circuit breaker (run with pytest or directly)"""
+
+import os
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+from config import Config
+from llm_limiter import LLMLimiter, LLMUnavailable
+
+SETTINGS = {
+    'LLM_MAX_CONCURRENCY': 1,
+    'LLM_REQUESTS_PER_MINUTE': 6000,
+    'LLM_BURST': 100,
+    'LLM_QUEUE_TIMEOUT_SECONDS': 5,
+    'LLM_MAX_RETRIES': 0,
+    'LLM_BACKOFF_BASE_SECONDS': 0.01,
+    'LLM_BACKOFF_MAX_SECONDS': 0.01,
+    'LLM_BREAKER_FAILURES': 2,
+    'LLM_BREAKER_COOLDOWN_SECONDS': 0.2
+}
+
+
+class Unavailable(Exception):
+    code = 503
+
+
+class BadRequest(Exception):
+    code = 400
+
+
+@contextmanager
+def limiter_with(**overrides):
+    """A limiter on its own state file, with Config patched for the duration"""
+    settings = dict(SETTINGS, **overrides)
+    saved = {name: getattr(Config, name) for name in settings}
+    for name, value in settings.items():
+        setattr(Config, name, value)
+    try:
+        with tempfile.TemporaryDirectory() as state_dir:
+            yield LLMLimiter(os.path.join(state_dir, 'llm_limiter.json'))
+    finally:
+        for name, value in saved.items():
+            setattr(Config, name, value)
+
+
+def fail(error):
+    def call():
+        raise error
+    return call
+
+
+def circuit(limiter):
+    return limiter.metrics()['circuit']['state']
+
+
+def test_consecutive_failures_open_the_circuit():
+    with limiter_with() as limiter:
+        with pytest.raises(Unavailable):
+            limiter.call(fail(Unavailable()))
+        assert circuit(limiter) == 'closed'
+        with pytest.raises(Unavailable):
+            limiter.call(fail(Unavailable()))
+        assert circuit(limiter) == 'open'
+
+        with pytest.raises(LLMUnavailable) as rejected:
+            limiter.call(lambda: 'ok')
+        assert rejected.value.retry_after >= 0.2
+        assert limiter.counters['rejected'] == 1
+
+
+def test_success_resets_the_failure_count():
+    with limiter_with() as limiter:
+        with pytest.raises(Unavailable):
+            limiter.call(fail(Unavailable()))
+        assert limiter.call(lambda: 'ok') == 'ok'
+        with pytest.raises(Unavailable):
+            limiter.call(fail(Unavailable()))
+        assert circuit(limiter) == 'closed'
+
+
+def test_non_retryable_errors_do_not_count():
+    with limiter_with(LLM_MAX_RETRIES=3) as limiter:
+        for _ in range(3):
+            with pytest.raises(BadRequest):
+                limiter.call(fail(BadRequest()))
+        assert circuit(limiter) == 'closed'
+        assert limiter.counters['retries'] == 0
+
+
+def test_half_open_trial_closes_or_reopens():
+    with limiter_with() as limiter:
+        for _ in range(2):
+            with pytest.raises(Unavailable):
+                limiter.call(fail(Unavailable()))
+        time.sleep(0.25)
+
+        # A failed trial reopens the circuit straight away
+        with pytest.raises(Unavailable):
+            limiter.call(fail(Unavailable()))
+        assert circuit(limiter) == 'open'
+        time.sleep(0.25)
+
+        assert limiter.call(lambda: 'ok') == 'ok'
+        assert circuit(limiter) == 'closed'
+
+
+def test_retryable_errors_are_retried():
+    with limiter_with(LLM_MAX_RETRIES=3, LLM_BREAKER_FAILURES=5) as limiter:
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise Unavailable()
+            return 'done'
+
+        assert limiter.call(flaky) == 'done'
+        assert len(attempts) == 3
+        assert limiter.counters['retries'] == 2
+        assert circuit(limiter) == 'closed'
+
+
+def test_errors_while_reading_a_stream_count():
+    with limiter_with() as limiter:
+        def chunks():
+            yield 'a'
+            raise Unavailable()
+
+        for _ in range(2):
+            response = limiter.call(chunks)
+            with pytest.raises(Unavailable):
+                list(limiter.stream(response))
+        assert circuit(limiter) == 'open'
+
+
+def test_queue_timeout_when_slots_are_busy():
+    with limiter_with() as limiter:
+        release = threading.Event()
+        holder = threading.Thread(target=limiter.call, args=(release.wait,))
+        holder.start()
+        try:
+            while limiter.metrics()['in_flight'] == 0:
+                time.sleep(0.01)
+            started = time.time()
+            with pytest.raises(LLMUnavailable) as busy:
+                limiter.call(lambda: 'ok', queue_timeout=0.3)
+            assert time.time() - started < 2
+            assert busy.value.retry_after == 0.3
+        finally:
+            release.set()
+            holder.join()
+        assert limiter.metrics()['queue_depth'] == 0
+        assert limiter.call(lambda: 'ok', queue_timeout=0.3) == 'ok'
+
+
+def test_slot_is_reentrant_within_a_thread():
+    with limiter_with() as limiter:
+        with limiter.slot():
+            assert limiter.call(lambda: 'inner') == 'inner'
+            assert limiter.metrics()['in_flight'] == 1
+        assert limiter.metrics()['in_flight'] == 0
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
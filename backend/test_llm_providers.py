@@ -0,0 +1,63 @@
+"""Tests for choosing the active LLM provider (run with pytest or directly)"""
+
+import io
+import time
+from contextlib import contextmanager, redirect_stdout
+
+import pytest
+
+import llm_providers
+from config import Config
+
+
+@contextmanager
+def configured(provider, override=None):
+    """Config.LLM_PROVIDER and the runtime override patched for the duration"""
+    saved = Config.LLM_PROVIDER, dict(llm_providers._override), set(llm_providers._unknown_overrides)
+    Config.LLM_PROVIDER = provider
+    # A fresh check time keeps provider_name() from reading the shared override file
+    llm_providers._override.update(name=override, checked_at=time.time())
+    try:
+        yield
+    finally:
+        Config.LLM_PROVIDER = saved[0]
+        llm_providers._override.update(saved[1])
+        llm_providers._unknown_overrides.clear()
+        llm_providers._unknown_overrides.update(saved[2])
+
+
+def test_unknown_configured_provider_is_refused():
+    with configured('gemnii'):
+        with pytest.raises(ValueError, match="Unknown LLM_PROVIDER 'gemnii'"):
+            llm_providers.check_configured_provider()
+    with configured('fake'):
+        llm_providers.check_configured_provider()
+
+
+def test_override_wins_over_the_configured_provider():
+    with configured('fake', override='openai'):
+        assert llm_providers.provider_name() == 'openai'
+    with configured('fake'):
+        assert llm_providers.provider_name() == 'fake'
+
+
+def test_unknown_override_falls_back_to_the_configured_provider_with_one_warning():
+    output = io.StringIO()
+    with configured('fake', override='claude'), redirect_stdout(output):
+        assert llm_providers.provider_name() == 'fake'
+        assert llm_providers.provider_name() == 'fake'
+    assert output.getvalue().count("Unknown LLM provider override 'claude'") == 1
+
+
+def test_unknown_override_set_at_runtime_is_rejected():
+    with configured('fake'):
+        with pytest.raises(ValueError, match="Unknown provider 'gemnii'"):
+            llm_providers.set_provider('gemnii')
+        assert llm_providers.provider_name() == 'fake'
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
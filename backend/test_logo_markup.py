@@ -0,0 +1,56 @@
+"""Tests for logo and favicon markup injected into customized pages (run with pytest or directly)"""
+
+from template_customizer import ReplacementPlan, customize_html, logo_asset_files, available_parsers, DEFAULT_COMPANY
+
+ASSETS = {key: f'img/{filename}' for key, filename in logo_asset_files().items()}
+PAGE = '<html><head><title>x</title>{links}</head><body><h1>{company}</h1></body></html>'
+
+
+def customize(links='', assets=ASSETS, parser='html.parser'):
+    plan = ReplacementPlan({DEFAULT_COMPANY: 'Acme'}, parser=parser, logo_assets=assets)
+    return customize_html(PAGE.format(links=links, company=DEFAULT_COMPANY), plan, assets['logo'])
+
+
+def test_page_without_icon_link_gets_the_whole_favicon_set():
+    for parser in available_parsers():
+        page_html = customize(parser=parser)
+        assert page_html.count('<link rel="icon"') == 2
+        assert 'sizes="16x16" href="img/favicon-16x16.png"' in page_html
+        assert 'sizes="32x32" href="img/favicon-32x32.png"' in page_html
+        assert 'sizes="180x180" href="img/apple-touch-icon.png"' in page_html
+
+
+def test_existing_icon_link_is_repointed_not_duplicated():
+    for links in ['<link rel="icon" href="favicon.ico">', "<link rel='shortcut icon' href='favicon.ico'>", '<link rel=icon href=favicon.ico>']:
+        for parser in available_parsers():
+            page_html = customize(links, parser=parser)
+            assert 'favicon.ico' not in page_html
+            assert page_html.count('img/favicon-32x32.png') == 1
+            assert 'sizes="32x32"' not in page_html
+
+
+def test_apple_touch_icon_is_not_a_favicon():
+    page_html = customize('<link rel="apple-touch-icon" href="touch.png">')
+    assert 'sizes="32x32" href="img/favicon-32x32.png"' in page_html
+
+
+def test_logo_offers_the_webp_render():
+    for parser in available_parsers():
+        page_html = customize(parser=parser)
+        assert '<h1><picture><source srcset="img/logo.webp" type="image/webp"/><img ' in page_html
+        assert 'src="img/logo.png"' in page_html and page_html.endswith('</picture></h1></body></html>')
+
+
+def test_logo_without_renders_is_a_plain_image():
+    # Undecodable logos (e.g. SVG) ship as-is with no favicon set or WebP copy
+    page_html = customize('<link rel="icon" href="favicon.ico">', assets={'logo': 'img/logo.svg'})
+    assert '<picture>' not in page_html
+    assert '<h1><img ' in page_html and 'src="img/logo.svg"' in page_html
+    assert page_html.count('img/logo.svg') == 2
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
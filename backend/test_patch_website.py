@@ -0,0 +1,75 @@
+"""Tests for section patching with malformed model responses (run with pytest or directly)"""
+
+import json
+from contextlib import contextmanager
+
+import pytest
+
+import ai_generator
+from site_sections import split_site
+from test_site_sections import FILES
+
+MALFORMED_PLANS = [{'sections': 'about.html#2'}, {'sections': {'id': 'x'}}, {'sections': [{'id': 'x'}, ['y'], 7]}, {}]
+
+
+class ScriptedLimiter:
+    """Stands in for the LLM limiter and returns the given responses in order"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+
+    def call(self, fn, *args, **kwargs):
+        return self.responses.pop(0)
+
+
+@contextmanager
+def model_responses(*responses):
+    limiter = ai_generator.limiter
+    ai_generator.limiter = ScriptedLimiter(json.dumps(response) for response in responses)
+    try:
+        yield
+    finally:
+        ai_generator.limiter = limiter
+
+
+def hero_id():
+    return next(section_id for section_id, section in split_site(FILES).items()
+                if section_id.startswith('about.html#') and 'hero' in section['source'])
+
+
+@pytest.mark.parametrize('plan', MALFORMED_PLANS)
+def test_malformed_plan_is_a_clear_error(plan):
+    with model_responses(plan):
+        with pytest.raises(ValueError, match='Could not tell which part'):
+            ai_generator.patch_website('Acme site', 'change the hero', FILES)
+
+
+def test_non_string_sections_in_the_plan_are_skipped():
+    section_id = hero_id()
+    new_hero = '<section class="hero"><h1>Our story</h1></section>'
+    with model_responses({'sections': [None, {'id': 'x'}, section_id]}, {section_id: new_hero}):
+        updated, changed, patched = ai_generator.patch_website('Acme site', 'change the hero', FILES)
+    assert changed == ['about.html']
+    assert patched == [section_id]
+    assert new_hero in updated['about.html']
+
+
+def test_non_string_patches_are_ignored():
+    section_id = hero_id()
+    other_id = 'styles.css#1'
+    with model_responses({'sections': [section_id, other_id]}, {section_id: None, other_id: ['body {}']}):
+        updated, changed, patched = ai_generator.patch_website('Acme site', 'change the hero', FILES)
+    assert changed == []
+    assert patched == []
+    assert updated == FILES
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name == 'test_malformed_plan_is_a_clear_error':
+            for plan in MALFORMED_PLANS:
+                test(plan)
+            print(f"✅ {name}")
+        elif name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
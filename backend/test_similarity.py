@@ -0,0 +1,62 @@
+"""Tests for the description similarity index (run with pytest or directly)"""
+
+from similarity import SimilarityIndex, tokenize, jaccard, minhash, NUM_PERMUTATIONS
+
+
+def test_tokenize_drops_stopwords_and_plurals():
+    assert tokenize('Create a website for my Bakery in Lahore') == {'bakery', 'lahore'}
+    assert tokenize('cakes and pastries') == {'cake', 'pastrie'}
+    assert tokenize('fitness class') == {'fitness', 'class'}
+    assert tokenize('') == frozenset()
+
+
+def test_jaccard():
+    assert jaccard(frozenset({'a', 'b'}), frozenset({'a', 'b'})) == 1.0
+    assert jaccard(frozenset({'a', 'b'}), frozenset({'b', 'c'})) == 1 / 3
+    assert jaccard(frozenset(), frozenset()) == 1.0
+
+
+def test_minhash_is_stable_and_order_free():
+    signature = minhash(tokenize('bakery lahore cakes'))
+    assert len(signature) == NUM_PERMUTATIONS
+    assert signature == minhash(tokenize('cakes, lahore bakery'))
+
+
+def test_near_duplicates_are_found():
+    index = SimilarityIndex()
+    index.add(1, 'bakery website in Lahore')
+    index.add(2, 'law firm in Karachi with practice areas')
+    index.add(3, 'dental clinic booking site')
+    assert len(index) == 3
+    
+    matches = index.query('website for a bakery, Lahore', threshold=0.8)
+    assert matches == [(1.0, 1)]
+    assert index.query('yoga studio in Berlin', threshold=0.5) == []
+
+
+def test_results_are_ordered_and_thresholded():
+    index = SimilarityIndex()
+    index.add('exact', 'italian restaurant pizza pasta delivery')
+    index.add('close', 'italian restaurant pizza pasta')
+    matches = index.query('italian restaurant pizza pasta delivery', threshold=0.5)
+    assert [key for _, key in matches] == ['exact', 'close']
+    assert [key for _, key in index.query('italian restaurant pizza pasta delivery', threshold=0.9)] == ['exact']
+
+
+def test_remove_and_empty_text():
+    index = SimilarityIndex()
+    index.add(1, 'bakery lahore')
+    index.add(2, 'the website')  # Only stopwords: not indexed
+    assert len(index) == 1
+    index.remove(1)
+    index.remove(99)
+    assert len(index) == 0
+    assert index.query('bakery lahore', threshold=0.1) == []
+    assert index.query('a website', threshold=0.0) == []
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,105 @@
+"""Tests for site section splitting and patching (run with pytest or directly)"""
+
+from site_sections import split_site, apply_patches, css_sections, html_sections, site_outline
+
+
+def page(active, hero):
+    links = ''.join(
+        f'<a href="{name}" class="nav-link{" active" if name == active else ""}">{name}</a>'
+        for name in ('index.html', 'about.html')
+    )
+    return (
+        '<!DOCTYPE html><html><head><title>t</title></head><body>\n'
+        f'<nav class="navbar">{links}</nav>\n'
+        f'<main>\n<section class="hero"><h1>{hero}</h1><p>Welcome<br>friends</p></section>\n'
+        '<img src="a.jpg" alt="">\n</main>\n'
+        '<footer class="footer"><p>&copy; Acme</p></footer>\n'
+        '<script src="script.js"></script>\n</body></html>'
+    )
+
+
+FILES = {
+    'index.html': page('index.html', 'Home'),
+    'about.html': page('about.html', 'About us'),
+    'styles.css': '/* base */\nbody { color: red; }\n.hero { padding: 1rem; }\n',
+    'script.js': 'console.log("hi");\n'
+}
+
+
+def test_html_sections_are_top_level_blocks_of_body_and_main():
+    content = FILES['index.html']
+    sections = html_sections(content)
+    assert [section['tag'] for section in sections] == ['nav', 'section', 'img', 'footer']
+    hero = sections[1]
+    assert content[hero['start']:hero['end']].startswith('<section class="hero">')
+    assert content[hero['start']:hero['end']].endswith('</section>')
+    assert hero['heading'] == 'Home'
+
+
+def test_css_sections_cover_the_whole_stylesheet():
+    content = FILES['styles.css']
+    sections = css_sections(content)
+    assert sections[0]['start'] == 0 and sections[-1]['end'] == len(content)
+    assert 'body' in sections[0]['text'] and '.hero' in sections[0]['text']
+
+
+def test_split_site_shares_blocks_repeated_across_pages():
+    sections = split_site(FILES)
+    nav = [section for section_id, section in sections.items() if section_id.startswith('shared#') and 'nav' in section['description']]
+    assert len(nav) == 1
+    assert sorted(filename for filename, _, _ in nav[0]['locations']) == ['about.html', 'index.html']
+    assert any(section_id.startswith('index.html#') for section_id in sections)
+    assert any(section_id.startswith('about.html#') for section_id in sections)
+    assert 'styles.css#1' in sections and 'script.js#1' in sections
+    for section_id in sections:
+        assert site_outline(sections).count(section_id + ' ') >= 1
+
+
+def test_locations_point_at_the_source():
+    sections = split_site(FILES)
+    for section in sections.values():
+        filename, start, end = section['locations'][0]
+        assert FILES[filename][start:end] == section['source']
+
+
+def test_shared_patch_applies_to_every_page_and_keeps_active_links():
+    sections = split_site(FILES)
+    footer_id = next(section_id for section_id, section in sections.items() if '<footer' in section['source'])
+    nav_id = next(section_id for section_id, section in sections.items() if '<nav' in section['source'])
+    new_nav = sections[nav_id]['source'].replace('</nav>', '<a href="contact.html" class="nav-link">contact</a></nav>')
+    
+    updated, changed = apply_patches(FILES, sections, {
+        footer_id: '<footer class="footer"><p>&copy; Acme 2026</p></footer>',
+        nav_id: new_nav
+    })
+    assert changed == ['about.html', 'index.html']
+    for filename in changed:
+        assert 'Acme 2026' in updated[filename]
+        assert 'contact.html' in updated[filename]
+        assert f'<a href="{filename}" class="nav-link active">' in updated[filename]
+        assert updated[filename].count(' active') == 1
+    assert updated['styles.css'] == FILES['styles.css']
+
+
+def test_page_patch_leaves_the_rest_byte_for_byte():
+    sections = split_site(FILES)
+    hero_id = next(section_id for section_id, section in sections.items()
+                   if section_id.startswith('about.html#') and 'hero' in section['source'])
+    updated, changed = apply_patches(FILES, sections, {hero_id: '<section class="hero"><h1>Our story</h1></section>'})
+    assert changed == ['about.html']
+    assert updated['about.html'] == FILES['about.html'].replace(sections[hero_id]['source'], '<section class="hero"><h1>Our story</h1></section>')
+    assert updated['index.html'] == FILES['index.html']
+
+
+def test_unknown_and_unchanged_patches_change_nothing():
+    sections = split_site(FILES)
+    updated, changed = apply_patches(FILES, sections, {'nope#1': 'x', 'script.js#1': FILES['script.js'], 'styles.css#1': None})
+    assert changed == []
+    assert updated == FILES
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,34 @@
+"""Tests for upload file naming (run with pytest or directly)"""
+
+from upload import allowed_file, safe_upload_name
+
+
+def test_ascii_name_is_kept():
+    assert safe_upload_name('My Site.zip') == 'My_Site.zip'
+
+
+def test_non_ascii_stem_falls_back():
+    # secure_filename() reduces these to 'zip'
+    assert safe_upload_name('模板.zip') == 'template.zip'
+    assert safe_upload_name('تمپلیت.zip') == 'template.zip'
+
+
+def test_extension_is_lowercased():
+    assert safe_upload_name('SITE.ZIP') == 'SITE.zip'
+
+
+def test_path_parts_are_dropped():
+    assert safe_upload_name('../../etc/passwd.zip') == 'etc_passwd.zip'
+
+
+def test_allowed_file_checks_the_raw_name():
+    assert allowed_file('模板.zip')
+    assert not allowed_file('模板.exe')
+    assert not allowed_file('zip')
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,151 @@
+"""Tests for template archive validation and extraction (run with pytest or directly)"""
+
+import os
+import stat
+import time
+import shutil
+import zipfile
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+from config import Config
+from upload import ArchiveRejected, validate_zip_members, extract_zip_safely
+
+TRAVERSAL_NAMES = ['../evil.html', 'css/../../evil.html', '/etc/evil.html', 'C:/evil.html', '..\\evil.html']
+
+
+@contextmanager
+def archive(entries, **limits):
+    """
+    Write (name or ZipInfo, data) entries to a temporary ZIP, with Config limits patched.
+    Yields (zip path, extraction root).
+    """
+    saved = {name: getattr(Config, name) for name in limits}
+    for name, value in limits.items():
+        setattr(Config, name, value)
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            zip_path = os.path.join(root, 'template.zip')
+            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                for name, data in entries:
+                    zipf.writestr(name, data)
+            yield zip_path, os.path.join(root, 'site')
+    finally:
+        for name, value in saved.items():
+            setattr(Config, name, value)
+
+
+def rejected(zip_path, extract_root):
+    with zipfile.ZipFile(zip_path) as zip_ref:
+        with pytest.raises(ArchiveRejected) as error:
+            validate_zip_members(zip_ref, extract_root)
+    return str(error.value)
+
+
+def test_valid_archive_passes():
+    with archive([('index.html', b'<html></html>'), ('css/style.css', b'body{}')]) as (zip_path, root):
+        with zipfile.ZipFile(zip_path) as zip_ref:
+            assert [info.filename for info in validate_zip_members(zip_ref, root)] == ['index.html', 'css/style.css']
+
+
+@pytest.mark.parametrize('name', TRAVERSAL_NAMES)
+def test_path_traversal_is_rejected(name):
+    with archive([('index.html', b'x'), (name, b'x')]) as (zip_path, root):
+        assert 'Unsafe path' in rejected(zip_path, root)
+
+
+def test_symlinks_are_rejected():
+    link = zipfile.ZipInfo('assets/link')
+    link.external_attr = (stat.S_IFLNK | 0o777) << 16
+    with archive([('index.html', b'x'), (link, '/etc/passwd')]) as (zip_path, root):
+        assert 'Symbolic links' in rejected(zip_path, root)
+
+
+def test_encrypted_members_are_rejected():
+    with archive([('index.html', b'x'), ('secret.html', b'x')]) as (zip_path, root):
+        with zipfile.ZipFile(zip_path) as zip_ref:
+            # zipfile cannot write encrypted entries, so set the flag as the central directory would
+            zip_ref.getinfo('secret.html').flag_bits |= 0x1
+            with pytest.raises(ArchiveRejected, match='Encrypted'):
+                validate_zip_members(zip_ref, root)
+
+
+def test_member_count_limit():
+    entries = [(f'page{i}.html', b'x') for i in range(4)]
+    with archive(entries, TEMPLATE_MAX_FILES=3) as (zip_path, root):
+        assert '4 entries (limit 3)' in rejected(zip_path, root)
+    with archive(entries, TEMPLATE_MAX_FILES=4) as (zip_path, root):
+        with zipfile.ZipFile(zip_path) as zip_ref:
+            assert len(validate_zip_members(zip_ref, root)) == 4
+
+
+def test_total_size_limit():
+    # Random bytes do not compress, so only the size limit applies
+    entries = [(f'img{i}.bin', os.urandom(600 * 1024)) for i in range(2)]
+    with archive(entries, TEMPLATE_MAX_UNCOMPRESSED_MB=1) as (zip_path, root):
+        assert 'more than 1 MB' in rejected(zip_path, root)
+
+
+def test_compression_ratio_of_one_member():
+    with archive([('bomb.html', b'\0' * (2 * 1024 * 1024))], TEMPLATE_MAX_COMPRESSION_RATIO=100) as (zip_path, root):
+        assert 'Suspicious compression ratio' in rejected(zip_path, root)
+
+
+def test_overall_compression_ratio():
+    # Each member stays under the ratio threshold size, but together they are a bomb
+    entries = [(f'part{i}.html', b'\0' * (900 * 1024)) for i in range(4)]
+    with archive(entries, TEMPLATE_MAX_COMPRESSION_RATIO=100) as (zip_path, root):
+        assert 'overall compression ratio' in rejected(zip_path, root)
+
+
+def test_small_files_skip_the_ratio_check():
+    with archive([('blank.html', b'\0' * (512 * 1024))], TEMPLATE_MAX_COMPRESSION_RATIO=2) as (zip_path, root):
+        with zipfile.ZipFile(zip_path) as zip_ref:
+            assert len(validate_zip_members(zip_ref, root)) == 1
+
+
+def test_rejected_archive_extracts_nothing():
+    with archive([('index.html', b'x'), ('../evil.html', b'x')]) as (zip_path, root):
+        with pytest.raises(ArchiveRejected):
+            extract_zip_safely(zip_path, root)
+        assert not os.path.exists(root)
+        assert not os.path.exists(os.path.join(os.path.dirname(root), 'evil.html'))
+
+
+def test_valid_archive_extracts_in_parallel():
+    entries = [(f'pages/page{i}.html', f'<p>{i}</p>'.encode() * 100) for i in range(16)]
+    entries.append((zipfile.ZipInfo('empty/'), b''))
+    threads = set()
+    copy = shutil.copyfileobj
+
+    def slow_copy(source, out, length=0):
+        threads.add(threading.get_ident())
+        time.sleep(0.02)
+        copy(source, out, length)
+
+    with archive(entries) as (zip_path, root):
+        shutil.copyfileobj = slow_copy
+        try:
+            assert extract_zip_safely(zip_path, root, workers=4) == 16
+        finally:
+            shutil.copyfileobj = copy
+
+        assert len(threads) > 1
+        assert os.path.isdir(os.path.join(root, 'empty'))
+        for i in range(16):
+            with open(os.path.join(root, 'pages', f'page{i}.html'), 'rb') as f:
+                assert f.read() == f'<p>{i}</p>'.encode() * 100
+
+
+if __name__ == '__main__':
+    for name, test in list(globals().items()):
+        if name == 'test_path_traversal_is_rejected':
+            for member in TRAVERSAL_NAMES:
+                test(member)
+            print(f"✅ {name}")
+        elif name.startswith('test_'):
+            test()
+            print(f"✅ {name}")
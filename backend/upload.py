@@ -1,15 +1,204 @@
 from flask import request, jsonify
 from werkzeug.utils import secure_filename
-from datetime import datetime
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 import os
+import re
+import stat
+import shutil
+import uuid
+import hashlib
+import threading
 import zipfile
+from PIL import Image, ImageOps
 from config import Config
+from models import db, UploadedArtifact, UploadSession
+from template_customizer import single_flight
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
 
+
+def safe_upload_name(filename, default_stem='template'):
+    """
+    secure_filename() of an allowed_file() name that always keeps a stem and the extension:
+    it drops non-ASCII characters, so '模板.zip' would otherwise become just 'zip'
+    """
+    stem, ext = filename.rsplit('.', 1)
+    return f"{secure_filename(stem) or default_stem}.{ext.lower()}"
+
+IMAGE_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}  # Pillow format -> stored extension
+
+class ArchiveRejected(Exception):
+    """Raised when an uploaded archive breaks an ingestion limit"""
+    pass
+
+
+class ImageRejected(Exception):
+    """Raised when an uploaded image cannot be decoded or breaks an image limit"""
+    pass
+
+
+def save_upload_stream(file, file_path, max_bytes=None):
+    """
+    Copy an uploaded file to disk in chunks while hashing it.
+    Returns (sha256 hex digest, size in bytes); the partial file is removed if max_bytes is exceeded.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = f"{file_path}.part"
+    
+    try:
+        with open(tmp_path, 'wb') as out:
+            while True:
+                chunk = file.stream.read(Config.UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise ArchiveRejected(f'Upload exceeds {max_bytes // (1024 * 1024)} MB')
+                digest.update(chunk)
+                out.write(chunk)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    
+    return digest.hexdigest(), size
+
+
+def _unsafe_member_name(name):
+    """True for absolute paths, drive letters or '..' segments"""
+    normalized = name.replace('\\', '/')
+    if normalized.startswith('/') or re.match(r'^[a-zA-Z]:', normalized):
+        return True
+    return '..' in normalized.split('/')
+
+
+def validate_zip_members(zip_ref, extract_root):
+    """
+    Check the central directory before anything is extracted:
+    member count, total and per-member size, compression ratio, path traversal, symlinks and encryption.
+    Returns the members to extract.
+    """
+    members = zip_ref.infolist()
+    if len(members) > Config.TEMPLATE_MAX_FILES:
+        raise ArchiveRejected(f'Archive has {len(members)} entries (limit {Config.TEMPLATE_MAX_FILES})')
+    
+    total_size = 0
+    total_compressed = 0
+    root = os.path.abspath(extract_root)
+    
+    for info in members:
+        if _unsafe_member_name(info.filename):
+            raise ArchiveRejected(f'Unsafe path in archive: {info.filename}')
+        target = os.path.abspath(os.path.join(root, info.filename))
+        if target != root and not target.startswith(root + os.sep):
+            raise ArchiveRejected(f'Unsafe path in archive: {info.filename}')
+        if stat.S_ISLNK(info.external_attr >> 16):
+            raise ArchiveRejected(f'Symbolic links are not allowed: {info.filename}')
+        if info.flag_bits & 0x1:
+            raise ArchiveRejected(f'Encrypted entries are not supported: {info.filename}')
+        
+        # Small files compress extremely well, so the ratio only matters once they get large
+        if info.file_size > Config.UPLOAD_RATIO_MIN_BYTES:
+            ratio = info.file_size / max(info.compress_size, 1)
+            if ratio > Config.TEMPLATE_MAX_COMPRESSION_RATIO:
+                raise ArchiveRejected(f'Suspicious compression ratio ({ratio:.0f}:1) for {info.filename}')
+        
+        total_size += info.file_size
+        total_compressed += info.compress_size
+    
+    if total_size > Config.TEMPLATE_MAX_UNCOMPRESSED_MB * 1024 * 1024:
+        raise ArchiveRejected(f'Archive expands to more than {Config.TEMPLATE_MAX_UNCOMPRESSED_MB} MB')
+    if total_size > Config.UPLOAD_RATIO_MIN_BYTES and total_size / max(total_compressed, 1) > Config.TEMPLATE_MAX_COMPRESSION_RATIO:
+        raise ArchiveRejected('Suspicious overall compression ratio')
+    
+    free_bytes = shutil.disk_usage(os.path.dirname(root) or '.').free
+    if total_size * 2 > free_bytes:
+        raise ArchiveRejected('Not enough free disk space to extract this archive')
+    
+    return members
+
+
+def extract_zip_safely(zip_path, extract_root, workers=None):
+    """Validate an archive, then extract its members in parallel"""
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        members = validate_zip_members(zip_ref, extract_root)
+    
+    # Create directories up front so workers only write files
+    files = []
+    for info in members:
+        target = os.path.join(extract_root, info.filename)
+        if info.is_dir():
+            os.makedirs(target, exist_ok=True)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            files.append(info)
+    
+    local = threading.local()
+    handles = []
+    
+    def extract(info):
+        # Archive handles are not shared between threads, so each worker opens its own
+        zip_ref = getattr(local, 'zip_ref', None)
+        if zip_ref is None:
+            zip_ref = local.zip_ref = zipfile.ZipFile(zip_path, 'r')
+            handles.append(zip_ref)
+        
+        target = os.path.join(extract_root, info.filename)
+        with zip_ref.open(info) as source, open(target, 'wb') as out:
+            # ZipExtFile stops at the declared size and checks the CRC, so a lying header cannot overrun
+            shutil.copyfileobj(source, out, Config.UPLOAD_CHUNK_SIZE)
+    
+    try:
+        with ThreadPoolExecutor(max_workers=workers or Config.UPLOAD_EXTRACT_WORKERS) as pool:
+            list(pool.map(extract, files))
+    finally:
+        for handle in handles:
+            handle.close()
+    
+    return len(files)
+
+
+def find_artifact(kind, sha256):
+    """Existing upload with this content hash whose files are still on disk"""
+    artifact = UploadedArtifact.query.filter_by(kind=kind, sha256=sha256).first()
+    if artifact and os.path.exists(artifact.path):
+        return artifact
+    return None
+
+
+def _record_artifact(kind, sha256, path, size, original_filename, url=None, file_count=None, image_meta=None):
+    """Insert or refresh the index row for an uploaded artifact"""
+    artifact = UploadedArtifact.query.filter_by(kind=kind, sha256=sha256).first()
+    if artifact is None:
+        artifact = UploadedArtifact(kind=kind, sha256=sha256)
+        db.session.add(artifact)
+    artifact.path = path
+    artifact.url = url
+    artifact.size = size
+    artifact.file_count = file_count
+    artifact.image_meta = image_meta
+    artifact.original_filename = original_filename
+    artifact.uploaded_by = getattr(request, 'user_id', None)
+    db.session.commit()
+    return artifact
+
+
+def _incoming_path(folder, ext):
+    """Temporary location for an upload whose content hash is not known yet"""
+    incoming_dir = os.path.join(folder, '.incoming')
+    os.makedirs(incoming_dir, exist_ok=True)
+    return os.path.join(incoming_dir, f"{uuid.uuid4().hex}.{ext}")
+
+
 def handle_template_upload():
-    """Handle ZIP file upload for templates"""
+    """
+    Handle ZIP file upload for templates: stream to disk with a SHA-256, validate, then extract.
+    Files are named by content hash, so identical archives reuse the existing extraction.
+    """
     if 'file' not in request.files:
         return {'error': 'No file provided'}, 400
     
@@ -21,48 +210,444 @@ def handle_template_upload():
     if not allowed_file(file.filename):
         return {'error': 'Invalid file type. Only ZIP files allowed'}, 400
     
-    # Generate unique filename
-    filename = secure_filename(file.filename)
-    timestamp = int(datetime.utcnow().timestamp())
-    unique_filename = f"{timestamp}_{filename}"
+    filename = safe_upload_name(file.filename)
+    ext = filename.rsplit('.', 1)[1]
+    incoming_path = _incoming_path(Config.TEMPLATE_FOLDER, ext)
     
-    file_path = os.path.join(Config.TEMPLATE_FOLDER, unique_filename)
-    file.save(file_path)
+    try:
+        sha256, size = save_upload_stream(file, incoming_path, Config.MAX_CONTENT_LENGTH)
+    except ArchiveRejected as e:
+        return {'error': str(e)}, 413
     
-    # Extract ZIP contents
-    extract_path = os.path.join(Config.TEMPLATE_FOLDER, f"{timestamp}_{filename.rsplit('.', 1)[0]}")
-    os.makedirs(extract_path, exist_ok=True)
+    return store_template_archive(incoming_path, filename, sha256, size)
+
+
+def store_template_archive(incoming_path, filename, sha256, size):
+    """
+    Move a fully received archive to its content-addressed name and extract it,
+    or reuse the existing extraction of an identical archive. Returns (result, status).
+    """
+    stem, ext = filename.rsplit('.', 1)
     
-    try:
-        with zipfile.ZipFile(file_path, 'r') as zip_ref:
-            zip_ref.extractall(extract_path)
-    except Exception as e:
-        return {'error': f'Failed to extract ZIP: {str(e)}'}, 400
+    # Identical concurrent uploads wait for the first one to finish extracting
+    with single_flight(f'upload-{sha256}'):
+        artifact = find_artifact('template', sha256)
+        if artifact:
+            os.remove(incoming_path)
+            return {
+                'file_path': artifact.path,
+                'original_filename': filename,
+                'sha256': sha256,
+                'size': size,
+                'file_count': artifact.file_count,
+                'duplicate': True
+            }, 200
+        
+        # Content-addressed names: different archives never collide
+        unique_name = f"{sha256[:16]}_{stem}"
+        extract_path = os.path.join(Config.TEMPLATE_FOLDER, unique_name)
+        file_path = os.path.join(Config.TEMPLATE_FOLDER, f"{unique_name}.{ext}")
+        shutil.rmtree(extract_path, ignore_errors=True)  # Leftovers of an interrupted extraction
+        os.makedirs(extract_path)
+        os.replace(incoming_path, file_path)
+        
+        # Extract ZIP contents
+        try:
+            file_count = extract_zip_safely(file_path, extract_path)
+        except ArchiveRejected as e:
+            shutil.rmtree(extract_path, ignore_errors=True)
+            os.remove(file_path)
+            return {'error': str(e)}, 400
+        except Exception as e:
+            shutil.rmtree(extract_path, ignore_errors=True)
+            os.remove(file_path)
+            return {'error': f'Failed to extract ZIP: {str(e)}'}, 400
+        
+        _record_artifact('template', sha256, extract_path, size, filename, file_count=file_count)
     
     return {
         'file_path': extract_path,
-        'original_filename': filename
+        'original_filename': filename,
+        'sha256': sha256,
+        'size': size,
+        'file_count': file_count,
+        'duplicate': False
     }, 200
 
 
+def _session_dir(session_id):
+    return os.path.join(Config.UPLOAD_SESSION_FOLDER, session_id)
+
+
+def _chunk_path(session_id, index):
+    return os.path.join(_session_dir(session_id), f"{index:06d}.chunk")
+
+
+def _received_chunks(session):
+    """Chunk indexes already on disk (chunks are renamed into place only once complete)"""
+    try:
+        names = os.listdir(_session_dir(session.id))
+    except FileNotFoundError:
+        return []
+    return sorted(int(name.split('.')[0]) for name in names if name.endswith('.chunk'))
+
+
+def _session_status(session):
+    received = _received_chunks(session)
+    status = session.to_dict()
+    status['received_chunks'] = received
+    status['missing_chunks'] = sorted(set(range(session.total_chunks)) - set(received))
+    status['bytes_received'] = sum(session.chunk_length(index) for index in received)
+    return status
+
+
+def _get_upload_session(session_id):
+    """The current user's upload session, or None"""
+    session = db.session.get(UploadSession, session_id)
+    if session is None or session.user_id != request.user_id:
+        return None
+    return session
+
+
+def purge_expired_sessions():
+    """Drop unfinished upload sessions (and their chunks) past their expiry"""
+    expired = UploadSession.query.filter(
+        UploadSession.expires_at < datetime.utcnow(),
+        UploadSession.status.in_(['active', 'failed', 'finalizing'])
+    ).all()
+    for session in expired:
+        shutil.rmtree(_session_dir(session.id), ignore_errors=True)
+        db.session.delete(session)
+    if expired:
+        db.session.commit()
+        print(f"🧹 Purged {len(expired)} expired upload session(s)")
+
+
+def create_upload_session():
+    """Start a resumable template upload; the client then sends fixed-size chunks by index"""
+    data = request.get_json(silent=True) or {}
+    raw_filename = data.get('filename') or ''
+    
+    if not allowed_file(raw_filename):
+        return {'error': 'Invalid file type. Only ZIP files allowed'}, 400
+    filename = safe_upload_name(raw_filename)
+    
+    try:
+        total_size = int(data.get('size'))
+    except (TypeError, ValueError):
+        return {'error': 'size is required'}, 400
+    
+    max_bytes = Config.UPLOAD_SESSION_MAX_MB * 1024 * 1024
+    if total_size <= 0:
+        return {'error': 'size must be positive'}, 400
+    if total_size > max_bytes:
+        return {'error': f'Upload exceeds {Config.UPLOAD_SESSION_MAX_MB} MB'}, 413
+    
+    sha256 = (data.get('sha256') or '').lower() or None
+    if sha256 and not re.fullmatch(r'[0-9a-f]{64}', sha256):
+        return {'error': 'sha256 must be a hex SHA-256 digest'}, 400
+    
+    purge_expired_sessions()
+    
+    session = UploadSession(
+        id=uuid.uuid4().hex,
+        user_id=request.user_id,
+        filename=filename,
+        total_size=total_size,
+        chunk_size=Config.UPLOAD_SESSION_CHUNK_MB * 1024 * 1024,
+        sha256=sha256,
+        expires_at=datetime.utcnow() + timedelta(hours=Config.UPLOAD_SESSION_TTL_HOURS)
+    )
+    db.session.add(session)
+    db.session.commit()
+    os.makedirs(_session_dir(session.id), exist_ok=True)
+    
+    return _session_status(session), 201
+
+
+def store_upload_chunk(session_id, index):
+    """
+    Store one chunk from the raw request body, hashing it as it streams.
+    Re-sending a chunk replaces it, so clients can retry any chunk after a failure.
+    """
+    session = _get_upload_session(session_id)
+    if session is None:
+        return {'error': 'Upload session not found'}, 404
+    if session.status != 'active':
+        return {'error': f'Upload session is {session.status}'}, 409
+    if not 0 <= index < session.total_chunks:
+        return {'error': f'Chunk index must be between 0 and {session.total_chunks - 1}'}, 400
+    
+    expected = session.chunk_length(index)
+    chunk_path = _chunk_path(session.id, index)
+    tmp_path = f"{chunk_path}.{uuid.uuid4().hex[:8]}.tmp"
+    digest = hashlib.sha256()
+    size = 0
+    
+    os.makedirs(_session_dir(session.id), exist_ok=True)
+    try:
+        with open(tmp_path, 'wb') as out:
+            while size <= expected:
+                data = request.stream.read(min(Config.UPLOAD_CHUNK_SIZE, expected + 1 - size))
+                if not data:
+                    break
+                size += len(data)
+                digest.update(data)
+                out.write(data)
+        
+        if size != expected:
+            os.remove(tmp_path)
+            return {'error': f'Chunk {index} must be {expected} bytes, got {size}'}, 400
+        
+        chunk_sha256 = digest.hexdigest()
+        claimed = request.headers.get('X-Chunk-SHA256')
+        if claimed and claimed.lower() != chunk_sha256:
+            os.remove(tmp_path)
+            return {'error': f'Chunk {index} checksum mismatch'}, 400
+        
+        os.replace(tmp_path, chunk_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    
+    status = _session_status(session)
+    status.update(index=index, chunk_sha256=chunk_sha256)
+    return status, 200
+
+
+def upload_session_status(session_id):
+    """Which chunks have arrived, so an interrupted client knows what to resend"""
+    session = _get_upload_session(session_id)
+    if session is None:
+        return {'error': 'Upload session not found'}, 404
+    return _session_status(session), 200
+
+
+def finalize_upload_session(session_id):
+    """
+    Assemble the chunks in order (hashing as they are copied), verify size and digest,
+    then hand the archive to the same store/extract path as a single-request upload.
+    Finalizing an already completed session returns its result again. Chunks are only
+    removed once the archive is stored; after any other failure the session is active again.
+    """
+    session = _get_upload_session(session_id)
+    if session is None:
+        return {'error': 'Upload session not found'}, 404
+    if session.status == 'completed':
+        return session.result, 200
+    
+    missing = _session_status(session)['missing_chunks']
+    if missing:
+        return {'error': 'Upload is incomplete', 'missing_chunks': missing}, 409
+    
+    # Atomic claim so a retried finalize cannot assemble the same session twice
+    claimed = UploadSession.query.filter_by(id=session.id, status='active').update({'status': 'finalizing'})
+    db.session.commit()
+    if not claimed:
+        db.session.refresh(session)
+        return {'error': f'Upload session is {session.status}'}, 409
+    
+    ext = session.filename.rsplit('.', 1)[1]
+    incoming_path = _incoming_path(Config.TEMPLATE_FOLDER, ext)
+    # Unless the archive itself is rejected, chunks are kept so the client can resend and finalize again
+    retryable = True
+    try:
+        digest = hashlib.sha256()
+        size = 0
+        with open(incoming_path, 'wb') as out:
+            for index in range(session.total_chunks):
+                with open(_chunk_path(session.id, index), 'rb') as chunk:
+                    for data in iter(lambda: chunk.read(Config.UPLOAD_CHUNK_SIZE), b''):
+                        digest.update(data)
+                        size += len(data)
+                        out.write(data)
+        sha256 = digest.hexdigest()
+        
+        if size != session.total_size or (session.sha256 and sha256 != session.sha256):
+            os.remove(incoming_path)
+            result, status = {'error': 'Assembled upload does not match the declared size or sha256'}, 400
+        else:
+            result, status = store_template_archive(incoming_path, session.filename, sha256, size)
+            retryable = False
+    except Exception as e:
+        db.session.rollback()
+        if os.path.exists(incoming_path):
+            os.remove(incoming_path)
+        print(f"Upload session finalize error: {str(e)}")
+        result, status = {'error': f'Failed to finalize upload: {str(e)}'}, 500
+    
+    if status == 200:
+        session.status = 'completed'
+        session.result = result
+    else:
+        session.status = 'active' if retryable else 'failed'
+    session.error = result.get('error')
+    db.session.commit()
+    if status == 200:
+        shutil.rmtree(_session_dir(session.id), ignore_errors=True)
+    
+    return result, status
+
+
+def _save_image_atomic(img, path, fmt):
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    if fmt == 'JPEG':
+        img.save(tmp_path, 'JPEG', quality=85, optimize=True, progressive=True)
+    elif fmt == 'WEBP':
+        img.save(tmp_path, 'WEBP', quality=85, method=4)
+    else:
+        img.save(tmp_path, fmt, optimize=True)
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def process_image(source_path, image_dir, name):
+    """
+    Verify that an upload decodes as an image, then store a metadata-free copy capped at
+    IMAGE_MAX_DIMENSION plus WebP derivatives at IMAGE_DERIVATIVE_WIDTHS.
+    Returns the image metadata; raises ImageRejected for files that are not usable images.
+    """
+    try:
+        with Image.open(source_path) as img:
+            fmt = img.format
+            original_size = img.size
+            if fmt not in IMAGE_FORMATS:
+                raise ImageRejected(f'Unsupported image format: {fmt}')
+            # Checked from the header, before any pixel data is decoded
+            if original_size[0] * original_size[1] > Config.IMAGE_MAX_PIXELS:
+                raise ImageRejected(f'Image is too large ({original_size[0]}x{original_size[1]})')
+            img.verify()
+        
+        img = Image.open(source_path)
+        img.load()
+    except ImageRejected:
+        raise
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        raise ImageRejected('File is not a valid image')
+    
+    ext = IMAGE_FORMATS[fmt]
+    stored_path = os.path.join(image_dir, f"{name}.{ext}")
+    meta = {
+        'format': fmt.lower(),
+        'original_width': original_size[0],
+        'original_height': original_size[1],
+        'animated': getattr(img, 'is_animated', False),
+        'derivatives': []
+    }
+    
+    with img:
+        if meta['animated']:
+            # Re-encoding would drop frames, so animations are only accepted within the size cap
+            if max(original_size) > Config.IMAGE_MAX_DIMENSION:
+                raise ImageRejected('Animated images must fit within the maximum dimension')
+            shutil.copyfile(source_path, stored_path)
+            meta.update(file=os.path.basename(stored_path), width=original_size[0], height=original_size[1],
+                        bytes=os.path.getsize(stored_path))
+            return meta
+        
+        img = ImageOps.exif_transpose(img)
+        # Drop EXIF, ICC and text chunks; palette transparency is image data, not metadata
+        img.info = {key: value for key, value in img.info.items() if key == 'transparency'}
+        if max(img.size) > Config.IMAGE_MAX_DIMENSION:
+            img.thumbnail((Config.IMAGE_MAX_DIMENSION, Config.IMAGE_MAX_DIMENSION), Image.LANCZOS)
+        if fmt == 'JPEG' and img.mode not in ('RGB', 'L', 'CMYK'):
+            img = img.convert('RGB')
+        
+        meta.update(file=os.path.basename(stored_path), width=img.width, height=img.height,
+                    bytes=_save_image_atomic(img, stored_path, fmt))
+        
+        rgb = img.convert('RGBA') if img.mode in ('RGBA', 'LA', 'P') else img.convert('RGB')
+        for width in sorted(Config.IMAGE_DERIVATIVE_WIDTHS):
+            if width >= img.width:
+                continue
+            height = max(1, round(img.height * width / img.width))
+            derivative_path = os.path.join(image_dir, f"{name}_{width}w.webp")
+            size = _save_image_atomic(rgb.resize((width, height), Image.LANCZOS), derivative_path, 'WEBP')
+            meta['derivatives'].append({'file': os.path.basename(derivative_path), 'width': width, 'height': height, 'bytes': size})
+    
+    return meta
+
+
+def _image_response(meta):
+    """Image metadata with public URLs in place of file names"""
+    response = {key: value for key, value in meta.items() if key not in ('file', 'derivatives')}
+    response['url'] = f"/uploads/images/{meta['file']}"
+    response['derivatives'] = [
+        dict({key: value for key, value in d.items() if key != 'file'}, url=f"/uploads/images/{d['file']}")
+        for d in meta['derivatives']
+    ]
+    return response
+
+
 def handle_image_upload():
-    """Handle preview image uploads"""
+    """
+    Handle preview image uploads: each new image is verified, stripped of metadata, capped
+    in size and given WebP derivatives, with the batch processed concurrently.
+    Images are stored once per content hash.
+    """
     if 'images' not in request.files:
         return {'error': 'No images provided'}, 400
     
-    files = request.files.getlist('images')
-    uploaded_images = []
+    image_dir = os.path.join(Config.UPLOAD_FOLDER, 'images')
     
-    for file in files:
+    # The request body can only be read in order, so stream every file to disk first
+    uploads = []
+    for file in request.files.getlist('images'):
         if file and file.filename:
-            filename = secure_filename(file.filename)
-            timestamp = int(datetime.utcnow().timestamp())
-            unique_filename = f"{timestamp}_{filename}"
-            
-            file_path = os.path.join(Config.UPLOAD_FOLDER, 'images', unique_filename)
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            
-            file.save(file_path)
-            uploaded_images.append(f"/uploads/images/{unique_filename}")
-    
-    return {'images': uploaded_images}, 200
\ No newline at end of file
+            incoming_path = _incoming_path(image_dir, 'upload')
+            sha256, size = save_upload_stream(file, incoming_path, Config.MAX_CONTENT_LENGTH)
+            uploads.append({'filename': secure_filename(file.filename), 'path': incoming_path, 'sha256': sha256, 'size': size})
+    
+    # Images indexed before metadata was recorded are processed again
+    pending = {}
+    for upload in uploads:
+        artifact = find_artifact('image', upload['sha256'])
+        if artifact and artifact.image_meta:
+            upload['artifact'] = artifact
+        else:
+            pending.setdefault(upload['sha256'], upload)
+    
+    # Pillow releases the GIL while decoding and encoding, so threads scale across the batch
+    results = {}
+    with ThreadPoolExecutor(max_workers=Config.IMAGE_UPLOAD_WORKERS) as pool:
+        futures = {sha256: pool.submit(process_image, upload['path'], image_dir, sha256[:16])
+                   for sha256, upload in pending.items()}
+        for sha256, future in futures.items():
+            try:
+                results[sha256] = future.result()
+            except ImageRejected as e:
+                results[sha256] = {'error': str(e)}
+            except Exception as e:
+                print(f"❌ Image processing failed for {pending[sha256]['filename']}: {e}")
+                results[sha256] = {'error': 'Could not process image'}
+    
+    uploaded_images = []
+    artifacts = []
+    for upload in uploads:
+        os.remove(upload['path'])
+        sha256 = upload['sha256']
+        result = results.get(sha256, {})
+        if 'error' in result:
+            artifacts.append({'filename': upload['filename'], 'sha256': sha256, 'error': result['error']})
+            continue
+        
+        duplicate = 'artifact' in upload or pending.get(sha256) is not upload
+        artifact = upload.get('artifact')
+        if artifact is None:
+            with single_flight(f'upload-{sha256}'):
+                artifact = find_artifact('image', sha256)
+                if not (artifact and artifact.image_meta):
+                    artifact = _record_artifact(
+                        'image', sha256, os.path.join(image_dir, result['file']), upload['size'], upload['filename'],
+                        url=f"/uploads/images/{result['file']}", image_meta=result
+                    )
+        
+        uploaded_images.append(artifact.url)
+        artifacts.append(dict(_image_response(artifact.image_meta), filename=upload['filename'], sha256=sha256,
+                              size=upload['size'], duplicate=duplicate))
+    
+    if uploads and not uploaded_images:
+        return {'error': 'No valid images uploaded', 'artifacts': artifacts}, 400
+    
+    return {'images': uploaded_images, 'artifacts': artifacts}, 200
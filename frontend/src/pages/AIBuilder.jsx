@@ -1,6 +1,6 @@
 import { useState } from 'react';
 import { useAuthStore } from '../store';
-import { generateWebsite, regenerateAIWebsite, improvePrompt } from '../api';
+import { generateWebsite, getAIJob, getAIWebsite, regenerateAIWebsite, improvePrompt } from '../api';
 import { useNavigate, Link } from 'react-router-dom';
 
 export default function AIBuilder() {
@@ -8,6 +8,7 @@ export default function AIBuilder() {
   const navigate = useNavigate();
   const [description, setDescription] = useState('');
   const [loading, setLoading] = useState(false);
+  const [generationStage, setGenerationStage] = useState('');
   const [improvingPrompt, setImprovingPrompt] = useState(false);
   const [generatedWebsite, setGeneratedWebsite] = useState(null);
   const [error, setError] = useState('');
@@ -101,16 +102,29 @@ export default function AIBuilder() {
 
     try {
       const res = await generateWebsite({ description });
-      setGeneratedWebsite(res.data);
       
-      // Navigate to the generated website page
-      if (res.data.website?.id) {
-        navigate(`/generated-website/${res.data.website.id}`);
+      // Generation runs as a background job; long-poll until it finishes
+      let job = { status: 'queued', progress: {} };
+      while (job.status === 'queued' || job.status === 'running') {
+        const jobRes = await getAIJob(res.data.job_id, { wait: 20, stage: job.progress?.stage });
+        job = jobRes.data.job;
+        setGenerationStage(job.progress?.stage || '');
+      }
+      
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Failed to generate website');
       }
+      
+      const websiteRes = await getAIWebsite(job.result.website_id);
+      setGeneratedWebsite(websiteRes.data.website);
+      
+      // Navigate to the generated website page
+      navigate(`/generated-website/${job.result.website_id}`);
     } catch (err) {
-      setError(err.response?.data?.error || 'Failed to generate website');
+      setError(err.response?.data?.error || err.message || 'Failed to generate website');
     } finally {
       setLoading(false);
+      setGenerationStage('');
     }
   };
 
@@ -234,7 +248,7 @@ export default function AIBuilder() {
               style={styles.generateBtn}
               disabled={loading}
             >
-              {loading ? 'Generating...' : 'Generate Website'}
+              {loading ? `Generating${generationStage ? ` (${generationStage})` : ''}...` : 'Generate Website'}
             </button>
           </form>
         </div>